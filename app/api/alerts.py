@@ -2,7 +2,8 @@ from flask import Blueprint, request
 from app.core.database import get_db
 from app.domain.models import Alert
 from app.core.security import login_required
-from app.core.utils import api_response
+from app.core.utils import api_response, sse_response
+from app.services.explanation_stream import ExplanationStreamHub, explanation_to_dict
 from datetime import datetime
 
 alerts_bp = Blueprint('alerts', __name__, url_prefix='/alerts')
@@ -18,6 +19,7 @@ def resolve_alert(id):
         
     alert.resolved = True
     alert.resolved_at = datetime.utcnow()
+    alert.resolution_reason = "manual"
     db.commit()
     
     return api_response(message="Alert resolved")
@@ -37,11 +39,23 @@ def get_alert_explanation(id):
     if not explanation:
         return api_response(error="Explanation not available yet", status_code=404)
         
-    return api_response(data={
-        "alert_id": explanation.alert_id,
-        "summary": explanation.summary,
-        "risk_level": explanation.risk_level,
-        "suggested_checks": json.loads(explanation.suggested_checks) if explanation.suggested_checks else [],
-        "suggested_actions": json.loads(explanation.suggested_actions) if explanation.suggested_actions else [],
-        "created_at": explanation.created_at
-    })
+    return api_response(data=explanation_to_dict(explanation))
+
+@alerts_bp.route('/<int:id>/explanation/stream', methods=['GET'])
+@login_required(roles=['doctor', 'admin'])
+def stream_alert_explanation(id):
+    """
+    Stream the explanation for an alert as Server-Sent Events.
+    A stored explanation is sent as a single 'explanation' event. Otherwise
+    the explanation is generated now: 'partial' events carry the fields
+    parsed so far, then 'explanation' carries the stored result (or 'error').
+    Concurrent viewers of an alert share one generation.
+    """
+    db = next(get_db())
+    alert = db.query(Alert).filter(Alert.id == id).first()
+    if not alert:
+        return api_response(error="Alert not found", status_code=404)
+
+    if alert.explanation:
+        return sse_response([('explanation', explanation_to_dict(alert.explanation))])
+    return sse_response(ExplanationStreamHub.get().subscribe(id))
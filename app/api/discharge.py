@@ -1,7 +1,9 @@
 from flask import Blueprint, request
 from app.core.database import get_db
 from app.services.discharge_service import DischargeService
+from app.services.discharge_jobs import DischargePlanJobs, job_to_dict
 from app.core.security import login_required
+from app.core.utils import api_response
 from app.domain.models import Encounter, DischargePlan, User
 
 discharge_bp = Blueprint('discharge', __name__)
@@ -21,6 +23,8 @@ def run_auto_discharge():
     results = {
         "evaluated": len(encounters),
         "auto_discharged": [],
+        "plans_ready": [],
+        "plan_jobs": {},
         "skipped": [],
         "reasons": {}
     }
@@ -30,9 +34,13 @@ def run_auto_discharge():
             if DischargeService.is_stable_for_discharge(encounter.id, db):
                 # Discharge
                 DischargeService.discharge_encounter(encounter.id, db)
-                # Generate Plan
-                DischargeService.generate_discharge_plan(encounter.id, db)
                 results["auto_discharged"].append(encounter.id)
+                # Use the pre-generated draft if still valid, else generate in the background
+                if DischargeService.plan_from_draft(encounter.id, db):
+                    results["plans_ready"].append(encounter.id)
+                else:
+                    job = DischargePlanJobs.enqueue(encounter.id, db)
+                    results["plan_jobs"][str(encounter.id)] = job.id
             else:
                 results["skipped"].append(encounter.id)
                 results["reasons"][str(encounter.id)] = "Criteria not met (Time/Alerts/Vitals)"
@@ -46,15 +54,19 @@ def run_auto_discharge():
 @login_required(roles=['admin', 'doctor', 'patient'])
 def get_discharge_plan(encounter_id):
     """
-    Fetch the discharge plan for a specific encounter.
+    Fetch the discharge plan for a specific encounter, with status "ready".
+    While the plan is being generated this returns 202 with the job status
+    ("pending", or "failed" with the error once retries are exhausted).
     """
     db = next(get_db())
     plan = db.query(DischargePlan).filter(DischargePlan.encounter_id == encounter_id).first()
-    
+    job = None
+
     if not plan:
-        return api_response(error="Discharge plan not found", status_code=404)
+        job = DischargePlanJobs.latest(encounter_id, db)
+        if not job or job.status == "ready":
+            return api_response(error="Discharge plan not found", status_code=404)
         
-    # Check ownership if patient
     # Check ownership if patient
     current_user_id = request.current_user['user_id']
     current_user_role = request.current_user['role']
@@ -65,7 +77,16 @@ def get_discharge_plan(encounter_id):
         if not encounter or encounter.patient.user_id != current_user_id:
              return api_response(error="Unauthorized", status_code=403)
 
+    if job:
+        job_data = job_to_dict(job)
+        if job.status == "failed":
+            return api_response(data=job_data, message="Discharge plan generation failed")
+        # A running job is still "pending" from the caller's point of view
+        job_data["status"] = "pending"
+        return api_response(data=job_data, message="Discharge plan is being generated", status_code=202)
+
     return api_response(data={
+        "status": "ready",
         "encounter_id": plan.encounter_id,
         "patient_id": plan.patient_id,
         "summary": plan.summary,
@@ -78,6 +99,23 @@ def get_discharge_plan(encounter_id):
         "created_at": plan.created_at
     })
 
+@discharge_bp.route('/encounters/<int:encounter_id>/discharge_plan', methods=['POST'])
+@login_required(roles=['admin', 'doctor'])
+def queue_discharge_plan(encounter_id):
+    """
+    Queue discharge plan generation, e.g. again after a failed job.
+    """
+    db = next(get_db())
+    encounter = db.query(Encounter).filter(Encounter.id == encounter_id).first()
+    if not encounter:
+        return api_response(error="Encounter not found", status_code=404)
+    if db.query(DischargePlan).filter(DischargePlan.encounter_id == encounter_id).first():
+        return api_response(error="Discharge plan already exists", status_code=409)
+
+    job = DischargePlanJobs.enqueue(encounter_id, db)
+    return api_response(data={"job_id": job.id, "status": job.status},
+                        message="Discharge plan queued", status_code=202)
+
 @discharge_bp.route('/patients/me/post_discharge', methods=['GET'])
 @login_required(roles=['patient'])
 def get_my_post_discharge():
@@ -2,7 +2,9 @@ from flask import Blueprint, request
 from app.core.database import get_db
 from app.repositories.encounter_repo import EncounterRepository
 from app.repositories.vitals_repo import VitalsRepository
-from app.domain.models import Observation
+from app.domain.models import Observation, Encounter
+from app.services.discharge_service import DischargeService
+from app.services.discharge_jobs import DischargePlanJobs
 from app.core.security import login_required
 from app.schemas.encounters import AdmitPatientRequest, EncounterResponse
 from app.schemas.frontend import EncounterOverviewResponse, VitalsPoint, ObservationInfo
@@ -112,7 +114,10 @@ def get_encounter_overview(id):
 def discharge_encounter(id):
     """
     Manually discharge an encounter.
-    Optionally generate discharge plan if requested.
+    Optionally create the discharge plan (body "generate_plan", default true):
+    a valid pre-generated draft is saved as the plan right away, otherwise
+    the plan is generated in the background; poll
+    GET /encounters/<id>/discharge_plan for its status.
     """
     db = next(get_db())
     try:
@@ -127,12 +132,16 @@ def discharge_encounter(id):
         # Discharge
         DischargeService.discharge_encounter(id, db)
         
-        # Generate plan if requested? 
         # Requirement says: "Optionally from PATCH ... when a doctor manually discharges and requests plan generation."
-        # Let's check query param or body.
-        data = request.get_json() or {}
+        data = request.get_json(silent=True) or {}
         if data.get("generate_plan", True): # Default to True for convenience
-             DischargeService.generate_discharge_plan(id, db)
+             plan = DischargeService.plan_from_draft(id, db)
+             if plan:
+                 return api_response(data={"plan_id": plan.id, "status": "ready"},
+                                     message="Encounter discharged, discharge plan ready")
+             job = DischargePlanJobs.enqueue(id, db)
+             return api_response(data={"job_id": job.id, "status": job.status},
+                                 message="Encounter discharged, discharge plan queued", status_code=202)
              
         return api_response(message="Encounter discharged successfully")
     except Exception as e:
@@ -178,5 +187,6 @@ def get_encounter_alerts(id):
         'message': a.message,
         'created_at': a.created_at.isoformat() if a.created_at else None,
         'resolved': a.resolved,
-        'resolved_at': a.resolved_at.isoformat() if a.resolved_at else None
+        'resolved_at': a.resolved_at.isoformat() if a.resolved_at else None,
+        'resolution_reason': a.resolution_reason
     } for a in alerts])
@@ -1,16 +1,37 @@
-from flask import Blueprint, jsonify
-from app.llm.healthcheck import llm_healthcheck
+import threading
+import time
+from flask import Blueprint, jsonify, request
+from app.core.config import Config
+from app.llm.healthcheck import LLMHealthProber
 from app.services.llm_service import LLMService
+from app.core.utils import sse_response
 
 llm_health_bp = Blueprint('llm_health', __name__)
 
+# Last non-streaming smoke test result: (monotonic time, response body)
+_smoke_test = {"result": None}
+_smoke_test_lock = threading.Lock()
+
+def _forced():
+    return request.args.get('force', '').lower() in ('1', 'true', 'yes')
+
 @llm_health_bp.route('/llm/health', methods=['GET'])
 def llm_health():
     """
-    Lightweight healthcheck for LangChain + Ollama integration.
-    Does a tiny test call and returns status + minimal info.
+    Healthcheck for LangChain + Ollama integration.
+    Answers from the background prober's latest result (no model call);
+    ?force=1 does a live test call, which also refreshes that result.
     """
-    result = llm_healthcheck()
+    if _forced() or not LLMHealthProber.running():
+        result = LLMHealthProber.probe()
+    else:
+        result = LLMHealthProber.snapshot(max_age_s=3 * Config.LLM_HEALTH_INTERVAL_S)
+        if result is None:
+            return jsonify({
+                "status": "error",
+                "data": None,
+                "error": "LLM health not checked yet",
+            }), 503
     status_code = 200 if result["ok"] else 500
 
     return jsonify({
@@ -19,38 +40,67 @@ def llm_health():
             "model": result["model"],
             "ok": result["ok"],
             "sample_reply": result["sample_reply"],
+            "latency_ms": result["latency_ms"],
+            "checked_at": result["checked_at"],
+            "age_s": result["age_s"],
+            "circuit": result["circuit"],
         },
         "error": result["error"],
     }), status_code
 
+SMOKE_TEST_CONTEXT = {
+    "alert_type": "tachycardia",
+    "severity": "medium",
+    "message": "HR 130 bpm earlier today",
+    "patient_age": 45,
+    "gender": "M",
+    "recent_vitals": [
+        {"hr": 95, "spo2": 97, "bp": "130/85", "temp": 37.2}
+    ]
+}
+
+def _stream_smoke_test(context):
+    result = None
+    try:
+        for partial in LLMService.stream_alert_explanation_json(context):
+            result = partial
+            yield ('partial', partial)
+        yield ('done', {"structured_output": result})
+    except Exception as e:
+        yield ('error', {"error": str(e)})
+
 @llm_health_bp.route('/llm/copilot/smoke_test', methods=['GET'])
 def copilot_smoke_test():
     """
     Smoke test for the doctor copilot pipeline.
     Uses a fake context to generate an alert explanation.
+    With ?stream=1 the output is streamed as Server-Sent Events: 'partial'
+    events as fields are generated, then 'done' (or 'error').
+    Otherwise a result younger than LLM_HEALTH_INTERVAL_S is reused, unless
+    ?force=1 is given.
     """
-    fake_context = {
-        "alert_type": "tachycardia",
-        "severity": "medium",
-        "message": "HR 130 bpm earlier today",
-        "patient_age": 45,
-        "gender": "M",
-        "recent_vitals": [
-            {"hr": 95, "spo2": 97, "bp": "130/85", "temp": 37.2}
-        ]
-    }
-    
+    if request.args.get('stream'):
+        return sse_response(_stream_smoke_test(SMOKE_TEST_CONTEXT))
+
+    with _smoke_test_lock:
+        cached = _smoke_test["result"]
+    if cached and not _forced() and time.monotonic() - cached[0] < Config.LLM_HEALTH_INTERVAL_S:
+        return jsonify(cached[1])
+
     try:
         # Call the actual service method
-        result = LLMService.generate_alert_explanation_json(fake_context)
+        result = LLMService.generate_alert_explanation_json(SMOKE_TEST_CONTEXT)
         
-        return jsonify({
+        body = {
             "status": "success",
             "data": {
                 "structured_output": result
             },
             "error": None
-        })
+        }
+        with _smoke_test_lock:
+            _smoke_test["result"] = (time.monotonic(), body)
+        return jsonify(body)
     except Exception as e:
         return jsonify({
             "status": "error",
@@ -34,7 +34,10 @@ def ingest_vitals():
     # Publish to Kafka (Vitals Stream)
     vitals_payload = vitals_data.copy()
     vitals_payload['timestamp'] = vitals_payload['timestamp'].isoformat()
-    KafkaClient.send_message(Config.KAFKA_TOPIC_VITALS, vitals_payload)
+    # Keyed by encounter so every reading of an encounter lands on the same
+    # partition, and therefore the same alert engine worker
+    stream_key = vitals_payload.get('encounter_id') or vitals_payload.get('patient_id')
+    KafkaClient.send_message(Config.KAFKA_TOPIC_VITALS, vitals_payload, key=stream_key)
     
     # Synchronous Alert Evaluation
     alerts_triggered = AlertService.evaluate_vitals(db, vitals)
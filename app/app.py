@@ -1,4 +1,4 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response
 from app.core.config import Config
 from app.api.auth import auth_bp
 from app.api.encounters import encounters_bp
@@ -11,10 +11,17 @@ from app.api.admissions import admissions_bp
 from app.api.discharge import discharge_bp
 from app.api.llm_health import llm_health_bp
 import logging
+import os
 import time
 from werkzeug.exceptions import HTTPException
 from sqlalchemy.exc import SQLAlchemyError, IntegrityError
 from app.core.utils import api_response
+from app.services.rule_thresholds import ThresholdRegistry
+from app.core.bus import uses_memory_bus
+from app.core.metrics import REGISTRY, CONTENT_TYPE
+from app.llm.healthcheck import LLMHealthProber
+from app.services.discharge_jobs import DischargePlanWorker
+from app.services.discharge_drafts import DischargePlanDrafter
 
 def create_app():
     app = Flask(__name__)
@@ -30,7 +37,7 @@ def create_app():
         
     @app.after_request
     def log_request(response):
-        if request.path == '/health':
+        if request.path in ('/health', '/metrics'):
             return response
             
         duration = time.time() - request.start_time
@@ -70,10 +77,40 @@ def create_app():
     @app.route('/health')
     def health():
         return {'status': 'ok'}
+
+    @app.route('/metrics')
+    def metrics():
+        # LLM latency / outcomes / tokens and circuit state for calls made by this process
+        return Response(REGISTRY.render(), content_type=CONTENT_TYPE)
         
     return app
 
+def start_background_services():
+    """
+    Starts the API process's background threads. Called by the entrypoints
+    (app/wsgi.py, `python -m app.app`), never by create_app, so importing the
+    app (tests, scripts, the debug reloader's parent) starts nothing.
+    """
+    # Pick up department threshold changes without a redeploy
+    ThresholdRegistry.start_reloader()
+
+    # /llm/health answers from the latest background probe
+    LLMHealthProber.start()
+
+    # Discharge plans are generated by background jobs, not on the request
+    DischargePlanWorker.start()
+    # and drafted ahead of time for stable encounters while the LLM is idle
+    DischargePlanDrafter.start()
+
+    # Single-node mode: no broker, so the stream consumers run in this process
+    if uses_memory_bus():
+        from app.services.inprocess_runtime import start_inprocess_consumers
+        start_inprocess_consumers()
+
 app = create_app()
 
 if __name__ == '__main__':
+    # With debug=True the reloader runs the app in a child process; start the threads only there
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_background_services()
     app.run(host='0.0.0.0', port=5001, debug=True)
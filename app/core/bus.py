@@ -0,0 +1,270 @@
+"""
+Message bus backends.
+
+MESSAGE_BUS=kafka (default) uses the Kafka cluster, as before.
+
+MESSAGE_BUS=memory keeps every topic in-process: each consumer group of a
+topic gets a bounded channel, and publishing hands the message object itself
+to the consumers (no serialization, no copy, no network hop). It is meant for
+single-node deployments where the API, alert engine and copilot run in one
+process (see app/services/inprocess_runtime.py). Messages are not persisted:
+whatever is queued when the process stops is lost, and publishers block for
+up to BUS_PUBLISH_TIMEOUT_S, then fail, when a group falls too far behind.
+Dead-letter topics have no consumer in this mode, so dead-lettered messages
+are only visible in the consumer logs.
+
+Publishing goes through KafkaClient, whose producer is swapped for
+InMemoryProducer; consumers are created with `create_consumer`, which returns
+either a KafkaConsumer or an InMemoryConsumer with the same poll / commit /
+seek / lag surface used by app/core/stream.py.
+"""
+import logging
+import threading
+import time
+from collections import deque, namedtuple
+from kafka import KafkaConsumer, TopicPartition
+from app.core.config import Config
+
+logger = logging.getLogger(__name__)
+
+Record = namedtuple('Record', ['topic', 'partition', 'offset', 'key', 'value', 'timestamp'])
+
+
+class BusFull(TimeoutError):
+    """A consumer group's channel stayed full for the whole publish timeout."""
+
+
+def uses_memory_bus():
+    return Config.MESSAGE_BUS == 'memory'
+
+
+class _Channel:
+    """Bounded FIFO of records for one (topic, consumer group)."""
+
+    def __init__(self, topic, maxsize):
+        self.topic = topic
+        self.maxsize = maxsize
+        self.next_offset = 0
+        self.consumers = 0
+        self._records = deque()
+        self._cond = threading.Condition()
+
+    def put(self, value, key, timeout_s):
+        with self._cond:
+            if not self._cond.wait_for(lambda: len(self._records) < self.maxsize, timeout_s):
+                raise BusFull(f"{self.topic}: channel full ({self.maxsize} messages)")
+            self._records.append(Record(self.topic, 0, self.next_offset, key, value, int(time.time() * 1000)))
+            self.next_offset += 1
+            self._cond.notify_all()
+
+    def take(self, max_records, timeout_s):
+        with self._cond:
+            self._cond.wait_for(lambda: self._records, timeout_s)
+            count = min(max_records, len(self._records))
+            records = [self._records.popleft() for _ in range(count)]
+            if records:
+                self._cond.notify_all()
+            return records
+
+    def push_front(self, records):
+        """Puts rewound records back at the head, in order (may briefly exceed maxsize)."""
+        with self._cond:
+            self._records.extendleft(reversed(records))
+            self._cond.notify_all()
+
+
+class InMemoryBroker:
+    """Process-wide registry of topics -> consumer group channels."""
+
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self, maxsize=None, publish_timeout_s=None):
+        self.maxsize = maxsize or Config.BUS_QUEUE_SIZE
+        self.publish_timeout_s = publish_timeout_s if publish_timeout_s is not None else Config.BUS_PUBLISH_TIMEOUT_S
+        self._topics = {}
+        self._lock = threading.Lock()
+        self.dropped = 0
+
+    @classmethod
+    def instance(cls):
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = cls()
+            return cls._instance
+
+    def publish(self, topic, value, key=None):
+        """
+        Delivers `value` to every consumer group subscribed to `topic`.
+        Messages for topics nobody consumes are dropped, as with
+        auto_offset_reset='latest' on Kafka.
+        """
+        with self._lock:
+            channels = list(self._topics.get(topic, {}).values())
+        if not channels:
+            self.dropped += 1
+            return
+        for channel in channels:
+            channel.put(value, key, self.publish_timeout_s)
+
+    def join(self, topic, group_id):
+        with self._lock:
+            channel = self._topics.setdefault(topic, {}).get(group_id)
+            if channel is None:
+                channel = self._topics[topic][group_id] = _Channel(topic, self.maxsize)
+            channel.consumers += 1
+            return channel
+
+    def leave(self, topic, group_id):
+        """Drops the group's channel once its last consumer has left, so publishers never block on it."""
+        with self._lock:
+            channel = self._topics.get(topic, {}).get(group_id)
+            if channel is None:
+                return
+            channel.consumers -= 1
+            if channel.consumers <= 0:
+                del self._topics[topic][group_id]
+
+
+class _Delivered:
+    """Future stand-in returned by InMemoryProducer.send; delivery is synchronous."""
+
+    def get(self, timeout=None):
+        return None
+
+
+class InMemoryProducer:
+    """The KafkaProducer surface KafkaClient uses, backed by InMemoryBroker."""
+
+    def __init__(self, broker=None):
+        self.broker = broker or InMemoryBroker.instance()
+
+    def send(self, topic, value, key=None):
+        self.broker.publish(topic, value, key)
+        return _Delivered()
+
+    def flush(self, timeout=None):
+        pass
+
+    def close(self, timeout=None):
+        pass
+
+
+class InMemoryConsumer:
+    """
+    The KafkaConsumer surface used by StreamConsumer, over InMemoryBroker.
+
+    Each subscribed topic is a single partition 0. Records polled but not yet
+    committed are kept so `seek` can redeliver them; values are the published
+    objects themselves, so StreamConsumer skips JSON decoding.
+    """
+
+    def __init__(self, *topics, group_id, broker=None):
+        self.config = {'group_id': group_id}
+        self.broker = broker or InMemoryBroker.instance()
+        self._channels = {}
+        self._inflight = {}
+        self._position = {}
+        self._paused = set()
+        if topics:
+            self.subscribe(topics)
+
+    def subscribe(self, topics, listener=None):
+        for topic in topics:
+            tp = TopicPartition(topic, 0)
+            if tp not in self._channels:
+                self._channels[tp] = self.broker.join(topic, self.config['group_id'])
+                self._inflight[tp] = []
+                self._position[tp] = self._channels[tp].next_offset
+        if listener:
+            listener.on_partitions_assigned(set(self._channels))
+
+    def poll(self, timeout_ms=0, max_records=500):
+        active = [tp for tp in self._channels if tp not in self._paused]
+        if not active:
+            time.sleep(timeout_ms / 1000.0)
+            return {}
+
+        batch = {}
+        remaining = max_records
+        for tp in active:
+            records = self._channels[tp].take(remaining, 0)
+            if records:
+                batch[tp] = records
+                remaining -= len(records)
+            if not remaining:
+                break
+        if not batch:
+            # Nothing ready anywhere: block on the first partition for the timeout
+            tp = active[0]
+            records = self._channels[tp].take(max_records, timeout_ms / 1000.0)
+            if records:
+                batch[tp] = records
+
+        for tp, records in batch.items():
+            self._inflight[tp].extend(records)
+            self._position[tp] = records[-1].offset + 1
+        return batch
+
+    def commit(self, offsets=None):
+        """Forgets in-flight records below the committed offsets (default: the positions)."""
+        for tp in self._inflight:
+            if offsets is None:
+                committed = self._position[tp]
+            elif tp in offsets:
+                committed = offsets[tp].offset
+            else:
+                continue
+            self._inflight[tp] = [r for r in self._inflight[tp] if r.offset >= committed]
+
+    def seek(self, tp, offset):
+        rewound = [r for r in self._inflight[tp] if r.offset >= offset]
+        self._inflight[tp] = [r for r in self._inflight[tp] if r.offset < offset]
+        self._channels[tp].push_front(rewound)
+        self._position[tp] = offset
+
+    def assignment(self):
+        return set(self._channels)
+
+    def position(self, tp):
+        return self._position[tp]
+
+    def committed(self, tp):
+        # Channels only hold messages published after the group joined, so
+        # every position counts as committed
+        return self._position[tp]
+
+    def highwater(self, tp):
+        return self._channels[tp].next_offset
+
+    def end_offsets(self, partitions):
+        return {tp: self._channels[tp].next_offset for tp in partitions}
+
+    def pause(self, *partitions):
+        self._paused.update(partitions)
+
+    def resume(self, *partitions):
+        self._paused.difference_update(partitions)
+
+    def paused(self):
+        return set(self._paused)
+
+    def close(self, autocommit=False):
+        for tp in self._channels:
+            self.broker.leave(tp.topic, self.config['group_id'])
+        self._channels = {}
+
+
+def create_consumer(*topics, group_id, **kafka_config):
+    """
+    Consumer for the configured bus. `kafka_config` (auto_offset_reset,
+    enable_auto_commit, ...) only applies to the Kafka backend.
+    """
+    if uses_memory_bus():
+        return InMemoryConsumer(*topics, group_id=group_id)
+    return KafkaConsumer(
+        *topics,
+        bootstrap_servers=Config.KAFKA_BOOTSTRAP_SERVERS,
+        group_id=group_id,
+        **kafka_config
+    )
@@ -0,0 +1,106 @@
+"""
+Request coalescing across worker threads.
+
+Workers that submit an item under the same key within `window_s` of each
+other join one batch. The first submitter (the leader) waits out the window,
+or until the batch holds `max_items`, then runs the batch once; every
+submitter gets its own item's result back, or the batch's exception.
+A submitter can pass a shorter `window_s` (urgent items); the open batch then
+runs when the earliest of its members' windows ends. `join` adds an item
+only if a batch is already open for its key.
+
+    coalescer = Coalescer(window_s=0.5, max_items=8)
+    result = coalescer.submit(encounter_id, alert, lambda alerts: explain_all(alerts))
+"""
+import logging
+import threading
+import time
+from concurrent.futures import Future
+
+logger = logging.getLogger(__name__)
+
+
+class _Batch:
+    def __init__(self, deadline):
+        self.items = []
+        self.deadline = deadline
+        self.closed = False
+        # Set when the batch fills up or its deadline moves earlier
+        self.wake = threading.Event()
+        self.future = Future()
+
+
+class Coalescer:
+    def __init__(self, window_s, max_items=None):
+        self.window_s = window_s
+        self.max_items = max_items
+        self._open = {}
+        self._lock = threading.Lock()
+
+    def submit(self, key, item, run, window_s=None):
+        """
+        Adds `item` to the open batch for `key` and blocks until the batch has
+        run. `run(items)` must return one result per item, in order; only the
+        leader's `run` is called. `window_s` overrides the window for this
+        item; a shorter one brings the batch's run forward.
+        """
+        window_s = self.window_s if window_s is None else min(window_s, self.window_s)
+        with self._lock:
+            batch = self._open.get(key)
+            leader = batch is None
+            if leader:
+                batch = self._open[key] = _Batch(time.monotonic() + window_s)
+            elif time.monotonic() + window_s < batch.deadline:
+                batch.deadline = time.monotonic() + window_s
+                batch.wake.set()
+            index = self._add(key, batch, item)
+
+        if leader:
+            self._wait(batch)
+            with self._lock:
+                if self._open.get(key) is batch:
+                    del self._open[key]
+                    batch.closed = True
+            items = list(batch.items)
+            try:
+                results = run(items)
+                if len(results) != len(items):
+                    raise ValueError(f"Batch for {key} returned {len(results)} results for {len(items)} items")
+                batch.future.set_result(results)
+            except Exception as e:
+                batch.future.set_exception(e)
+
+        return batch.future.result()[index]
+
+    def join(self, key, item):
+        """
+        Adds `item` to the open batch for `key`, if there is one, and returns
+        its result as `submit` does. Returns None when no batch is open, so
+        the caller can handle the item on its own without waiting.
+        """
+        with self._lock:
+            batch = self._open.get(key)
+            if batch is None:
+                return None
+            index = self._add(key, batch, item)
+        return batch.future.result()[index]
+
+    def _add(self, key, batch, item):
+        """Appends `item` under the lock; closes the batch once it holds `max_items`."""
+        index = len(batch.items)
+        batch.items.append(item)
+        if self.max_items and len(batch.items) >= self.max_items:
+            del self._open[key]
+            batch.closed = True
+            batch.wake.set()
+        return index
+
+    def _wait(self, batch):
+        """Leader: waits until the batch's deadline, or until it is full."""
+        while True:
+            with self._lock:
+                remaining = batch.deadline - time.monotonic()
+                if batch.closed or remaining <= 0:
+                    return
+                batch.wake.clear()
+            batch.wake.wait(remaining)
@@ -17,3 +17,123 @@ class Config:
     KAFKA_BOOTSTRAP_SERVERS = os.getenv('KAFKA_BOOTSTRAP_SERVERS', 'localhost:9092').split(',')
     KAFKA_TOPIC_VITALS = os.getenv('KAFKA_TOPIC_VITALS', 'vitals_stream')
     KAFKA_TOPIC_ALERTS = os.getenv('KAFKA_TOPIC_ALERTS', 'alerts')
+
+    # Per-encounter baseline anomaly detection (alert consumer)
+    BASELINE_ALPHA = float(os.getenv('BASELINE_ALPHA', '0.05'))
+    BASELINE_Z_THRESHOLD = float(os.getenv('BASELINE_Z_THRESHOLD', '3.5'))
+    BASELINE_WARMUP_READINGS = int(os.getenv('BASELINE_WARMUP_READINGS', '30'))
+    BASELINE_SNAPSHOT_INTERVAL_S = int(os.getenv('BASELINE_SNAPSHOT_INTERVAL_S', '60'))
+    BASELINE_IDLE_EVICT_S = int(os.getenv('BASELINE_IDLE_EVICT_S', '86400'))
+    # Warm start: active encounters with no stored baseline are seeded from their last N readings (0 disables)
+    BASELINE_SEED_READINGS = int(os.getenv('BASELINE_SEED_READINGS', '50'))
+
+    # Department-specific rule thresholds (see app/services/rule_thresholds.py)
+    RULE_THRESHOLDS_FILE = os.getenv('RULE_THRESHOLDS_FILE')
+    RULES_RELOAD_INTERVAL_S = int(os.getenv('RULES_RELOAD_INTERVAL_S', '30'))
+
+    # Auto-resolve open alerts after this many consecutive in-range readings (0 disables)
+    ALERT_AUTO_RESOLVE_READINGS = int(os.getenv('ALERT_AUTO_RESOLVE_READINGS', '3'))
+
+    # Alert engine consumer batching
+    ALERT_ENGINE_BATCH_SIZE = int(os.getenv('ALERT_ENGINE_BATCH_SIZE', '500'))
+    ALERT_ENGINE_POLL_TIMEOUT_MS = int(os.getenv('ALERT_ENGINE_POLL_TIMEOUT_MS', '1000'))
+
+    # Alert engine worker pool (app/services/alert_engine_supervisor.py)
+    ALERT_ENGINE_WORKERS = int(os.getenv('ALERT_ENGINE_WORKERS', '2'))
+    ALERT_ENGINE_REPORT_INTERVAL_S = int(os.getenv('ALERT_ENGINE_REPORT_INTERVAL_S', '30'))
+
+    # Stream consumer retry / dead-letter policy (app/core/stream.py)
+    STREAM_RETRY_ATTEMPTS = int(os.getenv('STREAM_RETRY_ATTEMPTS', '5'))
+    STREAM_RETRY_BASE_DELAY_S = float(os.getenv('STREAM_RETRY_BASE_DELAY_S', '0.5'))
+    STREAM_RETRY_MAX_DELAY_S = float(os.getenv('STREAM_RETRY_MAX_DELAY_S', '30'))
+    STREAM_DLQ_SUFFIX = os.getenv('STREAM_DLQ_SUFFIX', '.dlq')
+
+    # Stream consumer metrics (app/core/metrics.py); port 0 disables the endpoint
+    STREAM_LAG_SAMPLE_INTERVAL_S = float(os.getenv('STREAM_LAG_SAMPLE_INTERVAL_S', '10'))
+    ALERT_ENGINE_METRICS_PORT = int(os.getenv('ALERT_ENGINE_METRICS_PORT', '9101'))
+    COPILOT_METRICS_PORT = int(os.getenv('COPILOT_METRICS_PORT', '9201'))
+
+    # Stream consumer restarts (app/core/stream.py): partitions the group has never
+    # committed start at most STREAM_MAX_REPLAY_AGE_S back; while lag is above
+    # STREAM_CATCHUP_LAG the alert engine polls STREAM_CATCHUP_BATCH_SIZE records at a time
+    STREAM_MAX_REPLAY_AGE_S = int(os.getenv('STREAM_MAX_REPLAY_AGE_S', '21600'))
+    STREAM_CATCHUP_LAG = int(os.getenv('STREAM_CATCHUP_LAG', '5000'))
+    STREAM_CATCHUP_BATCH_SIZE = int(os.getenv('STREAM_CATCHUP_BATCH_SIZE', '5000'))
+
+    # Alert copilot: explanations generated concurrently, fetching paused at COPILOT_MAX_IN_FLIGHT
+    COPILOT_CONCURRENCY = int(os.getenv('COPILOT_CONCURRENCY', '4'))
+    COPILOT_MAX_IN_FLIGHT = int(os.getenv('COPILOT_MAX_IN_FLIGHT', '64'))
+    # Queue-wait SLOs per severity ("severity:seconds,..."); queued alerts of the
+    # COPILOT_SHED_SEVERITIES get a template explanation instead of the LLM once
+    # they miss their SLO or COPILOT_SHED_BACKLOG alerts are waiting
+    COPILOT_SLO_S = {
+        severity.strip(): float(seconds)
+        for severity, seconds in (item.split(':') for item in os.getenv(
+            'COPILOT_SLO_S', 'critical:15,high:60,medium:300,low:900').split(',') if item.strip())
+    }
+    COPILOT_SHED_SEVERITIES = [s.strip() for s in os.getenv('COPILOT_SHED_SEVERITIES', 'medium,low').split(',') if s.strip()]
+    COPILOT_SHED_BACKLOG = int(os.getenv('COPILOT_SHED_BACKLOG', '16'))
+    # Explanation route per alert type ("TYPE:rule|llm,..."): 'rule' explains routine
+    # single-parameter alerts from the vitals trend without the LLM; unlisted types
+    # and COPILOT_LLM_SEVERITIES always go to the LLM
+    COPILOT_EXPLANATION_ROUTES = {
+        alert_type.strip().upper(): route.strip()
+        for alert_type, route in (item.split(':') for item in os.getenv(
+            'COPILOT_EXPLANATION_ROUTES',
+            'TACHYCARDIA:rule,BRADYCARDIA:rule,HYPOXIA:rule,FEVER:rule,HYPERTENSION:rule,'
+            'HYPOTENSION:rule,TACHYPNEA:rule,BRADYPNEA:rule').split(',') if item.strip())
+    }
+    COPILOT_LLM_SEVERITIES = [s.strip() for s in os.getenv('COPILOT_LLM_SEVERITIES', 'critical').split(',') if s.strip()]
+    # Alerts for the same encounter arriving within the window share one LLM call
+    # (up to COPILOT_COALESCE_MAX_ALERTS per call); 0 disables the wait. Critical alerts
+    # only hold their batch for the shorter critical window
+    COPILOT_COALESCE_WINDOW_S = float(os.getenv('COPILOT_COALESCE_WINDOW_S', '0.5'))
+    COPILOT_COALESCE_CRITICAL_WINDOW_S = float(os.getenv('COPILOT_COALESCE_CRITICAL_WINDOW_S', '0.1'))
+    COPILOT_COALESCE_MAX_ALERTS = int(os.getenv('COPILOT_COALESCE_MAX_ALERTS', '8'))
+
+    # LLM runtime (app/llm/runtime.py): one pooled keep-alive HTTP client per process
+    LLM_CONNECT_TIMEOUT_S = float(os.getenv('LLM_CONNECT_TIMEOUT_S', '5'))
+    LLM_TIMEOUT_S = float(os.getenv('LLM_TIMEOUT_S', '120'))
+    LLM_MAX_CONNECTIONS = int(os.getenv('LLM_MAX_CONNECTIONS', '16'))
+    LLM_KEEPALIVE_EXPIRY_S = float(os.getenv('LLM_KEEPALIVE_EXPIRY_S', '300'))
+    # How long Ollama keeps the model loaded after a request (e.g. "30m"; unset = server default)
+    LLM_MODEL_KEEP_ALIVE = os.getenv('LLM_MODEL_KEEP_ALIVE')
+    # Callers stop waiting after the task's timeout ("task:seconds,..."; others use LLM_TIMEOUT_S)
+    LLM_TASK_TIMEOUT_S = {
+        task.strip(): float(seconds)
+        for task, seconds in (item.split(':') for item in os.getenv(
+            'LLM_TASK_TIMEOUT_S',
+            'discharge_plan:60,discharge_draft:60,alert_explanation:30,alert_batch_explanation:60,healthcheck:10').split(',') if item.strip())
+    }
+    # Background LLM health probe interval; /llm/health answers from the last probe (0 = live checks)
+    LLM_HEALTH_INTERVAL_S = float(os.getenv('LLM_HEALTH_INTERVAL_S', '30'))
+    # Circuit breaker: open after LLM_BREAKER_FAILURES consecutive failures and
+    # serve fallbacks; probe again after LLM_BREAKER_RESET_S
+    LLM_BREAKER_FAILURES = int(os.getenv('LLM_BREAKER_FAILURES', '5'))
+    LLM_BREAKER_RESET_S = float(os.getenv('LLM_BREAKER_RESET_S', '30'))
+
+    # Discharge plan jobs (app/services/discharge_jobs.py): plans are generated off the
+    # request path by DISCHARGE_JOB_CONCURRENCY worker threads per process (0 = no worker
+    # here, e.g. when scripts/run_discharge_worker.py runs them), with retries and backoff
+    DISCHARGE_JOB_CONCURRENCY = int(os.getenv('DISCHARGE_JOB_CONCURRENCY', '2'))
+    DISCHARGE_JOB_MAX_ATTEMPTS = int(os.getenv('DISCHARGE_JOB_MAX_ATTEMPTS', '3'))
+    DISCHARGE_JOB_RETRY_BACKOFF_S = float(os.getenv('DISCHARGE_JOB_RETRY_BACKOFF_S', '10'))
+    DISCHARGE_JOB_POLL_S = float(os.getenv('DISCHARGE_JOB_POLL_S', '2'))
+    # Running jobs not finished after this long (worker crashed) are picked up again
+    DISCHARGE_JOB_STALE_S = float(os.getenv('DISCHARGE_JOB_STALE_S', '600'))
+    # Draft plans for stable encounters while the LLM is idle (app/services/discharge_drafts.py):
+    # checked every DISCHARGE_DRAFT_INTERVAL_S (0 = off, e.g. on all but one process), at most
+    # DISCHARGE_DRAFT_BATCH new drafts per check. An unstable encounter is checked again on a
+    # new alert or observation, or after DISCHARGE_DRAFT_RECHECK_S (alerts age out of the window)
+    DISCHARGE_DRAFT_INTERVAL_S = float(os.getenv('DISCHARGE_DRAFT_INTERVAL_S', '60'))
+    DISCHARGE_DRAFT_BATCH = int(os.getenv('DISCHARGE_DRAFT_BATCH', '3'))
+    DISCHARGE_DRAFT_RECHECK_S = float(os.getenv('DISCHARGE_DRAFT_RECHECK_S', '900'))
+
+    # Alert explanation cache shared by copilot workers (app/services/explanation_cache.py); TTL 0 disables
+    EXPLANATION_CACHE_TTL_S = int(os.getenv('EXPLANATION_CACHE_TTL_S', '3600'))
+    EXPLANATION_CACHE_MAX_ENTRIES = int(os.getenv('EXPLANATION_CACHE_MAX_ENTRIES', '1000'))
+
+    # Message bus backend: 'kafka', or 'memory' for single-process deployments (app/core/bus.py)
+    MESSAGE_BUS = os.getenv('MESSAGE_BUS', 'kafka')
+    BUS_QUEUE_SIZE = int(os.getenv('BUS_QUEUE_SIZE', '10000'))
+    BUS_PUBLISH_TIMEOUT_S = float(os.getenv('BUS_PUBLISH_TIMEOUT_S', '5'))
@@ -1,6 +1,7 @@
 import json
 from kafka import KafkaProducer
 from app.core.config import Config
+from app.core.bus import InMemoryProducer, uses_memory_bus
 import logging
 
 logger = logging.getLogger(__name__)
@@ -10,11 +11,15 @@ class KafkaClient:
 
     @classmethod
     def get_producer(cls):
+        if cls._producer is None and uses_memory_bus():
+            # Single-node mode: hand messages to in-process consumers as-is
+            cls._producer = InMemoryProducer()
         if cls._producer is None:
             try:
                 cls._producer = KafkaProducer(
                     bootstrap_servers=Config.KAFKA_BOOTSTRAP_SERVERS,
                     value_serializer=lambda v: json.dumps(v).encode('utf-8'),
+                    key_serializer=lambda k: str(k).encode('utf-8') if k is not None else None,
                     api_version=(2, 0, 0) # Fix for UnrecognizedBrokerVersion
                 )
                 logger.info("Kafka producer initialized")
@@ -23,14 +28,46 @@ class KafkaClient:
         return cls._producer
 
     @classmethod
-    def send_message(cls, topic, message):
+    def send_message(cls, topic, message, key=None):
         producer = cls.get_producer()
         if producer:
             try:
-                producer.send(topic, message)
+                producer.send(topic, message, key=key)
                 producer.flush()
                 logger.info(f"Sent message to {topic}")
             except Exception as e:
                 logger.error(f"Failed to send message to {topic}: {e}")
         else:
             logger.warning("Kafka producer not available, skipping message")
+
+    @classmethod
+    def send_batch(cls, topic, messages):
+        """
+        Sends several messages and flushes once, instead of once per message.
+        """
+        producer = cls.get_producer()
+        if producer:
+            try:
+                for message in messages:
+                    producer.send(topic, message)
+                producer.flush()
+                logger.info(f"Sent {len(messages)} messages to {topic}")
+            except Exception as e:
+                logger.error(f"Failed to send batch to {topic}: {e}")
+        else:
+            logger.warning("Kafka producer not available, skipping batch")
+
+    @classmethod
+    def send_durable(cls, topic, messages, timeout_s=10):
+        """
+        Sends messages and waits for the broker to acknowledge every one.
+        Unlike send_message/send_batch, failures are raised to the caller.
+        """
+        producer = cls.get_producer()
+        if producer is None:
+            raise ConnectionError("Kafka producer not available")
+        futures = [producer.send(topic, message) for message in messages]
+        producer.flush()
+        for future in futures:
+            future.get(timeout=timeout_s)
+        logger.info(f"Sent {len(messages)} messages to {topic}")
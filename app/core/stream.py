@@ -0,0 +1,634 @@
+"""
+Shared poll/process/commit loop for the Kafka stream consumers.
+
+Every consumer gets the same failure handling:
+
+* transient errors (database or broker unavailable) are retried with bounded
+  exponential backoff; if they persist, the unprocessed records are rewound
+  and redelivered rather than dropped;
+* permanent errors (bad payloads, constraint violations, bugs) are isolated
+  to the offending message, which is published to `<topic>.dlq` with error
+  metadata so the rest of the partition keeps flowing. Messages can be
+  pushed back from the DLQ with scripts/replay_dlq.py once fixed.
+
+Offsets are committed manually, only after a batch is processed or
+dead-lettered. On SIGTERM / SIGINT (`GracefulShutdown`) the loop finishes the
+batch in hand, commits it and returns, so a restart resumes exactly where the
+previous process stopped. Consumers start with auto_offset_reset='earliest'
+and `BoundedResumeListener`: a partition with committed offsets resumes from
+them, one the group has never committed starts at most
+STREAM_MAX_REPLAY_AGE_S back. After downtime, a consumer created with
+`catchup_max_records` polls in large batches until its lag falls below
+STREAM_CATCHUP_LAG.
+
+Each consumer records throughput, batch sizes, processing latency, error
+counts and per-partition lag into app.core.metrics.REGISTRY, labelled with
+its consumer group.
+"""
+import json
+import logging
+import heapq
+import itertools
+import random
+import signal
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import datetime
+from kafka import ConsumerRebalanceListener, OffsetAndMetadata, TopicPartition
+from sqlalchemy.exc import DBAPIError, DisconnectionError, InterfaceError, OperationalError
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from app.core.config import Config
+from app.core.kafka_client import KafkaClient
+from app.core.metrics import REGISTRY
+from app.core.bus import InMemoryConsumer
+
+logger = logging.getLogger(__name__)
+
+TRANSIENT_ERRORS = (
+    OperationalError,
+    InterfaceError,
+    DisconnectionError,
+    PoolTimeoutError,
+    ConnectionError,
+    TimeoutError,
+)
+
+
+MESSAGES = REGISTRY.counter(
+    'stream_messages_total', 'Messages handled by stream consumers, by outcome', ('consumer', 'outcome'))
+ERRORS = REGISTRY.counter(
+    'stream_handler_errors_total', 'Handler failures, by kind (transient / permanent)', ('consumer', 'kind'))
+BATCH_SIZE = REGISTRY.histogram(
+    'stream_batch_size', 'Records returned per poll', ('consumer',),
+    buckets=(1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000))
+PROCESSING_SECONDS = REGISTRY.histogram(
+    'stream_batch_processing_seconds', 'Time to process, dead-letter and commit one poll', ('consumer',))
+LAG = REGISTRY.gauge(
+    'stream_consumer_lag', 'Messages between the committed position and the log end', ('consumer', 'topic', 'partition'))
+THROUGHPUT = REGISTRY.gauge(
+    'stream_messages_per_second', 'Messages handled per second over the last lag sample interval', ('consumer',))
+IN_FLIGHT = REGISTRY.gauge(
+    'stream_in_flight', 'Records dispatched to worker threads and not yet committed', ('consumer',))
+QUEUE_WAIT = REGISTRY.histogram(
+    'stream_queue_wait_seconds', 'Time records waited for a free worker thread', ('consumer',),
+    buckets=(0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 120, 300, 600))
+
+
+def is_transient(exc):
+    """True for errors worth retrying: lost connections, timeouts, retriable Kafka errors."""
+    if isinstance(exc, TRANSIENT_ERRORS):
+        return True
+    if isinstance(exc, DBAPIError) and exc.connection_invalidated:
+        return True
+    return bool(getattr(exc, 'retriable', False))
+
+
+def dlq_topic(topic):
+    return f"{topic}{Config.STREAM_DLQ_SUFFIX}"
+
+
+def partition_lag(consumer):
+    """
+    Lag per assigned partition. Uses the high watermark cached from the last
+    fetch response, so it costs no broker round trip; only partitions not
+    fetched yet fall back to an end_offsets request.
+    """
+    lag, unknown = {}, []
+    for tp in consumer.assignment():
+        highwater = consumer.highwater(tp)
+        if highwater is None:
+            unknown.append(tp)
+        else:
+            lag[tp] = max(highwater - consumer.position(tp), 0)
+    if unknown:
+        for tp, end_offset in consumer.end_offsets(unknown).items():
+            lag[tp] = max(end_offset - consumer.position(tp), 0)
+    return lag
+
+
+def decode_json(raw):
+    return json.loads(raw.decode('utf-8'))
+
+
+def passthrough(value):
+    return value
+
+
+class GracefulShutdown:
+    """
+    Stop flag for consumer loops, set by SIGTERM / SIGINT or by any of the
+    `external` events. Signal handlers are only installed from the main thread
+    (Python's restriction), and SIGINT is left alone where it is ignored, as in
+    supervised worker processes.
+    """
+
+    def __init__(self, *external):
+        self.event = threading.Event()
+        self.external = [e for e in external if e is not None]
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGTERM, self._handle)
+            if signal.getsignal(signal.SIGINT) is not signal.SIG_IGN:
+                signal.signal(signal.SIGINT, self._handle)
+
+    def _handle(self, signum, frame):
+        logger.info(f"Received {signal.Signals(signum).name}; finishing in-flight batch before exiting")
+        self.event.set()
+
+    def set(self):
+        self.event.set()
+
+    def is_set(self):
+        return self.event.is_set() or any(e.is_set() for e in self.external)
+
+
+class BoundedResumeListener(ConsumerRebalanceListener):
+    """
+    Resumes assigned partitions from the group's committed offsets. Partitions
+    without a committed offset (new group or new partition) would otherwise
+    replay the whole retained log under auto_offset_reset='earliest'; they are
+    moved to the first message newer than `max_age_s` instead. Other callbacks
+    are delegated to `inner`, after the positions are set.
+    """
+
+    def __init__(self, consumer, inner=None, max_age_s=None):
+        self.consumer = consumer
+        self.inner = inner
+        self.max_age_s = max_age_s if max_age_s is not None else Config.STREAM_MAX_REPLAY_AGE_S
+
+    def on_partitions_revoked(self, revoked):
+        if self.inner:
+            self.inner.on_partitions_revoked(revoked)
+
+    def on_partitions_assigned(self, assigned):
+        try:
+            fresh = [tp for tp in assigned if self.consumer.committed(tp) is None]
+            if fresh:
+                since_ms = int((time.time() - self.max_age_s) * 1000)
+                found = self.consumer.offsets_for_times({tp: since_ms for tp in fresh})
+                for tp in fresh:
+                    if found.get(tp) is None:
+                        self.consumer.seek_to_end(tp)
+                    else:
+                        self.consumer.seek(tp, found[tp].offset)
+                logger.info(f"No committed offsets for {sorted(tp.partition for tp in fresh)}; "
+                            f"starting at most {self.max_age_s}s back")
+        except Exception as e:
+            logger.error(f"Failed to position partitions without committed offsets: {e}")
+        if self.inner:
+            self.inner.on_partitions_assigned(assigned)
+
+
+class RetryPolicy:
+    """Bounded exponential backoff with jitter for transient errors."""
+
+    def __init__(self, max_attempts=None, base_delay_s=None, max_delay_s=None, sleep=time.sleep):
+        self.max_attempts = max_attempts or Config.STREAM_RETRY_ATTEMPTS
+        self.base_delay_s = base_delay_s if base_delay_s is not None else Config.STREAM_RETRY_BASE_DELAY_S
+        self.max_delay_s = max_delay_s if max_delay_s is not None else Config.STREAM_RETRY_MAX_DELAY_S
+        self.sleep = sleep
+
+    def backoff(self, attempt):
+        delay = min(self.base_delay_s * 2 ** (attempt - 1), self.max_delay_s)
+        return delay * random.uniform(0.5, 1.0)
+
+    def call(self, fn, *args):
+        """
+        Calls `fn`, retrying transient errors up to `max_attempts` times in total.
+        Permanent errors, and transient ones that outlast the retries, are raised.
+        """
+        attempt = 1
+        while True:
+            try:
+                return fn(*args)
+            except Exception as e:
+                if not is_transient(e) or attempt >= self.max_attempts:
+                    raise
+                delay = self.backoff(attempt)
+                logger.warning(f"Transient error (attempt {attempt}/{self.max_attempts}), retrying in {delay:.1f}s: {e}")
+                self.sleep(delay)
+                attempt += 1
+
+
+class StreamConsumer:
+    """
+    Wraps a subscribed KafkaConsumer (raw bytes values, auto commit disabled)
+    or InMemoryConsumer (values are the published objects; not decoded).
+
+    `process_message(value)` handles one decoded message. If `process_batch`
+    is given, each poll is first handed to it as a list; when that fails with
+    a permanent error the batch is re-run message by message to isolate the
+    poison message(s).
+
+    With `catchup_max_records`, the consumer starts in catch-up mode: polls
+    return up to that many records, and lag is checked after every poll until
+    it drops to `catchup_lag`, when the normal `max_records` takes over.
+    """
+
+    def __init__(self, consumer, topic, process_message, process_batch=None, retry=None,
+                 max_records=500, timeout_ms=1000, decode=None, name=None,
+                 lag_interval_s=None, catchup_max_records=None, catchup_lag=None):
+        self.consumer = consumer
+        self.name = name or getattr(consumer, 'config', {}).get('group_id') or topic
+        self.topic = topic
+        self.dlq_topic = dlq_topic(topic)
+        self.process_message = process_message
+        self.process_batch = process_batch
+        self.retry = retry or RetryPolicy()
+        self.max_records = max_records
+        self.timeout_ms = timeout_ms
+        self.decode = decode or (passthrough if isinstance(consumer, InMemoryConsumer) else decode_json)
+        self.processed = 0
+        self.dead_lettered = 0
+        self.lag = {}
+        self.lag_interval_s = lag_interval_s if lag_interval_s is not None else Config.STREAM_LAG_SAMPLE_INTERVAL_S
+        self._last_sample = time.monotonic()
+        self._handled_since_sample = 0
+        self.catchup_max_records = catchup_max_records
+        self.catchup_lag = catchup_lag if catchup_lag is not None else Config.STREAM_CATCHUP_LAG
+        self.catching_up = bool(catchup_max_records)
+
+    @property
+    def total_lag(self):
+        return sum(self.lag.values())
+
+    def run(self, stop_event=None, on_idle=None):
+        """
+        Polls until `stop_event` is set; `on_idle` is called after every poll.
+        The check happens between polls, so the last batch is always finished
+        and committed before returning.
+        """
+        while stop_event is None or not stop_event.is_set():
+            self.poll_once()
+            if on_idle:
+                on_idle()
+
+    def poll_once(self):
+        """
+        Polls and handles one batch. Returns the number of records processed
+        or dead-lettered (rewound records are not counted).
+        """
+        max_records = self.catchup_max_records if self.catching_up else self.max_records
+        batch = self.consumer.poll(timeout_ms=self.timeout_ms, max_records=max_records)
+        records = [record for partition_records in batch.values() for record in partition_records]
+        handled = 0
+        if records:
+            BATCH_SIZE.observe(len(records), consumer=self.name)
+            with PROCESSING_SECONDS.time(consumer=self.name):
+                handled = self._handle(records)
+            self._handled_since_sample += handled
+            if handled < len(records):
+                # Persistent transient failure: back off before redelivery
+                self.retry.sleep(self.retry.backoff(self.retry.max_attempts))
+        if self.catching_up:
+            self._check_caught_up()
+        self._maybe_sample_lag()
+        return handled
+
+    def _check_caught_up(self):
+        if not self.consumer.assignment():
+            return
+        try:
+            lag = sum(partition_lag(self.consumer).values())
+        except Exception as e:
+            logger.warning(f"Failed to check catch-up lag: {e}")
+            return
+        if lag <= self.catchup_lag:
+            self.catching_up = False
+            logger.info(f"{self.name}: caught up (lag {lag}); batch size back to {self.max_records}")
+
+    def _handle(self, records):
+        entries, dead = [], []
+        for record in records:
+            try:
+                entries.append((record, self.decode(record.value)))
+            except Exception as e:
+                logger.error(f"Undecodable message at {record.topic}[{record.partition}]@{record.offset}: {e}")
+                dead.append((record, self._dead_letter(record, e)))
+
+        unhandled = [record for record, _ in self._process(entries, dead)]
+
+        dead_lettered = 0
+        if dead:
+            try:
+                KafkaClient.send_durable(self.dlq_topic, [payload for _, payload in dead])
+                dead_lettered = len(dead)
+            except Exception as e:
+                logger.error(f"Failed to publish {len(dead)} messages to {self.dlq_topic}: {e}")
+                unhandled.extend(record for record, _ in dead)
+
+        if unhandled:
+            self._rewind(unhandled)
+        try:
+            self.consumer.commit()
+        except Exception as e:
+            # e.g. a rebalance took the partitions away; the new owner redelivers
+            logger.error(f"Failed to commit offsets: {e}")
+
+        handled = len(records) - len(unhandled)
+        self.processed += handled - dead_lettered
+        self.dead_lettered += dead_lettered
+        MESSAGES.inc(handled - dead_lettered, consumer=self.name, outcome='processed')
+        if dead_lettered:
+            MESSAGES.inc(dead_lettered, consumer=self.name, outcome='dead_lettered')
+        if unhandled:
+            MESSAGES.inc(len(unhandled), consumer=self.name, outcome='redelivered')
+        return handled
+
+    def _process(self, entries, dead):
+        """
+        Runs the handlers over decoded entries, appending permanent failures to
+        `dead`. Returns the entries left unprocessed by a persistent transient error.
+        """
+        if not entries:
+            return []
+
+        if self.process_batch is not None:
+            try:
+                self._call(self.process_batch, [value for _, value in entries])
+                return []
+            except Exception as e:
+                if is_transient(e):
+                    logger.error(f"Batch of {len(entries)} messages failed after retries, will redeliver: {e}")
+                    return entries
+                logger.warning(f"Batch of {len(entries)} messages failed ({e}); retrying one by one")
+
+        for index, (record, value) in enumerate(entries):
+            try:
+                self._call(self.process_message, value)
+            except Exception as e:
+                if is_transient(e):
+                    logger.error(f"Message at {record.topic}[{record.partition}]@{record.offset} failed after retries, will redeliver: {e}")
+                    return entries[index:]
+                logger.error(f"Dead-lettering message at {record.topic}[{record.partition}]@{record.offset}: {e}")
+                dead.append((record, self._dead_letter(record, e)))
+        return []
+
+    def _call(self, handler, *args):
+        """Runs a handler under the retry policy, counting every failed attempt."""
+        def attempt():
+            try:
+                return handler(*args)
+            except Exception as e:
+                ERRORS.inc(consumer=self.name, kind='transient' if is_transient(e) else 'permanent')
+                raise
+        return self.retry.call(attempt)
+
+    def _maybe_sample_lag(self):
+        now = time.monotonic()
+        elapsed = now - self._last_sample
+        if elapsed < self.lag_interval_s:
+            return
+        THROUGHPUT.set(round(self._handled_since_sample / elapsed, 2), consumer=self.name)
+        self._handled_since_sample = 0
+        self._last_sample = now
+        try:
+            self.lag = partition_lag(self.consumer)
+        except Exception as e:
+            logger.warning(f"Failed to sample consumer lag: {e}")
+            return
+        LAG.clear(consumer=self.name)
+        for tp, lag in self.lag.items():
+            LAG.set(lag, consumer=self.name, topic=tp.topic, partition=tp.partition)
+
+    def _rewind(self, records):
+        """Seeks every affected partition back to its first unhandled record."""
+        earliest = {}
+        for record in records:
+            tp = TopicPartition(record.topic, record.partition)
+            earliest[tp] = min(earliest.get(tp, record.offset), record.offset)
+        for tp, offset in earliest.items():
+            self.consumer.seek(tp, offset)
+
+    def _dead_letter(self, record, error):
+        try:
+            value, raw_value = self.decode(record.value), None
+        except Exception:
+            value, raw_value = None, record.value.decode('utf-8', errors='replace')
+        return {
+            'source_topic': record.topic,
+            'partition': record.partition,
+            'offset': record.offset,
+            'key': record.key.decode('utf-8', errors='replace') if record.key is not None else None,
+            'value': value,
+            'raw_value': raw_value,
+            'error': str(error),
+            'error_type': type(error).__name__,
+            'consumer_group': getattr(self.consumer, 'config', {}).get('group_id'),
+            'failed_at': datetime.utcnow().isoformat(),
+        }
+
+
+class ConcurrentStreamConsumer(StreamConsumer):
+    """
+    StreamConsumer for slow, independent messages (e.g. one LLM call each).
+
+    Records are dispatched to a pool of `concurrency` threads while the poll
+    loop keeps fetching, with at most `max_in_flight` records outstanding.
+    Once that limit is reached every assigned partition is paused, so polls
+    keep the consumer in its group without fetching more, and resumed when
+    the workers catch up.
+
+    Retries, dead-lettering and rewinds work as in StreamConsumer, per
+    message. Offsets are committed per partition only up to the first record
+    that has not finished, so a crash never skips unfinished work; records
+    finished after it may be processed again, so handlers must be idempotent.
+
+    Records waiting for a worker are started in arrival order, or, with
+    `priority`, lowest `priority(value)` first (ties in arrival order). With
+    `priority` the handler is called as `process_message(value, waited_s)`,
+    so it can shed work that has queued too long.
+
+    Use the instance as the rebalance listener (or BoundedResumeListener's
+    `inner`) so revoked partitions are drained and committed before they move.
+    """
+
+    def __init__(self, consumer, topic, process_message, concurrency=4, max_in_flight=None, priority=None, **kwargs):
+        super().__init__(consumer, topic, process_message, **kwargs)
+        self.concurrency = concurrency
+        self.max_in_flight = max_in_flight or concurrency * 4
+        self.priority = priority
+        self._executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix=f"{self.name}-worker")
+        # TopicPartition -> deque of (record, future); futures resolve to None or the handler's exception
+        self._pending = {}
+        self._paused = False
+        # Records not started yet: heap of (priority, seq, queued_at, value, future)
+        self._queue = []
+        self._queue_lock = threading.Lock()
+        self._seq = itertools.count()
+
+    @property
+    def in_flight(self):
+        return sum(len(queue) for queue in self._pending.values())
+
+    @property
+    def backlog(self):
+        """Records dispatched but not yet picked up by a worker."""
+        return len(self._queue)
+
+    def run(self, stop_event=None, on_idle=None):
+        """Polls until `stop_event` is set, then finishes and commits everything in flight."""
+        try:
+            super().run(stop_event, on_idle)
+        finally:
+            self.drain()
+            self._executor.shutdown(wait=True)
+
+    def poll_once(self):
+        """
+        Dispatches newly fetched records and retires finished ones. Returns the
+        number of records processed or dead-lettered by this call.
+        """
+        self._set_paused(self.in_flight >= self.max_in_flight)
+        if self._paused:
+            # Nothing to fetch: wait for a worker instead, then poll without
+            # blocking to keep heartbeats and rebalances going
+            wait([f for queue in self._pending.values() for _, f in queue],
+                 timeout=self.timeout_ms / 1000.0, return_when=FIRST_COMPLETED)
+            batch = self.consumer.poll(timeout_ms=0, max_records=1)
+        else:
+            batch = self.consumer.poll(timeout_ms=self.timeout_ms, max_records=self.max_in_flight - self.in_flight)
+
+        records = [record for partition_records in batch.values() for record in partition_records]
+        if records:
+            BATCH_SIZE.observe(len(records), consumer=self.name)
+            for record in records:
+                self._dispatch(record)
+
+        handled = self._complete()
+        self._handled_since_sample += handled
+        IN_FLIGHT.set(self.in_flight, consumer=self.name)
+        self._maybe_sample_lag()
+        return handled
+
+    def drain(self, partitions=None):
+        """Waits for the in-flight records of `partitions` (default all), then retires and commits them."""
+        partitions = self._pending.keys() if partitions is None else partitions
+        wait([f for tp in partitions for _, f in self._pending.get(tp, ())])
+        return self._complete()
+
+    def on_partitions_revoked(self, revoked):
+        if revoked:
+            self.drain(revoked)
+        for tp in revoked:
+            self._pending.pop(tp, None)
+
+    def on_partitions_assigned(self, assigned):
+        pass
+
+    def _set_paused(self, paused):
+        assignment = self.consumer.assignment()
+        if paused:
+            # Re-applied on every poll: partitions assigned since are paused too
+            self.consumer.pause(*assignment)
+            if not self._paused:
+                logger.info(f"{self.name}: {self.in_flight} records in flight; pausing fetches")
+        elif self._paused:
+            self.consumer.resume(*assignment)
+        self._paused = paused
+
+    def _dispatch(self, record):
+        tp = TopicPartition(record.topic, record.partition)
+        try:
+            value = self.decode(record.value)
+        except Exception as e:
+            logger.error(f"Undecodable message at {record.topic}[{record.partition}]@{record.offset}: {e}")
+            future = Future()
+            future.set_result(e)
+        else:
+            future = Future()
+            key = self.priority(value) if self.priority else 0
+            with self._queue_lock:
+                heapq.heappush(self._queue, (key, next(self._seq), time.monotonic(), value, future))
+            # Each submitted task runs whichever queued record is most urgent then
+            self._executor.submit(self._work_next)
+        self._pending.setdefault(tp, deque()).append((record, future))
+
+    def _work_next(self):
+        with self._queue_lock:
+            _, _, queued_at, value, future = heapq.heappop(self._queue)
+        if not future.set_running_or_notify_cancel():
+            return
+        waited_s = time.monotonic() - queued_at
+        QUEUE_WAIT.observe(waited_s, consumer=self.name)
+        args = (value, waited_s) if self.priority else (value,)
+        try:
+            self._call(self.process_message, *args)
+        except Exception as e:
+            future.set_result(e)
+            return
+        future.set_result(None)
+
+    def _complete(self):
+        """
+        Retires finished records from the head of each partition's queue, in
+        offset order: dead-letters permanent failures, rewinds a partition at
+        a record that failed transiently, and commits up to the first
+        unfinished record. Returns the number of records retired.
+        """
+        commit_at, rewind_at, dead = {}, {}, []
+        processed = 0
+        for tp, queue in self._pending.items():
+            while queue and queue[0][1].done():
+                record, future = queue[0]
+                error = future.result()
+                if error is not None and is_transient(error):
+                    logger.error(f"Message at {tp.topic}[{tp.partition}]@{record.offset} failed after retries, will redeliver: {error}")
+                    rewind_at[tp] = record.offset
+                    break
+                queue.popleft()
+                if error is None:
+                    processed += 1
+                else:
+                    logger.error(f"Dead-lettering message at {tp.topic}[{tp.partition}]@{record.offset}: {error}")
+                    dead.append((record, self._dead_letter(record, error)))
+                commit_at[tp] = record.offset + 1
+
+        dead_lettered = 0
+        if dead:
+            try:
+                KafkaClient.send_durable(self.dlq_topic, [payload for _, payload in dead])
+                dead_lettered = len(dead)
+            except Exception as e:
+                logger.error(f"Failed to publish {len(dead)} messages to {self.dlq_topic}: {e}")
+                for record, _ in dead:
+                    tp = TopicPartition(record.topic, record.partition)
+                    rewind_at[tp] = min(rewind_at.get(tp, record.offset), record.offset)
+                    commit_at[tp] = min(commit_at[tp], rewind_at[tp])
+
+        redelivered = 0
+        for tp, offset in rewind_at.items():
+            redelivered += self._rewind_partition(tp, offset)
+        if commit_at:
+            try:
+                self.consumer.commit({tp: OffsetAndMetadata(offset, '') for tp, offset in commit_at.items()})
+            except Exception as e:
+                # e.g. a rebalance took the partitions away; the new owner redelivers
+                logger.error(f"Failed to commit offsets: {e}")
+
+        self.processed += processed
+        self.dead_lettered += dead_lettered
+        if processed:
+            MESSAGES.inc(processed, consumer=self.name, outcome='processed')
+        if dead_lettered:
+            MESSAGES.inc(dead_lettered, consumer=self.name, outcome='dead_lettered')
+        if redelivered:
+            MESSAGES.inc(redelivered, consumer=self.name, outcome='redelivered')
+            # Persistent transient failure: back off before redelivery
+            self.retry.sleep(self.retry.backoff(self.retry.max_attempts))
+        return processed + dead_lettered
+
+    def _rewind_partition(self, tp, offset):
+        """
+        Drops the partition's queue and seeks back to `offset`. Records already
+        running are waited for (they cannot be interrupted) and redone after
+        the seek. Returns the number of records dropped.
+        """
+        queue = self._pending.pop(tp, deque())
+        for _, future in queue:
+            future.cancel()
+        wait([future for _, future in queue])
+        self.consumer.seek(tp, offset)
+        return len(queue)
+
@@ -1,4 +1,5 @@
-from flask import jsonify
+import json
+from flask import jsonify, Response, stream_with_context
 
 def api_response(data=None, message=None, status_code=200, error=None):
     response = {
@@ -15,3 +16,19 @@ def api_response(data=None, message=None, status_code=200, error=None):
         response['error'] = error
         
     return jsonify(response), status_code
+
+def sse_response(events):
+    """
+    Streams `events` as Server-Sent Events. Each item is an (event, data)
+    pair, with data sent as JSON; None items are sent as keep-alive comments.
+    """
+    def generate():
+        for item in events:
+            if item is None:
+                yield ": keep-alive\n\n"
+                continue
+            event, data = item
+            yield f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
@@ -1,6 +1,6 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Float, Text, ARRAY
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Float, Text, ARRAY, UniqueConstraint, Index
 from sqlalchemy.orm import relationship
-from sqlalchemy.sql import func
+from sqlalchemy.sql import func, text
 from app.core.database import Base
 
 class User(Base):
@@ -103,10 +103,20 @@ class Alert(Base):
     message = Column(String)
     resolved = Column(Boolean, default=False)
     resolved_at = Column(DateTime(timezone=True), nullable=True)
+    resolution_reason = Column(String, nullable=True) # "manual" or "auto: ..."
     
     patient = relationship("Patient")
     encounter = relationship("Encounter")
 
+# Natural key: one alert per encounter, rule type and reading timestamp, so a
+# redelivered or doubly evaluated reading cannot create a second alert. Type is
+# compared case-insensitively because the API path and the stream consumer name
+# the same rule 'tachycardia' / 'TACHYCARDIA'. Readings without an encounter
+# raise alerts with a NULL encounter_id, which must dedupe too (NULLS NOT
+# DISTINCT, Postgres 15+).
+ALERT_NATURAL_KEY = (Alert.encounter_id, func.lower(Alert.type), Alert.timestamp)
+Index("uq_alerts_natural_key", *ALERT_NATURAL_KEY, unique=True, postgresql_nulls_not_distinct=True)
+
 class DischargePlan(Base):
     __tablename__ = "discharge_plans"
     id = Column(Integer, primary_key=True, index=True)
@@ -145,5 +155,62 @@ class AlertExplanation(Base):
     
     alert = relationship("Alert", back_populates="explanation")
 
+class VitalBaseline(Base):
+    __tablename__ = "vital_baselines"
+    __table_args__ = (UniqueConstraint("encounter_id", "vital", name="uq_vital_baselines_encounter_vital"),)
+    id = Column(Integer, primary_key=True, index=True)
+    encounter_id = Column(Integer, ForeignKey("encounters.id"), index=True)
+    vital = Column(String) # e.g. hr_bpm, spo2_pct
+    mean = Column(Float)
+    variance = Column(Float)
+    samples = Column(Integer)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+class RuleThreshold(Base):
+    __tablename__ = "rule_thresholds"
+    __table_args__ = (
+        UniqueConstraint("department", "key", name="uq_rule_thresholds_department_key"),
+        # NULLs are distinct in the constraint above, so default rows need their own index
+        Index("uq_rule_thresholds_default_key", "key", unique=True, postgresql_where=text("department IS NULL")),
+    )
+    id = Column(Integer, primary_key=True, index=True)
+    department = Column(String, nullable=True) # NULL applies to all departments
+    key = Column(String) # e.g. hr_high, temp_high
+    value = Column(Float)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+class ExplanationCacheEntry(Base):
+    __tablename__ = "explanation_cache"
+    key = Column(String, primary_key=True) # hash of the normalized alert context
+    context = Column(Text) # normalized context JSON, for inspection
+    explanation = Column(Text) # LLM output JSON
+    llm_seconds = Column(Float) # generation time, i.e. what a hit saves
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+
+class DischargePlanJob(Base):
+    __tablename__ = "discharge_plan_jobs"
+    id = Column(Integer, primary_key=True, index=True)
+    encounter_id = Column(Integer, ForeignKey("encounters.id"), index=True)
+    status = Column(String, default="pending", index=True) # pending, running, ready, failed
+    attempts = Column(Integer, default=0)
+    error = Column(Text)
+    next_attempt_at = Column(DateTime(timezone=True), server_default=func.now()) # retry backoff
+    started_at = Column(DateTime(timezone=True)) # latest attempt, to reclaim jobs of a crashed worker
+    finished_at = Column(DateTime(timezone=True))
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class DischargePlanDraft(Base):
+    __tablename__ = "discharge_plan_drafts"
+    id = Column(Integer, primary_key=True, index=True)
+    encounter_id = Column(Integer, ForeignKey("encounters.id"), unique=True)
+    summary = Column(Text)
+    home_care_instructions = Column(Text) # JSON string, as in DischargePlan
+    recommended_meds = Column(Text) # JSON string, as in DischargePlan
+    followup_days = Column(Integer)
+    # Newest alert / observation the draft saw; anything newer invalidates it
+    last_alert_id = Column(Integer)
+    last_observation_id = Column(Integer)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
 # Add relationship to Alert model
 Alert.explanation = relationship("AlertExplanation", back_populates="alert", uselist=False)
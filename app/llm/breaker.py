@@ -0,0 +1,78 @@
+"""
+Circuit breaker for the LLM backend.
+
+After `failure_threshold` consecutive failures the circuit opens and calls
+are rejected immediately (callers serve their fallback) instead of each
+waiting out a timeout. After `reset_timeout_s` one probe call is let through
+(half-open): success closes the circuit, failure opens it again.
+"""
+import logging
+import threading
+import time
+from app.core.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+CIRCUIT_STATE = REGISTRY.gauge(
+    'llm_circuit_state', 'LLM circuit breaker state (0 closed, 1 half-open, 2 open)', ('breaker',))
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the LLM while the circuit is open."""
+
+
+class CircuitBreaker:
+    CLOSED = 'closed'
+    HALF_OPEN = 'half_open'
+    OPEN = 'open'
+    _STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+    def __init__(self, failure_threshold, reset_timeout_s, name='llm', clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout_s = reset_timeout_s
+        self.name = name
+        self.clock = clock
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+        CIRCUIT_STATE.set(0, breaker=name)
+
+    def allow(self):
+        """True if a call may go ahead; in half-open state only one probe at a time."""
+        with self._lock:
+            if self.state == self.OPEN:
+                if self.clock() - self.opened_at < self.reset_timeout_s:
+                    return False
+                self._set_state(self.HALF_OPEN)
+            if self.state == self.HALF_OPEN:
+                if self._probing:
+                    return False
+                self._probing = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self._probing = False
+            if self.state != self.CLOSED:
+                self._set_state(self.CLOSED)
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._probing = False
+            if self.state == self.HALF_OPEN or (self.state == self.CLOSED and self.failures >= self.failure_threshold):
+                self.opened_at = self.clock()
+                self._set_state(self.OPEN)
+
+    def release(self):
+        """Gives up a half-open probe slot without a verdict (e.g. the caller went away)."""
+        with self._lock:
+            self._probing = False
+
+    def _set_state(self, state):
+        logger.warning(f"Circuit '{self.name}' {self.state} -> {state} ({self.failures} consecutive failures)")
+        self.state = state
+        CIRCUIT_STATE.set(self._STATE_VALUES[state], breaker=self.name)
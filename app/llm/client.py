@@ -1,15 +1,29 @@
 import os
+import httpx
 from langchain_ollama import ChatOllama
+from app.core.config import Config
 
 def get_default_llm():
     """
-    Returns the default LLM client configured via environment variables.
+    Returns a new LLM client configured via environment variables.
+
+    Each client owns its own HTTP connection pool; use
+    app.llm.runtime.LLMRuntime to share one per process.
     """
     model = os.getenv("OLLAMA_MODEL", "llama3")
     base_url = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
-    
+
     return ChatOllama(
         model=model,
         base_url=base_url,
-        temperature=0.1 # Low temperature for deterministic output
+        temperature=0.1, # Low temperature for deterministic output
+        keep_alive=Config.LLM_MODEL_KEEP_ALIVE,
+        client_kwargs={
+            'timeout': httpx.Timeout(Config.LLM_TIMEOUT_S, connect=Config.LLM_CONNECT_TIMEOUT_S),
+            'limits': httpx.Limits(
+                max_connections=Config.LLM_MAX_CONNECTIONS,
+                max_keepalive_connections=Config.LLM_MAX_CONNECTIONS,
+                keepalive_expiry=Config.LLM_KEEPALIVE_EXPIRY_S,
+            ),
+        },
     )
@@ -1,4 +1,15 @@
-from app.llm.client import get_default_llm
+import logging
+import threading
+import time
+from datetime import datetime, timezone
+from app.core.config import Config
+from app.core.metrics import REGISTRY
+from app.llm.runtime import LLMRuntime
+
+logger = logging.getLogger(__name__)
+
+HEALTH_OK = REGISTRY.gauge('llm_health_ok', 'Result of the latest LLM health probe (1 ok, 0 failing)')
+HEALTH_LATENCY = REGISTRY.gauge('llm_health_latency_seconds', 'Latency of the latest LLM health probe')
 
 def llm_healthcheck() -> dict:
     """
@@ -9,11 +20,12 @@ def llm_healthcheck() -> dict:
       - error: str | None
       - sample_reply: str | None (short)
     """
-    llm = get_default_llm()
+    runtime = LLMRuntime.get()
+    llm = runtime.llm
     try:
         # Keep prompt extremely short and deterministic
         prompt = "Respond ONLY with the word: OK"
-        res = llm.invoke(prompt)
+        res = runtime.invoke(prompt, task="healthcheck")
         text = str(res.content).strip() if hasattr(res, "content") else str(res).strip()
 
         ok = (text.upper() == "OK")
@@ -30,3 +42,77 @@ def llm_healthcheck() -> dict:
             "error": str(e),
             "sample_reply": None,
         }
+
+
+class LLMHealthProber:
+    """
+    Runs llm_healthcheck every LLM_HEALTH_INTERVAL_S on a background thread
+    and keeps the latest result, so health endpoints polled by load
+    balancers and monitoring answer without a model round trip.
+    """
+    _snapshot = None
+    _prober = None
+    _lock = threading.Lock()
+
+    @classmethod
+    def start(cls, interval=None):
+        """Starts the background probe thread once per process."""
+        interval = interval if interval is not None else Config.LLM_HEALTH_INTERVAL_S
+        if interval <= 0 or cls._prober is not None:
+            return
+        cls._prober = threading.Thread(target=cls._probe_loop, args=(interval,), name="llm-health-prober", daemon=True)
+        cls._prober.start()
+
+    @classmethod
+    def running(cls):
+        return cls._prober is not None
+
+    @classmethod
+    def probe(cls):
+        """Runs a live health check, stores it as the latest snapshot and returns it."""
+        started = time.perf_counter()
+        result = llm_healthcheck()
+        latency = time.perf_counter() - started
+        result.update(
+            latency_ms=round(latency * 1000, 1),
+            checked_at=datetime.now(timezone.utc).isoformat(),
+            circuit=LLMRuntime.get().breaker.state,
+        )
+        with cls._lock:
+            cls._snapshot = (time.monotonic(), result)
+        HEALTH_OK.set(1 if result["ok"] else 0)
+        HEALTH_LATENCY.set(latency)
+        return dict(result, age_s=0.0)
+
+    @classmethod
+    def snapshot(cls, max_age_s=None):
+        """
+        The latest probe result with its age in seconds, or None before the
+        first probe. Results older than `max_age_s` are reported as failing.
+        """
+        with cls._lock:
+            entry = cls._snapshot
+        if entry is None:
+            return None
+        probed_at, result = entry
+        age = time.monotonic() - probed_at
+        result = dict(result, age_s=round(age, 1))
+        if max_age_s is not None and age > max_age_s:
+            result.update(ok=False, error=f"Health snapshot is stale ({age:.0f}s old)")
+        return result
+
+    @classmethod
+    def reset(cls):
+        with cls._lock:
+            cls._snapshot = None
+
+    @classmethod
+    def _probe_loop(cls, interval):
+        while True:
+            try:
+                result = cls.probe()
+                if not result["ok"]:
+                    logger.warning(f"LLM health probe failed: {result['error']}")
+            except Exception as e:
+                logger.error(f"LLM health probe crashed: {e}")
+            time.sleep(interval)
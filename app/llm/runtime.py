@@ -0,0 +1,208 @@
+"""
+Process-wide LLM runtime.
+
+Building a ChatOllama creates a new HTTP client (and connection pool), and
+building a prompt / parser / chain re-parses the template every time, so
+doing either per call adds a TCP handshake and object construction to every
+LLM request. LLMRuntime builds the model client once per process, with a
+keep-alive connection pool and timeouts from Config, and caches one compiled
+`prompt | llm | parser` chain per task. The client is thread-safe and shared
+by the copilot's worker threads.
+
+Calls made through `run` / `stream` are guarded: a per-task timeout
+(LLM_TASK_TIMEOUT_S), a circuit breaker shared by all tasks (the backend is
+the same), and latency, outcome and token metrics per task. `in_flight`
+counts calls currently running against the model from this process, so
+background work can wait for idle capacity. At most LLM_MAX_CONNECTIONS
+calls run at once, counting timed-out calls still held by the HTTP client;
+callers wait for a free slot within their timeout rather than queueing
+behind calls nobody is waiting for.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from langchain_core.callbacks import BaseCallbackHandler
+from app.core.config import Config
+from app.core.metrics import REGISTRY
+from app.llm.breaker import CircuitBreaker, CircuitOpenError
+from app.llm.client import get_default_llm
+
+logger = logging.getLogger(__name__)
+
+LLM_SECONDS = REGISTRY.histogram(
+    'llm_request_seconds', 'LLM call latency seen by callers, by task', ('task',),
+    buckets=(0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120))
+LLM_CALLS = REGISTRY.counter(
+    'llm_requests_total', 'LLM calls by task and result (ok / error / timeout / rejected)', ('task', 'result'))
+LLM_TOKENS = REGISTRY.histogram(
+    'llm_tokens', 'Tokens per LLM call, by task and kind (prompt / completion)', ('task', 'kind'),
+    buckets=(16, 32, 64, 128, 256, 512, 1024, 2048, 4096, 8192))
+
+
+class LLMTimeoutError(Exception):
+    """Raised when an LLM call exceeds its task timeout."""
+
+
+class _TokenUsage(BaseCallbackHandler):
+    """Records the token counts the model reports for each generation."""
+
+    def __init__(self, task):
+        self.task = task
+
+    def on_llm_end(self, response, **kwargs):
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+                if usage:
+                    LLM_TOKENS.observe(usage.get("input_tokens", 0), task=self.task, kind='prompt')
+                    LLM_TOKENS.observe(usage.get("output_tokens", 0), task=self.task, kind='completion')
+
+
+class LLMRuntime:
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self, llm=None, breaker=None, max_calls=None):
+        self.llm = llm or get_default_llm()
+        self.breaker = breaker or CircuitBreaker(Config.LLM_BREAKER_FAILURES, Config.LLM_BREAKER_RESET_S)
+        self._chains = {}
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        max_calls = max_calls or Config.LLM_MAX_CONNECTIONS
+        # Calls run here so callers can stop waiting at the task timeout; a
+        # timed-out call keeps its worker (and slot) until the HTTP client gives up
+        self._executor = ThreadPoolExecutor(max_workers=max_calls, thread_name_prefix="llm")
+        self._slots = threading.BoundedSemaphore(max_calls)
+
+    @classmethod
+    def get(cls):
+        """The process-wide runtime, created on first use."""
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = cls()
+                logger.info(f"LLM runtime initialized for model {getattr(cls._instance.llm, 'model', 'unknown')}")
+            return cls._instance
+
+    @classmethod
+    def reset(cls):
+        """Drops the process-wide runtime (e.g. after a configuration change)."""
+        with cls._instance_lock:
+            if cls._instance is not None:
+                cls._instance._executor.shutdown(wait=False)
+            cls._instance = None
+
+    @property
+    def model(self):
+        return getattr(self.llm, "model", "unknown")
+
+    @property
+    def in_flight(self):
+        """Model calls running in this process (timed-out calls count until they return)."""
+        return self._in_flight
+
+    def chain(self, task, build):
+        """
+        Returns the compiled chain for `task`, calling `build(llm)` to
+        construct it the first time.
+        """
+        chain = self._chains.get(task)
+        if chain is None:
+            with self._lock:
+                chain = self._chains.get(task)
+                if chain is None:
+                    chain = self._chains[task] = build(self.llm)
+        return chain
+
+    @staticmethod
+    def timeout_for(task):
+        return Config.LLM_TASK_TIMEOUT_S.get(task, Config.LLM_TIMEOUT_S)
+
+    def run(self, task, call, timeout_s=None):
+        """
+        Runs `call(config)` for `task` and returns its result. `config` is
+        the LangChain run config to pass to invoke() (it carries the token
+        usage callback). Raises CircuitOpenError without calling while the
+        circuit is open, and LLMTimeoutError after the task timeout (including
+        time spent waiting for a free slot).
+        """
+        self._admit(task)
+        started = time.perf_counter()
+        # Every admitted call gets a verdict, or a half-open probe slot would never be released
+        outcome = 'error'
+        try:
+            timeout_s = timeout_s if timeout_s is not None else self.timeout_for(task)
+            deadline = time.monotonic() + timeout_s
+            if not self._slots.acquire(timeout=timeout_s):
+                outcome = 'timeout'
+                raise LLMTimeoutError(f"LLM task '{task}' found no free slot within {timeout_s}s")
+            try:
+                future = self._executor.submit(self._tracked, call, {"callbacks": [_TokenUsage(task)]})
+            except BaseException:
+                self._slots.release()
+                raise
+            future.add_done_callback(lambda f: self._slots.release())
+            try:
+                result = future.result(timeout=max(deadline - time.monotonic(), 0))
+            except FutureTimeoutError:
+                future.cancel()
+                outcome = 'timeout'
+                raise LLMTimeoutError(f"LLM task '{task}' timed out after {timeout_s}s")
+            outcome = 'ok'
+            return result
+        finally:
+            if outcome == 'ok':
+                self._succeeded(task, started)
+            else:
+                self._failed(task, outcome, started)
+
+    def stream(self, task, call):
+        """
+        Like run(), for streaming: yields from `call(config)`. There is no
+        overall timeout; the HTTP client's read timeout bounds stalls.
+        """
+        self._admit(task)
+        started = time.perf_counter()
+        self._track(1)
+        try:
+            yield from call({"callbacks": [_TokenUsage(task)]})
+        except Exception:
+            self._failed(task, 'error', started)
+            raise
+        except BaseException:
+            # The consumer stopped reading; no verdict on the backend
+            self.breaker.release()
+            raise
+        finally:
+            self._track(-1)
+        self._succeeded(task, started)
+
+    def invoke(self, prompt, task="raw"):
+        """Runs a raw prompt through the shared client."""
+        return self.run(task, lambda config: self.llm.invoke(prompt, config=config))
+
+    def _tracked(self, call, config):
+        self._track(1)
+        try:
+            return call(config)
+        finally:
+            self._track(-1)
+
+    def _track(self, delta):
+        with self._lock:
+            self._in_flight += delta
+
+    def _admit(self, task):
+        if not self.breaker.allow():
+            LLM_CALLS.inc(task=task, result='rejected')
+            raise CircuitOpenError(f"LLM circuit open, not calling '{task}'")
+
+    def _succeeded(self, task, started):
+        self.breaker.record_success()
+        LLM_SECONDS.observe(time.perf_counter() - started, task=task)
+        LLM_CALLS.inc(task=task, result='ok')
+
+    def _failed(self, task, result, started):
+        self.breaker.record_failure()
+        LLM_SECONDS.observe(time.perf_counter() - started, task=task)
+        LLM_CALLS.inc(task=task, result=result)
@@ -1,68 +1,338 @@
-import json
 import logging
-from kafka import KafkaConsumer
+import time
+import tracemalloc
+from kafka import ConsumerRebalanceListener
 from app.core.config import Config
 from app.core.database import SessionLocal
 from app.services.rule_engine import RuleEngine
-from app.domain.models import Alert
-from app.core.kafka_client import KafkaClient
+from app.services.baseline_detector import BaselineDetector
+from app.services.alert_resolver import AlertAutoResolver
+from app.services.rule_thresholds import ThresholdRegistry
+from app.services.alert_service import AlertService
+from app.core.stream import StreamConsumer, GracefulShutdown, BoundedResumeListener
+from app.core.bus import create_consumer
+from app.core.metrics import REGISTRY, start_metrics_server
 from datetime import datetime
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-def run_alert_engine():
+ALERTS_RAISED = REGISTRY.counter('alert_engine_alerts_total', 'Alerts created by the stream alert engine', ('type',))
+WARM_START_SECONDS = REGISTRY.gauge('alert_engine_warm_start_seconds', 'Duration of the last state warm start')
+WARM_START_BYTES = REGISTRY.gauge('alert_engine_warm_start_bytes', 'Memory held by state loaded in the last warm start')
+
+VITAL_FIELDS = ('hr_bpm', 'spo2_pct', 'resp_rate_bpm', 'bp_systolic', 'bp_diastolic', 'temp_c')
+
+class AlertEngine:
+    """
+    Stateful alert evaluation for the vitals stream.
+
+    Readings are processed a batch at a time: every reading is evaluated
+    (fixed rules, per-encounter baselines, auto-resolution streaks), all
+    resulting alerts are inserted and resolutions applied in one transaction,
+    and the new alerts are published with a single producer flush.
+
+    A batch that raises is processed again (retried, re-run message by
+    message, or redelivered after a rewind), so the in-memory baselines and
+    auto-resolve streaks of its encounters are checkpointed first and restored
+    on failure; each reading is folded in exactly once, by the run that succeeds.
+    """
+
+    def __init__(self, detector=None, resolver=None, session_factory=SessionLocal):
+        self.detector = detector or BaselineDetector()
+        self.resolver = resolver or AlertAutoResolver()
+        self.session_factory = session_factory
+        self.alerts_published = 0
+        self.warm_started = False
+
+    def load_state(self):
+        """
+        Warm start: bulk-loads the state of every active encounter before any
+        reading is consumed, in a handful of set-based queries instead of one
+        lookup per encounter on its first reading:
+
+        * encounter -> department map for the rule thresholds,
+        * stored baselines, and baselines seeded from the last readings of
+          encounters that have none yet,
+        * the open-alert index, from unresolved alerts.
+
+        Auto-resolve streaks restart from zero, so an alert never resolves on
+        readings that may be redelivered after the restart.
+
+        Runs once, at startup; partition assignments use refresh_state().
+        Returns a summary with the counts, duration and memory held by the
+        loaded state (traced allocations still live after the load, so
+        approximate if other threads allocate meanwhile), which is also logged
+        and exported as metrics.
+        """
+        tracing = tracemalloc.is_tracing()
+        if not tracing:
+            tracemalloc.start()
+        baseline_mark = tracemalloc.get_traced_memory()[0]
+        started = time.perf_counter()
+
+        db = self.session_factory()
+        try:
+            ThresholdRegistry.reload(db)
+            summary = {
+                'baselines': self.detector.load(db),
+                'seed_readings': self.detector.seed(db),
+                'open_alerts': self.resolver.load(db),
+            }
+        finally:
+            db.close()
+
+        summary['seconds'] = round(time.perf_counter() - started, 3)
+        summary['bytes'] = max(tracemalloc.get_traced_memory()[0] - baseline_mark, 0)
+        if not tracing:
+            tracemalloc.stop()
+
+        self.warm_started = True
+        WARM_START_SECONDS.set(summary['seconds'])
+        WARM_START_BYTES.set(summary['bytes'])
+        logger.info(
+            f"Warm start loaded {summary['baselines']} baselines, {summary['seed_readings']} seed readings and "
+            f"{summary['open_alerts']} open alerts in {summary['seconds']}s, holding {summary['bytes'] / 1024:.0f} KiB"
+        )
+        return summary
+
+    def refresh_state(self):
+        """
+        Reloads the state handed over by other workers after a rebalance:
+        baselines they snapshotted on revoke, seeds for encounters not tracked
+        here yet, and the open-alert index. Thresholds are left to the
+        registry's reloader.
+        """
+        db = self.session_factory()
+        try:
+            baselines = self.detector.load(db)
+            seeded = self.detector.seed(db)
+            open_alerts = self.resolver.load(db)
+        finally:
+            db.close()
+        logger.info(f"Reloaded {baselines} baselines, {seeded} seed readings and {open_alerts} open alerts")
+
+    @staticmethod
+    def validate(vitals_data):
+        """
+        Rejects malformed readings up front, before any per-encounter state is
+        touched, so a poison message cannot skew baselines when its batch is
+        re-run message by message.
+        """
+        if vitals_data.get('patient_id') is None:
+            raise ValueError("reading has no patient_id")
+        datetime.fromisoformat(vitals_data['timestamp'])
+        for field in VITAL_FIELDS:
+            value = vitals_data.get(field)
+            if value is not None and (isinstance(value, bool) or not isinstance(value, (int, float))):
+                raise ValueError(f"{field} is not numeric: {value!r}")
+
+    def evaluate(self, vitals_data):
+        """Evaluates one reading and returns the alert dicts it raises."""
+        alerts = RuleEngine.evaluate(vitals_data)
+        alerts.extend(self.detector.update(vitals_data))
+        self.resolver.observe(vitals_data, alerts)
+        return alerts
+
+    def process_batch(self, readings):
+        """
+        Evaluates a batch of readings, persists the alerts in one transaction and
+        publishes the ones that did not exist yet. Raises if the database write
+        fails, so the caller can avoid committing offsets. Returns the published
+        alert payloads.
+        """
+        for vitals_data in readings:
+            self.validate(vitals_data)
+
+        encounter_ids = {vitals_data.get('encounter_id') for vitals_data in readings}
+        checkpoint = (self.detector.checkpoint(encounter_ids), self.resolver.checkpoint(encounter_ids))
+        try:
+            return self._process_batch(readings)
+        except Exception:
+            self.detector.restore(checkpoint[0])
+            self.resolver.restore(checkpoint[1])
+            raise
+
+    def _process_batch(self, readings):
+        staged = []
+        for vitals_data in readings:
+            for alert_data in self.evaluate(vitals_data):
+                staged.append((vitals_data.get('encounter_id'), alert_data))
+
+        if not staged and not self.resolver.has_pending():
+            return []
+
+        db = self.session_factory()
+        try:
+            created = []
+            tracked = []
+            if staged:
+                rows = [{
+                    'patient_id': alert_data['patient_id'],
+                    'encounter_id': encounter_id,
+                    'timestamp': datetime.fromisoformat(alert_data['timestamp']),
+                    'type': alert_data['type'],
+                    'severity': alert_data.get('severity', 'medium'),
+                    'message': alert_data['message'],
+                    'resolved': False,
+                } for encounter_id, alert_data in staged]
+                # Redelivered readings hit the natural key and are skipped
+                created = AlertService.insert_alerts(db, rows)
+                tracked = created
+                if len(created) < len(rows):
+                    # Inserted first by the API path (or an earlier delivery):
+                    # index those too, or they are never auto-resolved
+                    tracked = AlertService.find_open_alerts(db, rows)
+            self.resolver.flush(db)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+        for alert in tracked:
+            self.resolver.track(alert.encounter_id, alert.type, alert.id)
+        for alert in created:
+            ALERTS_RAISED.inc(type=alert.type)
+
+        payloads = AlertService.publish(created)
+        if payloads:
+            self.alerts_published += len(payloads)
+            logger.info(f"Processed {len(readings)} readings, raised {len(payloads)} alerts")
+        return payloads
+
+    def maybe_snapshot(self, force=False):
+        """Persists baselines if the snapshot interval has elapsed (or `force`)."""
+        if not force and not self.detector.snapshot_due():
+            return
+        db = self.session_factory()
+        try:
+            self.detector.snapshot(db)
+        except Exception as e:
+            logger.error(f"Failed to snapshot vital baselines: {e}")
+            db.rollback()
+        finally:
+            db.close()
+
+class EngineRebalanceListener(ConsumerRebalanceListener):
+    """
+    Hands per-encounter state over cleanly when partitions move between
+    workers of the consumer group.
+
+    On revoke the current offsets are committed and baselines snapshotted, so
+    the next owner starts from where this worker stopped; on assignment the
+    state is reloaded from the database. The first assignment follows the
+    warm start in run_alert_engine and reloads nothing, unless it failed.
+    """
+
+    def __init__(self, consumer, engine):
+        self.consumer = consumer
+        self.engine = engine
+        self.assignments = 0
+
+    def on_partitions_revoked(self, revoked):
+        if not revoked:
+            return
+        logger.info(f"Partitions revoked: {sorted(tp.partition for tp in revoked)}")
+        try:
+            self.consumer.commit()
+        except Exception as e:
+            logger.error(f"Failed to commit offsets on revoke: {e}")
+        self.engine.maybe_snapshot(force=True)
+
+    def on_partitions_assigned(self, assigned):
+        logger.info(f"Partitions assigned: {sorted(tp.partition for tp in assigned)}")
+        self.assignments += 1
+        if self.assignments == 1 and self.engine.warm_started:
+            return
+        try:
+            self.engine.refresh_state()
+        except Exception as e:
+            logger.error(f"Failed to load alert engine state: {e}")
+
+
+def run_alert_engine(max_records=None, timeout_ms=None, stop_event=None, on_stats=None, stats_interval_s=10,
+                     metrics_port=None):
+    """
+    Consumes the vitals stream until `stop_event` (if given) is set or the
+    process receives SIGTERM / SIGINT. Shutdown finishes and commits the batch
+    in hand, snapshots baselines and leaves the consumer group.
+
+    `on_stats`, if given, is called every `stats_interval_s` seconds with the
+    readings and alerts processed since the previous call and the last sampled
+    lag. Metrics are served on `metrics_port` (default
+    Config.ALERT_ENGINE_METRICS_PORT; 0 disables).
+    """
     logger.info("Starting Alert Engine...")
-    
-    # Initialize Kafka Consumer
-    consumer = KafkaConsumer(
-        Config.KAFKA_TOPIC_VITALS,
-        bootstrap_servers=Config.KAFKA_BOOTSTRAP_SERVERS,
-        value_deserializer=lambda x: json.loads(x.decode('utf-8')),
-        auto_offset_reset='latest',
+    max_records = max_records or Config.ALERT_ENGINE_BATCH_SIZE
+    timeout_ms = timeout_ms or Config.ALERT_ENGINE_POLL_TIMEOUT_MS
+    shutdown = GracefulShutdown(stop_event)
+    start_metrics_server(Config.ALERT_ENGINE_METRICS_PORT if metrics_port is None else metrics_port)
+
+    # Initialize the consumer (Kafka, or in-process with MESSAGE_BUS=memory).
+    # Values are decoded by StreamConsumer so that undecodable messages can be
+    # dead-lettered; offsets are committed manually, only after the batch's
+    # alerts are safely in the database. Restarts resume from the committed
+    # offsets, so readings produced while the engine was down are not skipped.
+    consumer = create_consumer(
+        auto_offset_reset='earliest',
+        enable_auto_commit=False,
         group_id='alert_engine_group'
     )
-    
-    logger.info(f"Listening on topic: {Config.KAFKA_TOPIC_VITALS}")
-    
-    for message in consumer:
-        try:
-            vitals_data = message.value
-            logger.info(f"Received vitals: {vitals_data}")
-            
-            # Evaluate Rules
-            alerts = RuleEngine.evaluate(vitals_data)
-            
-            if alerts:
-                db = SessionLocal()
-                try:
-                    for alert_data in alerts:
-                        # Persist to DB
-                        alert = Alert(
-                            patient_id=alert_data['patient_id'],
-                            encounter_id=vitals_data.get('encounter_id'), # Ensure encounter_id is passed in vitals
-                            timestamp=datetime.fromisoformat(alert_data['timestamp']),
-                            type=alert_data['type'],
-                            severity=alert_data.get('severity', 'medium'),
-                            details=alert_data['message'],
-                            resolved=False
-                        )
-                        db.add(alert)
-                        
-                        # Publish to Kafka
-                        KafkaClient.send_message(Config.KAFKA_TOPIC_ALERTS, alert_data)
-                        
-                    db.commit()
-                    logger.info(f"Processed {len(alerts)} alerts")
-                except Exception as e:
-                    logger.error(f"Error processing alerts: {e}")
-                    db.rollback()
-                finally:
-                    db.close()
-                    
-        except Exception as e:
-            logger.error(f"Error consuming message: {e}")
+
+    ThresholdRegistry.start_reloader()
+
+    # Per-encounter baselines survive restarts via periodic snapshots; the
+    # open-alert index is rebuilt from unresolved alerts. Both are loaded once
+    # before consuming, and reloaded by the rebalance listener when partitions
+    # move between workers.
+    engine = AlertEngine()
+    try:
+        engine.load_state()
+    except Exception as e:
+        logger.error(f"Failed to load alert engine state: {e}")
+    listener = BoundedResumeListener(consumer, EngineRebalanceListener(consumer, engine))
+    consumer.subscribe([Config.KAFKA_TOPIC_VITALS], listener=listener)
+    # Starts in catch-up mode: any backlog left by the downtime is worked off
+    # in large batches before dropping back to the latency-friendly size
+    stream = StreamConsumer(
+        consumer,
+        Config.KAFKA_TOPIC_VITALS,
+        process_message=lambda reading: engine.process_batch([reading]),
+        process_batch=engine.process_batch,
+        max_records=max_records,
+        timeout_ms=timeout_ms,
+        catchup_max_records=max(Config.STREAM_CATCHUP_BATCH_SIZE, max_records),
+    )
+
+    logger.info(f"Listening on topic: {Config.KAFKA_TOPIC_VITALS} (batch size {max_records})")
+
+    processed = raised = 0
+    last_stats = time.monotonic()
+
+    try:
+        while not shutdown.is_set():
+            # Transient failures are retried and rewound, poison readings
+            # dead-lettered; see app/core/stream.py
+            stream.poll_once()
+            engine.maybe_snapshot()
+
+            if on_stats and time.monotonic() - last_stats >= stats_interval_s:
+                on_stats({'readings': stream.processed - processed, 'alerts': engine.alerts_published - raised,
+                          'lag': stream.total_lag,
+                          'partitions': sorted(tp.partition for tp in consumer.assignment())})
+                processed, raised = stream.processed, engine.alerts_published
+                last_stats = time.monotonic()
+    finally:
+        # Every finished batch is already committed by poll_once; a batch cut
+        # short by an exception is deliberately left uncommitted so it is
+        # redelivered. Leaving the group explicitly triggers an immediate
+        # rebalance instead of waiting for the session timeout.
+        engine.maybe_snapshot(force=True)
+        consumer.close(autocommit=False)
+        logger.info(f"Alert Engine stopped ({stream.processed} readings processed)")
 
 if __name__ == "__main__":
     run_alert_engine()
@@ -1,51 +1,172 @@
 import json
 import logging
-from kafka import KafkaConsumer
+import time
 from sqlalchemy.orm import Session
 from app.core.config import Config
 from app.core.database import SessionLocal
 from app.domain.models import Alert, AlertExplanation, Vitals, Patient, Encounter
 from app.services.llm_service import LLMService
+from app.core.stream import ConcurrentStreamConsumer, GracefulShutdown, BoundedResumeListener
+from app.core.bus import create_consumer
+from app.core.metrics import REGISTRY, start_metrics_server
+from app.services.explanation_templates import render_explanation, rule_explanation
+from app.services.explanation_cache import ExplanationCache
+from app.core.coalesce import Coalescer
 from datetime import datetime, timedelta
 
 logger = logging.getLogger(__name__)
 
+# Lower is more urgent; unknown severities rank with 'medium'
+SEVERITY_RANK = {'critical': 0, 'high': 1, 'medium': 2, 'low': 3}
+
+QUEUE_WAIT = REGISTRY.histogram(
+    'copilot_queue_wait_seconds', 'Time alerts waited for a copilot worker, by severity', ('severity',),
+    buckets=(0.1, 0.5, 1, 5, 15, 30, 60, 120, 300, 600, 900, 1800))
+SLO_MISSES = REGISTRY.counter(
+    'copilot_slo_misses_total', 'Alerts that waited longer than their severity SLO', ('severity',))
+EXPLANATIONS = REGISTRY.counter(
+    'copilot_explanations_total', 'Explanations saved, by severity and path (llm / cache / rule / template)', ('severity', 'path'))
+ROUTES = REGISTRY.counter(
+    'copilot_explanation_routes_total', 'Alerts routed to the rule-based or LLM explanation, by alert type', ('type', 'route'))
+BATCH_ALERTS = REGISTRY.histogram(
+    'copilot_llm_batch_alerts', 'Alerts explained per LLM call', buckets=(1, 2, 3, 4, 6, 8, 12, 16))
+
+
+def explanation_route(alert_type, severity):
+    """
+    'rule' for routine alerts explained from the vitals trend, 'llm' for
+    composite, unlisted or critical ones (see COPILOT_EXPLANATION_ROUTES).
+    """
+    if str(severity or '').lower() in Config.COPILOT_LLM_SEVERITIES:
+        return 'llm'
+    return Config.COPILOT_EXPLANATION_ROUTES.get(str(alert_type or '').upper(), 'llm')
+
+
+def alert_priority(alert_data):
+    """Queue order: most severe first, then oldest."""
+    if not isinstance(alert_data, dict):
+        return (len(SEVERITY_RANK), '')
+    severity = str(alert_data.get('severity') or 'medium').lower()
+    return (SEVERITY_RANK.get(severity, SEVERITY_RANK['medium']), str(alert_data.get('timestamp') or ''))
+
+
+def patient_context(db, patient_id, encounter_id):
+    """Patient details and recent vitals for LLM prompts."""
+    patient = db.query(Patient).filter(Patient.id == patient_id).first()
+    patient_age = datetime.utcnow().year - patient.dob.year if patient and patient.dob else "Unknown"
+    gender = patient.gender if patient else "Unknown"
+    
+    return {"patient_age": patient_age, "gender": gender, "recent_vitals": recent_vitals(db, encounter_id)}
+
+
+def recent_vitals(db, encounter_id):
+    """The encounter's latest vitals (last hour, up to 5), newest first."""
+    since = datetime.utcnow() - timedelta(hours=1)
+    recent = db.query(Vitals).filter(
+        Vitals.encounter_id == encounter_id,
+        Vitals.timestamp >= since
+    ).order_by(Vitals.timestamp.desc()).limit(5).all()
+    
+    return [
+        {"hr": v.hr_bpm, "spo2": v.spo2_pct, "bp": f"{v.bp_systolic}/{v.bp_diastolic}", "temp": v.temp_c, "rr": v.resp_rate_bpm} 
+        for v in recent
+    ]
+
+
+def alert_context(alert, patient):
+    """The single-alert explanation context (also the explanation cache key)."""
+    return {
+        "alert_type": alert.type,
+        "severity": alert.severity,
+        "message": alert.message,
+        **patient
+    }
+
+
+def alert_item(alert):
+    """
+    The alert fields explanations need, as a plain dict: coalesced alerts
+    are explained by another worker, outside the session that loaded them.
+    """
+    return {
+        "id": alert.id,
+        "patient_id": alert.patient_id,
+        "encounter_id": alert.encounter_id,
+        "type": alert.type,
+        "severity": alert.severity,
+        "message": alert.message,
+    }
+
+
 class AlertCopilotService:
     def __init__(self):
         self.consumer = None
+        self.stream = None
+        self.cache = ExplanationCache()
+        self.coalescer = Coalescer(Config.COPILOT_COALESCE_WINDOW_S, Config.COPILOT_COALESCE_MAX_ALERTS)
         try:
-            self.consumer = KafkaConsumer(
-                Config.KAFKA_TOPIC_ALERTS,
-                bootstrap_servers=Config.KAFKA_BOOTSTRAP_SERVERS,
-                value_deserializer=lambda m: json.loads(m.decode('utf-8')),
+            # Subscribed in start(), with the rebalance listener
+            self.consumer = create_consumer(
                 group_id='alert_copilot_group',
-                auto_offset_reset='latest',
+                auto_offset_reset='earliest',
+                enable_auto_commit=False,
                 api_version=(2, 0, 0) # Fix for UnrecognizedBrokerVersion
             )
             logger.info("Alert Copilot Kafka consumer initialized")
         except Exception as e:
             logger.error(f"Failed to initialize Kafka consumer: {e}")
 
-    def start(self):
+    def start(self, stop_event=None):
         """
-        Starts listening to alerts and processing them.
+        Starts listening to alerts and processing them, until `stop_event`
+        (if given) is set or the process receives SIGTERM / SIGINT. Alerts
+        being explained are finished and committed before the consumer leaves
+        the group; a restart resumes from the committed offsets.
         """
         if not self.consumer:
             logger.error("Kafka consumer not initialized")
             return
 
-        logger.info("Alert Copilot started listening...")
-        for message in self.consumer:
-            try:
-                alert_data = message.value
-                logger.info(f"Received alert: {alert_data}")
-                self.process_alert(alert_data)
-            except Exception as e:
-                logger.error(f"Error processing alert: {e}")
+        shutdown = GracefulShutdown(stop_event)
+        # Explanations are generated by COPILOT_CONCURRENCY threads, most
+        # severe alerts first; offsets are committed in order once
+        # explanations are saved. Failed alerts are retried (transient errors)
+        # or dead-lettered to '<alerts topic>.dlq' instead of being dropped
+        stream = self.stream = ConcurrentStreamConsumer(
+            self.consumer,
+            Config.KAFKA_TOPIC_ALERTS,
+            self.process_alert,
+            concurrency=Config.COPILOT_CONCURRENCY,
+            max_in_flight=Config.COPILOT_MAX_IN_FLIGHT,
+            priority=alert_priority,
+        )
+        self.consumer.subscribe([Config.KAFKA_TOPIC_ALERTS], listener=BoundedResumeListener(self.consumer, stream))
+        logger.info(f"Alert Copilot started listening ({Config.COPILOT_CONCURRENCY} workers)...")
+        start_metrics_server(Config.COPILOT_METRICS_PORT)
+        try:
+            stream.run(shutdown)
+        finally:
+            self.consumer.close(autocommit=False)
+            logger.info(f"Alert Copilot stopped ({stream.processed} alerts processed)")
+
+    def should_shed(self, severity, missed_slo):
+        """
+        True if an alert of this severity should get a template explanation
+        instead of the LLM: it already missed its queue-wait SLO, or too many
+        alerts are queued behind the workers.
+        """
+        if severity not in Config.COPILOT_SHED_SEVERITIES:
+            return False
+        backlog = self.stream.backlog if self.stream else 0
+        return missed_slo or backlog >= Config.COPILOT_SHED_BACKLOG
 
-    def process_alert(self, alert_data: dict):
+    def process_alert(self, alert_data: dict, waited_s: float = 0.0):
         """
-        Fetches context, calls LLM, and saves explanation.
+        Fetches context, calls LLM, and saves explanation. Routine alerts get
+        a rule-based explanation from the vitals trend instead (see
+        explanation_route). `waited_s` is how long the alert queued for a
+        worker; under backlog, lower-severity alerts get a template
+        explanation instead (see should_shed).
         """
         db = SessionLocal()
         try:
@@ -73,36 +194,34 @@ class AlertCopilotService:
                 logger.info(f"Explanation already exists for alert {alert_id}")
                 return
 
-            # 2. Fetch Context
-            # Patient details
-            patient = db.query(Patient).filter(Patient.id == alert.patient_id).first()
-            patient_age = datetime.utcnow().year - patient.dob.year if patient and patient.dob else "Unknown"
-            gender = patient.gender if patient else "Unknown"
-            
-            # Recent vitals (last 1 hour)
-            since = datetime.utcnow() - timedelta(hours=1)
-            recent_vitals = db.query(Vitals).filter(
-                Vitals.encounter_id == alert.encounter_id,
-                Vitals.timestamp >= since
-            ).order_by(Vitals.timestamp.desc()).limit(5).all()
-            
-            vitals_summary = [
-                {"hr": v.hr_bpm, "spo2": v.spo2_pct, "bp": f"{v.bp_systolic}/{v.bp_diastolic}", "temp": v.temp_c} 
-                for v in recent_vitals
-            ]
-            
-            context = {
-                "alert_type": alert.type,
-                "severity": alert.severity,
-                "message": alert.message,
-                "patient_age": patient_age,
-                "gender": gender,
-                "recent_vitals": vitals_summary
-            }
-            
-            # 3. Call LLM
-            explanation_data = LLMService.generate_alert_explanation_json(context)
-            
+            severity = (alert.severity or 'medium').lower()
+            QUEUE_WAIT.observe(waited_s, severity=severity)
+            slo = Config.COPILOT_SLO_S.get(severity)
+            missed_slo = slo is not None and waited_s > slo
+            if missed_slo:
+                SLO_MISSES.inc(severity=severity)
+
+            if self.should_shed(severity, missed_slo):
+                path = 'template'
+                explanation_data = render_explanation(alert.type, alert.severity, alert.message)
+            else:
+                route = explanation_route(alert.type, alert.severity)
+                joined = None
+                if route == 'rule':
+                    # Part of a burst already going to the LLM: ride along in its prompt
+                    joined = self.coalescer.join(alert.encounter_id, alert_item(alert))
+                    if joined is not None:
+                        route = 'llm'
+                ROUTES.inc(type=str(alert.type or '').upper(), route=route)
+                if joined is not None:
+                    explanation_data, path = joined
+                elif route == 'rule':
+                    path = 'rule'
+                    explanation_data = rule_explanation(alert.type, alert.severity, alert.message,
+                                                        recent_vitals(db, alert.encounter_id))
+                else:
+                    explanation_data, path = self._llm_explanation(db, alert)
+
             # 4. Save Explanation
             explanation = AlertExplanation(
                 alert_id=alert.id,
@@ -113,14 +232,85 @@ class AlertCopilotService:
             )
             db.add(explanation)
             db.commit()
-            logger.info(f"Generated explanation for alert {alert_id}")
+            EXPLANATIONS.inc(severity=severity, path=path)
+            logger.info(f"Generated {path} explanation for alert {alert_id} (waited {waited_s:.1f}s)")
             
         except Exception as e:
             logger.error(f"Failed to process alert {alert_data}: {e}")
             db.rollback()
+            raise
         finally:
             db.close()
 
+    def _llm_explanation(self, db, alert):
+        """
+        Explains the alert with the LLM, unless the explanation cache has one
+        for a similar context. Alerts for the same encounter arriving within
+        COPILOT_COALESCE_WINDOW_S share one context fetch and one LLM call
+        (see _explain_encounter); a critical alert holds the batch for
+        COPILOT_COALESCE_CRITICAL_WINDOW_S at most. Rule-routed alerts of the
+        same burst join the batch too (see process_alert). Returns the
+        explanation and its path ('cache', 'llm' or 'template').
+        """
+        window_s = Config.COPILOT_COALESCE_CRITICAL_WINDOW_S if (alert.severity or '').lower() == 'critical' else None
+        return self.coalescer.submit(alert.encounter_id, alert_item(alert),
+                                     lambda alerts: self._explain_encounter(db, alerts), window_s=window_s)
+
+    def _explain_encounter(self, db, alerts):
+        """
+        Explains a batch of alerts (alert_item dicts) from one encounter:
+        fetches the patient context once, serves what it can from the cache
+        and sends the rest to the LLM in a single combined prompt. Returns
+        (explanation, path) per alert, in order.
+        """
+        first = alerts[0]
+        # 2. Fetch Context
+        patient = patient_context(db, first["patient_id"], first["encounter_id"])
+        contexts = [{"alert_type": a["type"], "severity": a["severity"], "message": a["message"], **patient}
+                    for a in alerts]
+
+        results = [None] * len(alerts)
+        misses = []
+        for i, context in enumerate(contexts):
+            cached = self.cache.get(context)
+            if cached is not None:
+                results[i] = (cached, 'cache')
+            else:
+                misses.append(i)
+        if not misses:
+            return results
+        BATCH_ALERTS.observe(len(misses))
+
+        # 3. Call LLM
+        started = time.perf_counter()
+        if len(misses) == 1:
+            i = misses[0]
+            explanation_data = LLMService.generate_alert_explanation_json(contexts[i])
+            self.cache.put(contexts[i], explanation_data, time.perf_counter() - started)
+            results[i] = (explanation_data, 'llm')
+            return results
+
+        explained = LLMService.generate_alert_explanations_json({
+            **patient,
+            "alerts": [
+                {"id": alerts[i]["id"], "alert_type": alerts[i]["type"], "severity": alerts[i]["severity"],
+                 "message": alerts[i]["message"]}
+                for i in misses
+            ],
+        })
+        llm_seconds = (time.perf_counter() - started) / len(misses)
+        logger.info(f"Explained {len(misses)} alerts for encounter {first['encounter_id']} in one LLM call")
+        for i in misses:
+            explanation_data = explained.get(alerts[i]["id"])
+            if explanation_data is None:
+                # Left out of the combined reply; don't spend another call on it
+                logger.warning(f"LLM reply had no explanation for alert {alerts[i]['id']}, using template")
+                results[i] = (render_explanation(alerts[i]["type"], alerts[i]["severity"], alerts[i]["message"]), 'template')
+            else:
+                self.cache.put(contexts[i], explanation_data, llm_seconds)
+                results[i] = (explanation_data, 'llm')
+        return results
+
 if __name__ == "__main__":
     # For testing/running directly
     service = AlertCopilotService()
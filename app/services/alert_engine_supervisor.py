@@ -0,0 +1,194 @@
+"""
+Multi-process alert engine.
+
+Starts N worker processes, each running `run_alert_engine` in the
+'alert_engine_group' consumer group, so Kafka spreads the vitals partitions
+across them. Workers are started with the 'spawn' method: every worker is a
+fresh interpreter with its own Kafka consumer, producer and database pool.
+
+    python -m app.services.alert_engine_supervisor --workers 4
+
+The topic needs at least as many partitions as workers; extra workers sit idle
+as hot standbys until a rebalance hands them partitions.
+"""
+import argparse
+import logging
+import multiprocessing
+import queue
+import signal
+import time
+from app.core.config import Config
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def _worker_main(worker_id, stop_event, stats_queue):
+    # Ctrl-C reaches the whole process group; let the supervisor drive shutdown
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    from app.services.alert_consumer import run_alert_engine
+
+    # One metrics port per worker: base, base + 1, ...
+    base_port = Config.ALERT_ENGINE_METRICS_PORT
+    run_alert_engine(
+        stop_event=stop_event,
+        on_stats=lambda stats: stats_queue.put({'worker': worker_id, **stats}),
+        metrics_port=base_port + worker_id if base_port else 0,
+    )
+
+
+class WorkerPool:
+    """
+    Supervises the alert engine worker processes.
+
+    Crashed workers are restarted with exponential backoff (reset once a worker
+    has stayed up for `stable_after_s`), and the per-worker stats they report
+    are aggregated into periodic throughput / lag log lines.
+    """
+
+    def __init__(self, workers=None, report_interval_s=None, max_backoff_s=60, stable_after_s=60):
+        self.workers = workers or Config.ALERT_ENGINE_WORKERS
+        self.report_interval_s = report_interval_s or Config.ALERT_ENGINE_REPORT_INTERVAL_S
+        self.max_backoff_s = max_backoff_s
+        self.stable_after_s = stable_after_s
+
+        self._ctx = multiprocessing.get_context('spawn')
+        self.stop_event = self._ctx.Event()
+        self.stats_queue = self._ctx.Queue()
+
+        self._procs = {}       # worker_id -> Process
+        self._started_at = {}  # worker_id -> monotonic start time
+        self._failures = {}    # worker_id -> consecutive crashes
+        self._restart_at = {}  # worker_id -> earliest monotonic restart time
+        self._latest = {}      # worker_id -> last stats message
+        self._window = {'readings': 0, 'alerts': 0}
+        self._window_started = time.monotonic()
+        self.restarts = 0
+
+    def _spawn(self, worker_id):
+        proc = self._ctx.Process(
+            target=_worker_main,
+            args=(worker_id, self.stop_event, self.stats_queue),
+            name=f"alert-engine-{worker_id}",
+            daemon=False,
+        )
+        proc.start()
+        return proc
+
+    def start(self):
+        logger.info(f"Starting {self.workers} alert engine workers")
+        for worker_id in range(self.workers):
+            self._start_worker(worker_id)
+
+    def _start_worker(self, worker_id):
+        self._procs[worker_id] = self._spawn(worker_id)
+        self._started_at[worker_id] = time.monotonic()
+        self._restart_at.pop(worker_id, None)
+        logger.info(f"Worker {worker_id} started (pid {self._procs[worker_id].pid})")
+
+    def check_workers(self):
+        """Schedules restarts for dead workers and starts those whose backoff has elapsed."""
+        now = time.monotonic()
+        for worker_id, proc in list(self._procs.items()):
+            if proc is None:
+                if now >= self._restart_at[worker_id]:
+                    self.restarts += 1
+                    self._start_worker(worker_id)
+                continue
+            if proc.is_alive():
+                if now - self._started_at[worker_id] >= self.stable_after_s:
+                    self._failures[worker_id] = 0
+                continue
+
+            failures = self._failures.get(worker_id, 0) + 1
+            self._failures[worker_id] = failures
+            delay = min(2 ** (failures - 1), self.max_backoff_s)
+            logger.error(f"Worker {worker_id} exited with code {proc.exitcode}; restarting in {delay}s")
+            self._procs[worker_id] = None
+            self._latest.pop(worker_id, None)
+            self._restart_at[worker_id] = now + delay
+
+    def collect(self):
+        """Drains stats messages reported by the workers."""
+        while True:
+            try:
+                stats = self.stats_queue.get_nowait()
+            except queue.Empty:
+                return
+            self._latest[stats['worker']] = stats
+            self._window['readings'] += stats['readings']
+            self._window['alerts'] += stats['alerts']
+
+    def report(self):
+        """Logs and returns aggregate throughput since the last report and current lag."""
+        now = time.monotonic()
+        elapsed = now - self._window_started
+        lags = [s['lag'] for s in self._latest.values() if s.get('lag') is not None]
+        summary = {
+            'workers_alive': sum(1 for p in self._procs.values() if p is not None and p.is_alive()),
+            'readings_per_s': round(self._window['readings'] / elapsed, 1) if elapsed else 0.0,
+            'alerts_per_s': round(self._window['alerts'] / elapsed, 1) if elapsed else 0.0,
+            'lag': sum(lags),
+            'restarts': self.restarts,
+            'partitions': {w: s.get('partitions', []) for w, s in sorted(self._latest.items())},
+        }
+        logger.info(
+            f"{summary['workers_alive']}/{self.workers} workers, {summary['readings_per_s']} readings/s, "
+            f"{summary['alerts_per_s']} alerts/s, lag {summary['lag']}, restarts {summary['restarts']}, "
+            f"partitions {summary['partitions']}"
+        )
+        self._window = {'readings': 0, 'alerts': 0}
+        self._window_started = now
+        return summary
+
+    def stop(self, timeout=30):
+        """Asks workers to finish their batch and leave the group, then reaps them."""
+        logger.info("Stopping alert engine workers")
+        self.stop_event.set()
+        deadline = time.monotonic() + timeout
+        for worker_id, proc in self._procs.items():
+            if proc is None:
+                continue
+            proc.join(max(deadline - time.monotonic(), 0))
+            if proc.is_alive():
+                # SIGTERM gets the worker one more chance to finish its batch
+                logger.warning(f"Worker {worker_id} did not stop in time; terminating")
+                proc.terminate()
+                proc.join(10)
+            if proc.is_alive():
+                logger.error(f"Worker {worker_id} ignored SIGTERM; killing")
+                proc.kill()
+                proc.join()
+
+    def run(self):
+        stopping = []
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda *_: stopping.append(True))
+
+        self.start()
+        next_report = time.monotonic() + self.report_interval_s
+        try:
+            while not stopping:
+                time.sleep(1)
+                self.collect()
+                self.check_workers()
+                if time.monotonic() >= next_report:
+                    self.report()
+                    next_report = time.monotonic() + self.report_interval_s
+        finally:
+            self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the alert engine as a pool of worker processes")
+    parser.add_argument("--workers", type=int, default=Config.ALERT_ENGINE_WORKERS, help="Worker processes")
+    parser.add_argument("--report-interval", type=int, default=Config.ALERT_ENGINE_REPORT_INTERVAL_S,
+                        help="Seconds between aggregate throughput/lag reports")
+    args = parser.parse_args()
+    if Config.MESSAGE_BUS == 'memory':
+        parser.error("MESSAGE_BUS=memory is in-process only; the alert engine runs inside the API (see app/services/inprocess_runtime.py)")
+    WorkerPool(workers=args.workers, report_interval_s=args.report_interval).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+import logging
+from sqlalchemy import update, func
+from app.core.config import Config
+from app.domain.models import Alert, Encounter
+from app.services.baseline_detector import DEVIATION_TYPES
+
+logger = logging.getLogger(__name__)
+
+# Vitals each rule reads. A reading counts toward "back in range" for a type
+# only if it carries all of them (and the rule stayed quiet), so e.g. a BP-only
+# feed cannot resolve HYPOXIA.
+ALERT_VITALS = {
+    'TACHYCARDIA': ('hr_bpm',),
+    'BRADYCARDIA': ('hr_bpm',),
+    'HYPOXIA': ('spo2_pct',),
+    'FEVER': ('temp_c',),
+    'HYPERTENSION': ('bp_systolic', 'bp_diastolic'),
+    'HYPOTENSION': ('bp_systolic',),
+    'TACHYPNEA': ('resp_rate_bpm',),
+    'BRADYPNEA': ('resp_rate_bpm',),
+    'SEPSIS_RISK': ('temp_c', 'hr_bpm', 'resp_rate_bpm'),
+    'RESPIRATORY_DISTRESS': ('spo2_pct', 'resp_rate_bpm'),
+    **{alert_type: (vital,) for vital, alert_type in DEVIATION_TYPES.items()},
+}
+# Other types (e.g. BASELINE_DEVIATION alerts from before per-vital types) need at least one of these
+ALL_VITALS = ('hr_bpm', 'spo2_pct', 'temp_c', 'bp_systolic', 'bp_diastolic', 'resp_rate_bpm')
+
+
+def measures(vitals_data, alert_type):
+    """True if the reading has the vitals needed to tell whether `alert_type` is back in range."""
+    required = ALERT_VITALS.get(alert_type)
+    if required is None:
+        return any(vitals_data.get(v) is not None for v in ALL_VITALS)
+    return all(vitals_data.get(v) is not None for v in required)
+
+
+class AlertAutoResolver:
+    """
+    Auto-resolves open alerts once vitals are back in range.
+
+    Keeps an in-memory index of unresolved alerts per (encounter, type) and a
+    streak of consecutive readings on which that type did *not* fire; readings
+    without the type's vitals (ALERT_VITALS) leave the streak alone. When the
+    streak reaches `normal_readings`, the open alerts are queued for resolution;
+    `flush` then resolves everything queued with a single UPDATE.
+
+    Types are matched case-insensitively, so an API-created 'tachycardia' alert
+    is resolved by readings on which the stream's TACHYCARDIA rule stays quiet.
+    """
+
+    def __init__(self, normal_readings=None):
+        self.normal_readings = normal_readings if normal_readings is not None else Config.ALERT_AUTO_RESOLVE_READINGS
+        # encounter_id -> {TYPE: set(alert_id)}
+        self._open = {}
+        # (encounter_id, TYPE) -> consecutive in-range readings
+        self._streaks = {}
+        # alert ids waiting for flush()
+        self._pending = set()
+
+    @property
+    def enabled(self):
+        return self.normal_readings > 0
+
+    def open_count(self):
+        return sum(len(ids) for types in self._open.values() for ids in types.values())
+
+    def has_pending(self):
+        return bool(self._pending)
+
+    def track(self, encounter_id, alert_type, alert_id):
+        """Adds a newly created unresolved alert to the index."""
+        if not self.enabled or not encounter_id or alert_id is None:
+            return
+        key = alert_type.upper()
+        self._open.setdefault(encounter_id, {}).setdefault(key, set()).add(alert_id)
+        self._streaks[(encounter_id, key)] = 0
+
+    def observe(self, vitals_data, fired_alerts):
+        """
+        Updates streaks for the reading's encounter given the alerts that fired
+        on it. Returns the ids queued for resolution by this reading.
+        """
+        encounter_id = vitals_data.get('encounter_id')
+        open_types = self._open.get(encounter_id)
+        if not open_types:
+            return []
+
+        fired = {a['type'].upper() for a in fired_alerts}
+        queued = []
+        for alert_type in list(open_types):
+            key = (encounter_id, alert_type)
+            if alert_type in fired:
+                self._streaks[key] = 0
+                continue
+            if not measures(vitals_data, alert_type):
+                continue
+
+            streak = self._streaks.get(key, 0) + 1
+            if streak < self.normal_readings:
+                self._streaks[key] = streak
+                continue
+
+            for alert_id in open_types.pop(alert_type):
+                self._pending.add(alert_id)
+                queued.append(alert_id)
+            self._streaks.pop(key, None)
+
+        if not open_types:
+            del self._open[encounter_id]
+        return queued
+
+    def flush(self, db):
+        """
+        Resolves all queued alerts with a single UPDATE. Caller commits.
+        Returns the number of alerts queued.
+        """
+        if not self._pending:
+            return 0
+
+        db.execute(
+            update(Alert)
+            .where(Alert.id.in_(self._pending), Alert.resolved == False)
+            .values(
+                resolved=True,
+                resolved_at=func.now(),
+                resolution_reason=f"auto: {self.normal_readings} consecutive readings in range"
+            )
+            .execution_options(synchronize_session=False)
+        )
+
+        count = len(self._pending)
+        self._pending = set()
+        logger.info(f"Auto-resolved {count} alerts")
+        return count
+
+    def checkpoint(self, encounter_ids):
+        """
+        Copies the open alerts and streaks of the given encounters, and the
+        queued resolutions, so restore() can undo a batch that fails and will
+        be processed again.
+        """
+        open_alerts = {}
+        for encounter_id in encounter_ids:
+            types = self._open.get(encounter_id)
+            open_alerts[encounter_id] = {
+                alert_type: (set(ids), self._streaks.get((encounter_id, alert_type)))
+                for alert_type, ids in types.items()
+            } if types else None
+        return open_alerts, set(self._pending)
+
+    def restore(self, checkpoint):
+        """Puts back the state saved by checkpoint()."""
+        open_alerts, pending = checkpoint
+        for encounter_id, types in open_alerts.items():
+            self.forget(encounter_id)
+            if not types:
+                continue
+            self._open[encounter_id] = {alert_type: ids for alert_type, (ids, _) in types.items()}
+            for alert_type, (_, streak) in types.items():
+                if streak is not None:
+                    self._streaks[(encounter_id, alert_type)] = streak
+        self._pending = pending
+
+    def forget(self, encounter_id):
+        """Drops index entries for an encounter (e.g. after discharge)."""
+        for alert_type in self._open.pop(encounter_id, {}):
+            self._streaks.pop((encounter_id, alert_type), None)
+
+    def load(self, db):
+        """
+        Rebuilds the open-alert index from unresolved alerts of active encounters,
+        replacing whatever was indexed before. Returns the number of alerts indexed.
+        """
+        rows = db.query(Alert.id, Alert.encounter_id, Alert.type).join(
+            Encounter, Encounter.id == Alert.encounter_id
+        ).filter(Alert.resolved == False, Encounter.status == 'active').all()
+
+        self._open = {}
+        self._streaks = {}
+        for alert_id, encounter_id, alert_type in rows:
+            self.track(encounter_id, alert_type, alert_id)
+
+        logger.info(f"Indexed {len(rows)} open alerts")
+        return len(rows)
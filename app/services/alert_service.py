@@ -1,9 +1,12 @@
 import logging
 from datetime import datetime
 from app.core.database import SessionLocal
-from app.domain.models import Alert
+from sqlalchemy import tuple_
+from sqlalchemy.dialects.postgresql import insert
+from app.domain.models import Alert, ALERT_NATURAL_KEY
 from app.core.kafka_client import KafkaClient
 from app.core.config import Config
+from app.services.rule_thresholds import ThresholdRegistry
 
 logger = logging.getLogger(__name__)
 
@@ -13,59 +16,32 @@ class AlertService:
         """
         Evaluates vitals against rules and creates alerts if thresholds are crossed.
         This runs synchronously within the request.
+
+        Returns the alert types triggered. Alerts that already exist for this
+        reading (e.g. raised by the stream consumer first) are not inserted or
+        published again.
         """
         alerts_created = []
         
         try:
-            # Rule 1: Tachycardia (HR > 130)
-            if vitals.hr_bpm and vitals.hr_bpm > 130:
-                severity = 'high' if vitals.hr_bpm > 150 else 'medium'
-                AlertService._create_alert(
-                    db, vitals, 
-                    type='tachycardia', 
-                    severity=severity, 
-                    message=f"HR {vitals.hr_bpm} bpm (> 130): Tachycardia suspected"
-                )
-                alerts_created.append('tachycardia')
-
-            # Rule 2: Hypoxia (SpO2 < 90)
-            if vitals.spo2_pct and vitals.spo2_pct < 90:
-                AlertService._create_alert(
-                    db, vitals, 
-                    type='hypoxia', 
-                    severity='high', 
-                    message=f"SpO₂ {vitals.spo2_pct}% (< 90%): Hypoxia suspected"
-                )
-                alerts_created.append('hypoxia')
-
-            # Rule 3: Hypertension (Sys > 180 OR Dia > 110)
-            sys = vitals.bp_systolic
-            dia = vitals.bp_diastolic
-            if (sys and sys > 180) or (dia and dia > 110):
-                msg_parts = []
-                if sys and sys > 180: msg_parts.append(f"Sys {sys} (> 180)")
-                if dia and dia > 110: msg_parts.append(f"Dia {dia} (> 110)")
+            evaluator = ThresholdRegistry.evaluator_for(AlertService.compile, vitals.encounter_id)
+            rows = []
+            for type, severity, message in evaluator(vitals):
+                rows.append({
+                    'patient_id': vitals.patient_id,
+                    'encounter_id': vitals.encounter_id,
+                    'timestamp': vitals.timestamp,
+                    'type': type,
+                    'severity': severity,
+                    'message': message,
+                    'resolved': False,
+                })
+                alerts_created.append(type)
                 
-                AlertService._create_alert(
-                    db, vitals, 
-                    type='hypertension', 
-                    severity='high', 
-                    message=f"BP {'/'.join(msg_parts)}: Hypertension suspected"
-                )
-                alerts_created.append('hypertension')
-
-            # Rule 4: Fever (Temp > 38.5)
-            if vitals.temp_c and vitals.temp_c > 38.5:
-                AlertService._create_alert(
-                    db, vitals, 
-                    type='fever', 
-                    severity='medium', 
-                    message=f"Temp {vitals.temp_c}°C (> 38.5): Fever suspected"
-                )
-                alerts_created.append('fever')
-                
-            if alerts_created:
+            if rows:
+                created = AlertService.insert_alerts(db, rows)
                 db.commit()
+                AlertService.publish(created)
                 
         except Exception as e:
             logger.error(f"Error evaluating alerts for vitals {vitals.id}: {e}")
@@ -74,31 +50,100 @@ class AlertService:
         return alerts_created
 
     @staticmethod
-    def _create_alert(db, vitals, type, severity, message):
-        alert = Alert(
-            patient_id=vitals.patient_id,
-            encounter_id=vitals.encounter_id,
-            timestamp=vitals.timestamp,
-            type=type,
-            severity=severity,
-            message=message,
-            resolved=False
+    def compile(thresholds):
+        """
+        Builds a checker for the given thresholds that returns
+        (type, severity, message) tuples for a Vitals row.
+        """
+        hr_high = thresholds['hr_high']
+        hr_very_high = thresholds['hr_very_high']
+        spo2_low = thresholds['spo2_low']
+        bp_sys_high = thresholds['bp_sys_high']
+        bp_dia_high = thresholds['bp_dia_high']
+        temp_high = thresholds['temp_high']
+
+        def evaluate(vitals):
+            results = []
+
+            # Rule 1: Tachycardia
+            if vitals.hr_bpm and vitals.hr_bpm > hr_high:
+                severity = 'high' if vitals.hr_bpm > hr_very_high else 'medium'
+                results.append(('tachycardia', severity, f"HR {vitals.hr_bpm} bpm (> {hr_high:g}): Tachycardia suspected"))
+
+            # Rule 2: Hypoxia
+            if vitals.spo2_pct and vitals.spo2_pct < spo2_low:
+                results.append(('hypoxia', 'high', f"SpO₂ {vitals.spo2_pct}% (< {spo2_low:g}%): Hypoxia suspected"))
+
+            # Rule 3: Hypertension (Sys OR Dia above limit)
+            sys = vitals.bp_systolic
+            dia = vitals.bp_diastolic
+            if (sys and sys > bp_sys_high) or (dia and dia > bp_dia_high):
+                msg_parts = []
+                if sys and sys > bp_sys_high: msg_parts.append(f"Sys {sys} (> {bp_sys_high:g})")
+                if dia and dia > bp_dia_high: msg_parts.append(f"Dia {dia} (> {bp_dia_high:g})")
+                results.append(('hypertension', 'high', f"BP {'/'.join(msg_parts)}: Hypertension suspected"))
+
+            # Rule 4: Fever
+            if vitals.temp_c and vitals.temp_c > temp_high:
+                results.append(('fever', 'medium', f"Temp {vitals.temp_c}°C (> {temp_high:g}): Fever suspected"))
+
+            return results
+
+        return evaluate
+
+    @staticmethod
+    def insert_alerts(db, rows):
+        """
+        Inserts alert rows, skipping any that already exist under the alerts
+        natural key (encounter, type, reading timestamp). Caller commits.
+        Returns the rows actually created, with their ids.
+        """
+        stmt = insert(Alert).on_conflict_do_nothing(index_elements=list(ALERT_NATURAL_KEY)).returning(
+            Alert.id, Alert.patient_id, Alert.encounter_id, Alert.timestamp,
+            Alert.type, Alert.severity, Alert.message
         )
-        db.add(alert)
-        # We need to flush to get the ID for Kafka, but commit happens in caller or later
-        db.flush() 
-        
-        # Publish to Kafka
+        created = db.execute(stmt, rows).all()
+        if len(created) < len(rows):
+            logger.info(f"Skipped {len(rows) - len(created)} duplicate alerts")
+        return created
+
+    @staticmethod
+    def find_open_alerts(db, rows):
+        """
+        Unresolved alerts matching the natural keys of `rows`, whoever
+        inserted them, as (id, encounter_id, type) rows.
+        """
+        keys = {(row['encounter_id'], row['type'].lower(), row['timestamp']) for row in rows}
+        return db.query(Alert.id, Alert.encounter_id, Alert.type).filter(
+            tuple_(*ALERT_NATURAL_KEY).in_(list(keys)),
+            Alert.resolved == False
+        ).all()
+
+    @staticmethod
+    def to_payload(alert):
+        """Alerts topic message for a created alert (ORM object or RETURNING row)."""
+        return {
+            'id': alert.id,
+            'alert_id': alert.id,
+            'patient_id': alert.patient_id,
+            'encounter_id': alert.encounter_id,
+            'type': alert.type,
+            'severity': alert.severity,
+            'message': alert.message,
+            'timestamp': alert.timestamp.isoformat() if alert.timestamp else None,
+            'created_at': datetime.utcnow().isoformat()
+        }
+
+    @staticmethod
+    def publish(created):
+        """Publishes newly created alerts to the alerts topic with one flush."""
+        if not created:
+            return []
+        payloads = [AlertService.to_payload(alert) for alert in created]
         try:
-            alert_payload = {
-                'alert_id': alert.id,
-                'patient_id': alert.patient_id,
-                'encounter_id': alert.encounter_id,
-                'type': alert.type,
-                'severity': alert.severity,
-                'message': alert.message,
-                'created_at': datetime.utcnow().isoformat()
-            }
-            KafkaClient.send_message(Config.KAFKA_TOPIC_ALERTS, alert_payload)
+            KafkaClient.send_batch(Config.KAFKA_TOPIC_ALERTS, payloads)
         except Exception as e:
-            logger.error(f"Failed to publish alert to Kafka: {e}")
+            logger.error(f"Failed to publish alerts to Kafka: {e}")
+        return payloads
+
+ThresholdRegistry.register_compiler(AlertService.compile)
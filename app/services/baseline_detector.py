@@ -0,0 +1,309 @@
+import logging
+import math
+import time
+from datetime import datetime, timezone
+from sqlalchemy import exists, func, select
+from sqlalchemy.dialects.postgresql import insert
+from app.core.config import Config
+from app.domain.models import VitalBaseline, Encounter, Vitals
+
+logger = logging.getLogger(__name__)
+
+# Vitals tracked per encounter, with a floor on the standard deviation so a
+# perfectly flat signal (e.g. temp 37.0 for hours) does not turn a 0.1 C wiggle
+# into a huge z-score.
+BASELINE_VITALS = {
+    'hr_bpm': 2.0,
+    'spo2_pct': 1.0,
+    'resp_rate_bpm': 1.0,
+    'bp_systolic': 3.0,
+    'bp_diastolic': 3.0,
+    'temp_c': 0.1,
+}
+
+# One alert type per vital: a reading deviating on several vitals raises one
+# alert each, and they must not collide on the alerts natural key
+# (encounter, type, timestamp)
+DEVIATION_TYPES = {
+    'hr_bpm': 'BASELINE_DEVIATION_HR',
+    'spo2_pct': 'BASELINE_DEVIATION_SPO2',
+    'resp_rate_bpm': 'BASELINE_DEVIATION_RESP',
+    'bp_systolic': 'BASELINE_DEVIATION_BP_SYS',
+    'bp_diastolic': 'BASELINE_DEVIATION_BP_DIA',
+    'temp_c': 'BASELINE_DEVIATION_TEMP',
+}
+
+VITAL_LABELS = {
+    'hr_bpm': 'HR',
+    'spo2_pct': 'SpO2',
+    'resp_rate_bpm': 'Resp',
+    'bp_systolic': 'BP Sys',
+    'bp_diastolic': 'BP Dia',
+    'temp_c': 'Temp',
+}
+
+
+def _reading_time(timestamp):
+    """A reading's timestamp as an aware datetime (naive ones are UTC), or None."""
+    if timestamp is None:
+        return None
+    if isinstance(timestamp, str):
+        timestamp = datetime.fromisoformat(timestamp)
+    return timestamp if timestamp.tzinfo else timestamp.replace(tzinfo=timezone.utc)
+
+
+class BaselineDetector:
+    """
+    Online per-encounter anomaly detector.
+
+    Keeps an exponentially weighted mean and variance for every tracked vital of
+    every encounter (three floats and a counter each), and flags readings whose
+    z-score against the patient's own baseline crosses `z_threshold` once the
+    baseline has seen `warmup` readings.
+    """
+
+    def __init__(self, alpha=None, z_threshold=None, warmup=None, snapshot_interval=None, idle_evict=None):
+        self.alpha = alpha if alpha is not None else Config.BASELINE_ALPHA
+        self.z_threshold = z_threshold if z_threshold is not None else Config.BASELINE_Z_THRESHOLD
+        self.warmup = warmup if warmup is not None else Config.BASELINE_WARMUP_READINGS
+        self.snapshot_interval = snapshot_interval if snapshot_interval is not None else Config.BASELINE_SNAPSHOT_INTERVAL_S
+        self.idle_evict = idle_evict if idle_evict is not None else Config.BASELINE_IDLE_EVICT_S
+
+        # (encounter_id, vital) -> [mean, variance, count]
+        self._states = {}
+        # encounter_id -> monotonic time of last reading
+        self._last_seen = {}
+        self._dirty = set()
+        # encounter_id -> timestamp of the newest reading folded in by seed()
+        self._seeded = {}
+        self._last_snapshot = time.monotonic()
+
+    def __len__(self):
+        return len(self._states)
+
+    def get_state(self, encounter_id, vital):
+        """Returns (mean, variance, count) for a vital, or None if unseen."""
+        state = self._states.get((encounter_id, vital))
+        return tuple(state) if state else None
+
+    def update(self, vitals_data):
+        """
+        Folds a reading into the encounter's baselines.
+        Returns alert dicts (same shape as RuleEngine.evaluate) for deviating vitals.
+        """
+        encounter_id = vitals_data.get('encounter_id')
+        if not encounter_id:
+            return []
+
+        watermark = self._seeded.get(encounter_id)
+        if watermark is not None:
+            timestamp = _reading_time(vitals_data.get('timestamp'))
+            if timestamp is not None and timestamp <= watermark:
+                # Already folded in by seed(); redelivered from the committed offset
+                return []
+            del self._seeded[encounter_id]
+
+        alerts = []
+        self._last_seen[encounter_id] = time.monotonic()
+
+        for vital, min_std in BASELINE_VITALS.items():
+            value = vitals_data.get(vital)
+            if value is None:
+                continue
+
+            key = (encounter_id, vital)
+            state = self._states.get(key)
+            if state is None:
+                self._states[key] = [float(value), 0.0, 1]
+                self._dirty.add(key)
+                continue
+
+            mean, variance, count = state
+            # Score against the baseline *before* this reading moves it
+            std = max(math.sqrt(variance), min_std)
+            z = (value - mean) / std
+
+            if count >= self.warmup and abs(z) >= self.z_threshold:
+                direction = "above" if z > 0 else "below"
+                alerts.append({
+                    'type': DEVIATION_TYPES[vital],
+                    'severity': 'medium',
+                    'message': f"{VITAL_LABELS[vital]} {value} is {direction} patient baseline {mean:.1f} (z={z:.1f})",
+                    'patient_id': vitals_data.get('patient_id'),
+                    'timestamp': vitals_data.get('timestamp'),
+                    'vital': vital,
+                    'z_score': round(z, 2)
+                })
+
+            # Until the EWMA has enough history, behave like a cumulative average
+            # so the first few readings don't dominate the baseline.
+            alpha = max(self.alpha, 1.0 / (count + 1))
+            diff = value - mean
+            increment = alpha * diff
+            state[0] = mean + increment
+            state[1] = (1 - alpha) * (variance + diff * increment)
+            state[2] = count + 1
+            self._dirty.add(key)
+
+        return alerts
+
+    def checkpoint(self, encounter_ids):
+        """
+        Copies the state of the given encounters so restore() can undo the
+        updates of a batch that fails and will be processed again.
+        """
+        states = {}
+        for encounter_id in encounter_ids:
+            for vital in BASELINE_VITALS:
+                key = (encounter_id, vital)
+                state = self._states.get(key)
+                states[key] = (list(state) if state else None, key in self._dirty)
+        return (states, {encounter_id: self._last_seen.get(encounter_id) for encounter_id in encounter_ids},
+                {encounter_id: self._seeded.get(encounter_id) for encounter_id in encounter_ids})
+
+    def restore(self, checkpoint):
+        """Puts back the state saved by checkpoint()."""
+        states, last_seen, seeded = checkpoint
+        for key, (state, dirty) in states.items():
+            if state is None:
+                self._states.pop(key, None)
+            else:
+                self._states[key] = state
+            if dirty:
+                self._dirty.add(key)
+            else:
+                self._dirty.discard(key)
+        for encounter_id, seen in last_seen.items():
+            if seen is None:
+                self._last_seen.pop(encounter_id, None)
+            else:
+                self._last_seen[encounter_id] = seen
+        for encounter_id, watermark in seeded.items():
+            if watermark is None:
+                self._seeded.pop(encounter_id, None)
+            else:
+                self._seeded[encounter_id] = watermark
+
+    def forget(self, encounter_id):
+        """Drops all state for an encounter (e.g. after discharge)."""
+        for vital in BASELINE_VITALS:
+            self._states.pop((encounter_id, vital), None)
+            self._dirty.discard((encounter_id, vital))
+        self._last_seen.pop(encounter_id, None)
+        self._seeded.pop(encounter_id, None)
+
+    def load(self, db):
+        """
+        Restores stored baselines for active encounters.
+        Returns the number of (encounter, vital) baselines loaded.
+        """
+        rows = db.query(VitalBaseline).join(
+            Encounter, Encounter.id == VitalBaseline.encounter_id
+        ).filter(Encounter.status == 'active').all()
+
+        now = time.monotonic()
+        for row in rows:
+            if row.vital not in BASELINE_VITALS:
+                continue
+            self._states[(row.encounter_id, row.vital)] = [row.mean, row.variance, row.samples]
+            self._last_seen[row.encounter_id] = now
+
+        logger.info(f"Loaded {len(rows)} vital baselines")
+        return len(rows)
+
+    def seed(self, db, readings=None):
+        """
+        Folds the last `readings` stored vitals of every active encounter that
+        has no stored baseline (admitted since the last snapshot) into the
+        detector, in one windowed query, so those encounters are not stuck in
+        warm-up after a restart. Deviations found while seeding are not
+        reported. Encounters already tracked in memory are skipped.
+
+        The stream redelivers readings from the committed offset, which may
+        include some of the seeded ones; the newest seeded timestamp is kept
+        per encounter and update() ignores readings up to it, so none is
+        folded in twice. Returns the number of readings replayed.
+        """
+        readings = readings if readings is not None else Config.BASELINE_SEED_READINGS
+        if readings <= 0:
+            return 0
+
+        recent = select(
+            Vitals.encounter_id,
+            Vitals.timestamp,
+            *(getattr(Vitals, vital) for vital in BASELINE_VITALS),
+            func.row_number().over(
+                partition_by=Vitals.encounter_id, order_by=Vitals.timestamp.desc()
+            ).label('recency'),
+        ).join(
+            Encounter, Encounter.id == Vitals.encounter_id
+        ).where(
+            Encounter.status == 'active',
+            ~exists().where(VitalBaseline.encounter_id == Vitals.encounter_id),
+        ).subquery()
+        rows = db.execute(
+            select(recent).where(recent.c.recency <= readings)
+            .order_by(recent.c.encounter_id, recent.c.timestamp)
+        ).all()
+
+        tracked = {encounter_id for encounter_id, _ in self._states}
+        replayed = 0
+        for row in rows:
+            reading = dict(row._mapping)
+            if reading['encounter_id'] in tracked:
+                continue
+            self.update(reading)
+            timestamp = _reading_time(reading['timestamp'])
+            if timestamp is not None:
+                self._seeded[reading['encounter_id']] = timestamp
+            replayed += 1
+
+        logger.info(f"Seeded baselines from {replayed} recent readings")
+        return replayed
+
+    def snapshot_due(self):
+        return time.monotonic() - self._last_snapshot >= self.snapshot_interval
+
+    def snapshot(self, db):
+        """
+        Upserts every baseline changed since the last snapshot in one statement,
+        and evicts encounters that have been silent for longer than `idle_evict`.
+        Returns the number of rows written.
+        """
+        self._last_snapshot = time.monotonic()
+        self._evict_idle()
+
+        rows = [
+            {
+                'encounter_id': encounter_id,
+                'vital': vital,
+                'mean': self._states[(encounter_id, vital)][0],
+                'variance': self._states[(encounter_id, vital)][1],
+                'samples': self._states[(encounter_id, vital)][2],
+            }
+            for encounter_id, vital in self._dirty
+            if (encounter_id, vital) in self._states
+        ]
+        if not rows:
+            return 0
+
+        stmt = insert(VitalBaseline).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            constraint="uq_vital_baselines_encounter_vital",
+            set_={
+                'mean': stmt.excluded.mean,
+                'variance': stmt.excluded.variance,
+                'samples': stmt.excluded.samples,
+                'updated_at': func.now(),
+            }
+        )
+        db.execute(stmt)
+        db.commit()
+        self._dirty.clear()
+        logger.info(f"Snapshotted {len(rows)} vital baselines")
+        return len(rows)
+
+    def _evict_idle(self):
+        cutoff = time.monotonic() - self.idle_evict
+        for encounter_id in [e for e, seen in self._last_seen.items() if seen < cutoff]:
+            self.forget(encounter_id)
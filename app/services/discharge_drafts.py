@@ -0,0 +1,144 @@
+"""
+Speculative discharge plans for stable encounters.
+
+A discharge plan otherwise costs a full LLM call after the decision to
+discharge. DischargePlanDrafter checks every DISCHARGE_DRAFT_INTERVAL_S for
+active encounters that meet the DischargeService stability criteria and have
+no draft yet, and drafts up to DISCHARGE_DRAFT_BATCH plans, but only while
+the LLM is idle: no model calls in flight in this process, the circuit
+closed and no discharge plan jobs waiting. Discharge work always goes first.
+
+A draft records the newest alert and observation it was written from; a
+newer one invalidates it (DischargeService.valid_draft), and the next check
+drafts again if the encounter is still stable. Each check deletes stale
+drafts in one statement, and only re-evaluates the stability of encounters
+with a new alert or observation since they were last found unstable (or
+after DISCHARGE_DRAFT_RECHECK_S, since old alerts age out of the window). Discharging an encounter with
+a valid draft persists it as the plan without calling the LLM
+(DischargeService.plan_from_draft).
+"""
+import logging
+import threading
+import time
+from sqlalchemy import func, or_, select
+from app.core.config import Config
+from app.core.database import SessionLocal
+from app.domain.models import Alert, Encounter, DischargePlanDraft, DischargePlanJob, Observation
+from app.llm.breaker import CircuitBreaker
+from app.llm.runtime import LLMRuntime
+from app.services.discharge_service import DischargeService, DRAFTS
+
+logger = logging.getLogger(__name__)
+
+
+class DischargePlanDrafter:
+    _thread = None
+
+    def __init__(self, session_factory=SessionLocal, batch=None, recheck_s=None, clock=time.monotonic):
+        self.session_factory = session_factory
+        self.batch = batch if batch is not None else Config.DISCHARGE_DRAFT_BATCH
+        self.recheck_s = recheck_s if recheck_s is not None else Config.DISCHARGE_DRAFT_RECHECK_S
+        self.clock = clock
+        # encounter_id -> (draft basis, clock time) when last found unstable
+        self._unstable = {}
+
+    @classmethod
+    def start(cls, interval=None):
+        """Starts the drafting thread once per process."""
+        interval = interval if interval is not None else Config.DISCHARGE_DRAFT_INTERVAL_S
+        if interval <= 0 or cls._thread is not None:
+            return
+        cls._thread = threading.Thread(target=cls().run, args=(interval,), name="discharge-plan-drafter", daemon=True)
+        cls._thread.start()
+
+    def run(self, interval, stop_event=None):
+        stop_event = stop_event or threading.Event()
+        # Nothing is urgent at startup; let the process settle first
+        while not stop_event.wait(interval):
+            self.run_once()
+
+    @staticmethod
+    def llm_idle(db) -> bool:
+        runtime = LLMRuntime.get()
+        if runtime.in_flight or runtime.breaker.state != CircuitBreaker.CLOSED:
+            return False
+        return db.query(DischargePlanJob).filter(DischargePlanJob.status.in_(("pending", "running"))).count() == 0
+
+    def run_once(self) -> int:
+        """One check: drops stale drafts, then drafts plans for stable encounters. Returns the number drafted."""
+        db = self.session_factory()
+        drafted = 0
+        try:
+            self.sweep(db)
+            candidates = self.candidates(db)
+            # Forget encounters that were discharged or drafted meanwhile
+            self._unstable = {e: seen for e, seen in self._unstable.items() if e in candidates}
+            for encounter_id, basis in candidates.items():
+                if drafted >= self.batch or not self.llm_idle(db):
+                    break
+                if not self._due(encounter_id, basis):
+                    continue
+                if not DischargeService.is_stable_for_discharge(encounter_id, db):
+                    self._unstable[encounter_id] = (basis, self.clock())
+                    continue
+                self._unstable.pop(encounter_id, None)
+                try:
+                    DischargeService.generate_draft(encounter_id, db)
+                except Exception as e:
+                    # Leave the model alone until the next check
+                    db.rollback()
+                    DRAFTS.inc(result="failed")
+                    logger.warning(f"Failed to draft discharge plan for encounter {encounter_id}: {e}")
+                    break
+                drafted += 1
+                DRAFTS.inc(result="drafted")
+                logger.info(f"Drafted discharge plan for stable encounter {encounter_id}")
+        except Exception as e:
+            logger.error(f"Discharge plan drafting failed: {e}")
+            db.rollback()
+        finally:
+            db.close()
+        return drafted
+
+    def _due(self, encounter_id, basis) -> bool:
+        """False while nothing has changed since the encounter was last found unstable."""
+        seen = self._unstable.get(encounter_id)
+        return seen is None or seen[0] != basis or self.clock() - seen[1] >= self.recheck_s
+
+    @staticmethod
+    def sweep(db) -> int:
+        """
+        Deletes, in one statement, drafts whose encounter is no longer active
+        or that are older than its newest alert or observation (see
+        DischargeService.valid_draft). Returns the number deleted.
+        """
+        last_alert = select(func.max(Alert.id)).where(
+            Alert.encounter_id == DischargePlanDraft.encounter_id).scalar_subquery()
+        last_observation = select(func.max(Observation.id)).where(
+            Observation.encounter_id == DischargePlanDraft.encounter_id).scalar_subquery()
+        deleted = db.query(DischargePlanDraft).filter(or_(
+            DischargePlanDraft.encounter_id.not_in(select(Encounter.id).where(Encounter.status == "active")),
+            DischargePlanDraft.last_alert_id.is_distinct_from(last_alert),
+            DischargePlanDraft.last_observation_id.is_distinct_from(last_observation),
+        )).delete(synchronize_session=False)
+        db.commit()
+        if deleted:
+            DRAFTS.inc(deleted, result="invalidated")
+            logger.info(f"Discarded {deleted} stale discharge plan drafts")
+        return deleted
+
+    @staticmethod
+    def candidates(db) -> dict:
+        """
+        Active encounters without a draft, longest admitted first, mapped to
+        their draft basis (newest alert id, newest observation id), in one query.
+        """
+        last_alert = select(func.max(Alert.id)).where(Alert.encounter_id == Encounter.id).scalar_subquery()
+        last_observation = select(func.max(Observation.id)).where(
+            Observation.encounter_id == Encounter.id).scalar_subquery()
+        rows = db.query(Encounter.id, last_alert, last_observation).filter(
+            Encounter.status == "active",
+            Encounter.auto_discharge_blocked == False,
+            Encounter.id.not_in(select(DischargePlanDraft.encounter_id))
+        ).order_by(Encounter.admitted_at).all()
+        return {encounter_id: (alert_id, observation_id) for encounter_id, alert_id, observation_id in rows}
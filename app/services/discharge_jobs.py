@@ -0,0 +1,191 @@
+"""
+Discharge plans generated off the request path.
+
+Discharging an encounter queues a DischargePlanJob instead of waiting on the
+LLM. DischargePlanWorker claims due jobs from the database (FOR UPDATE SKIP
+LOCKED, so API processes and scripts/run_discharge_worker.py can share the
+queue), runs up to DISCHARGE_JOB_CONCURRENCY at a time and retries failed
+attempts with exponential backoff. After DISCHARGE_JOB_MAX_ATTEMPTS the job
+is marked failed with the last error; a doctor can queue it again.
+
+Jobs are idempotent: if the encounter already has a plan (e.g. a worker died
+after saving it), the job is just marked ready. A valid speculative draft
+(app/services/discharge_drafts.py) is persisted instead of calling the LLM.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session
+from app.core.config import Config
+from app.core.database import SessionLocal
+from app.core.metrics import REGISTRY
+from app.domain.models import DischargePlan, DischargePlanJob
+from app.services.discharge_service import DischargeService
+
+logger = logging.getLogger(__name__)
+
+JOBS = REGISTRY.counter('discharge_plan_jobs_total', 'Discharge plan job attempts, by outcome', ('result',))
+JOB_SECONDS = REGISTRY.histogram(
+    'discharge_plan_job_seconds', 'Discharge plan job attempt duration', buckets=(1, 2.5, 5, 10, 30, 60, 120))
+
+
+def job_to_dict(job: DischargePlanJob) -> dict:
+    return {
+        "job_id": job.id,
+        "encounter_id": job.encounter_id,
+        "status": job.status,
+        "attempts": job.attempts,
+        "error": job.error,
+        "created_at": job.created_at,
+        "finished_at": job.finished_at,
+    }
+
+
+class DischargePlanJobs:
+    @staticmethod
+    def enqueue(encounter_id: int, db: Session) -> DischargePlanJob:
+        """
+        Queues plan generation for an encounter and wakes the local worker.
+        Returns the encounter's unfinished job instead if it already has one.
+        """
+        job = db.query(DischargePlanJob).filter(
+            DischargePlanJob.encounter_id == encounter_id,
+            DischargePlanJob.status.in_(("pending", "running"))
+        ).first()
+        if job:
+            return job
+
+        job = DischargePlanJob(encounter_id=encounter_id, status="pending", attempts=0,
+                               next_attempt_at=datetime.now(timezone.utc))
+        db.add(job)
+        db.commit()
+        db.refresh(job)
+        logger.info(f"Queued discharge plan job {job.id} for encounter {encounter_id}")
+        DischargePlanWorker.notify()
+        return job
+
+    @staticmethod
+    def latest(encounter_id: int, db: Session):
+        """The encounter's most recent job, or None."""
+        return db.query(DischargePlanJob).filter(
+            DischargePlanJob.encounter_id == encounter_id
+        ).order_by(DischargePlanJob.id.desc()).first()
+
+
+class DischargePlanWorker:
+    _thread = None
+    _wake = threading.Event()
+
+    def __init__(self, concurrency=None, session_factory=SessionLocal, max_attempts=None, backoff_s=None,
+                 stale_s=None, poll_s=None):
+        self.concurrency = concurrency if concurrency is not None else Config.DISCHARGE_JOB_CONCURRENCY
+        self.session_factory = session_factory
+        self.max_attempts = max_attempts if max_attempts is not None else Config.DISCHARGE_JOB_MAX_ATTEMPTS
+        self.backoff_s = backoff_s if backoff_s is not None else Config.DISCHARGE_JOB_RETRY_BACKOFF_S
+        self.stale_s = stale_s if stale_s is not None else Config.DISCHARGE_JOB_STALE_S
+        self.poll_s = poll_s if poll_s is not None else Config.DISCHARGE_JOB_POLL_S
+        self.executor = ThreadPoolExecutor(max_workers=max(self.concurrency, 1), thread_name_prefix="discharge-plan")
+        self.in_flight = set()
+
+    @classmethod
+    def start(cls, concurrency=None):
+        """Starts the worker thread once per process; DISCHARGE_JOB_CONCURRENCY=0 leaves jobs to other processes."""
+        concurrency = concurrency if concurrency is not None else Config.DISCHARGE_JOB_CONCURRENCY
+        if concurrency <= 0 or cls._thread is not None:
+            return
+        cls._thread = threading.Thread(target=cls(concurrency).run, name="discharge-plan-worker", daemon=True)
+        cls._thread.start()
+
+    @classmethod
+    def notify(cls):
+        """Wakes the worker to claim jobs now rather than at the next poll."""
+        cls._wake.set()
+
+    def run(self, stop_event=None):
+        logger.info(f"Discharge plan worker started ({self.concurrency} concurrent jobs)")
+        while not (stop_event and stop_event.is_set()):
+            self.in_flight = {f for f in self.in_flight if not f.done()}
+            free = self.concurrency - len(self.in_flight)
+            if free > 0:
+                for job_id in self.claim(free):
+                    self.in_flight.add(self.executor.submit(self.run_job, job_id))
+            self._wake.wait(self.poll_s)
+            self._wake.clear()
+        self.executor.shutdown(wait=True)
+
+    def claim(self, limit: int) -> list:
+        """
+        Marks up to `limit` due jobs as running and returns their ids: pending
+        jobs whose backoff has passed, and running jobs left by a crashed worker.
+        """
+        db = self.session_factory()
+        try:
+            now = datetime.now(timezone.utc)
+            jobs = db.query(DischargePlanJob).filter(or_(
+                and_(DischargePlanJob.status == "pending", DischargePlanJob.next_attempt_at <= now),
+                and_(DischargePlanJob.status == "running",
+                     DischargePlanJob.started_at < now - timedelta(seconds=self.stale_s))
+            )).order_by(DischargePlanJob.id).limit(limit).with_for_update(skip_locked=True).all()
+            job_ids = []
+            for job in jobs:
+                job.status = "running"
+                job.attempts = (job.attempts or 0) + 1
+                job.started_at = now
+                job_ids.append(job.id)
+            db.commit()
+            return job_ids
+        except Exception as e:
+            logger.error(f"Failed to claim discharge plan jobs: {e}")
+            db.rollback()
+            return []
+        finally:
+            db.close()
+
+    def run_job(self, job_id: int):
+        """One attempt at a claimed job: generate and save the plan, or schedule a retry."""
+        db = self.session_factory()
+        started = time.perf_counter()
+        try:
+            job = db.query(DischargePlanJob).filter(DischargePlanJob.id == job_id).first()
+            if not job:
+                return
+            try:
+                if (not db.query(DischargePlan).filter(DischargePlan.encounter_id == job.encounter_id).first()
+                        and not DischargeService.plan_from_draft(job.encounter_id, db)):
+                    DischargeService.generate_discharge_plan(job.encounter_id, db, fallback=False)
+                job.status = "ready"
+                job.error = None
+                job.finished_at = datetime.now(timezone.utc)
+                db.commit()
+                JOBS.inc(result="ready")
+                logger.info(f"Discharge plan job {job_id} ready (encounter {job.encounter_id})")
+            except Exception as e:
+                db.rollback()
+                self._record_failure(db, job_id, e)
+        except Exception as e:
+            logger.error(f"Discharge plan job {job_id} could not be updated: {e}")
+            db.rollback()
+        finally:
+            JOB_SECONDS.observe(time.perf_counter() - started)
+            db.close()
+            # A slot is free
+            self._wake.set()
+
+    def _record_failure(self, db, job_id, error):
+        job = db.query(DischargePlanJob).filter(DischargePlanJob.id == job_id).first()
+        job.error = str(error)
+        if job.attempts >= self.max_attempts:
+            job.status = "failed"
+            job.finished_at = datetime.now(timezone.utc)
+            JOBS.inc(result="failed")
+            logger.error(f"Discharge plan job {job_id} failed after {job.attempts} attempts: {error}")
+        else:
+            delay = self.backoff_s * 2 ** (job.attempts - 1)
+            job.status = "pending"
+            job.next_attempt_at = datetime.now(timezone.utc) + timedelta(seconds=delay)
+            JOBS.inc(result="retry")
+            logger.warning(f"Discharge plan job {job_id} attempt {job.attempts} failed, retrying in {delay:.0f}s: {error}")
+        db.commit()
@@ -1,8 +1,17 @@
+from sqlalchemy import func
 from sqlalchemy.orm import Session
-from app.domain.models import Encounter, Room, Vitals, Alert, DischargePlan, FollowupAppointment
+from app.core.metrics import REGISTRY
+from app.domain.models import Encounter, Room, Vitals, Alert, Observation, DischargePlan, DischargePlanDraft, FollowupAppointment
 from app.services.llm_service import LLMService
 from datetime import datetime, timedelta
 import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+DRAFTS = REGISTRY.counter(
+    'discharge_plan_drafts_total', 'Speculative discharge plan drafts, by outcome (drafted / used / invalidated / failed)',
+    ('result',))
 
 # Constants for stability rules
 MIN_DAYS_ADMITTED = 2
@@ -107,25 +116,113 @@ class DischargeService:
         return encounter
 
     @staticmethod
-    def generate_discharge_plan(encounter_id: int, db: Session) -> DischargePlan:
+    def generate_discharge_plan(encounter_id: int, db: Session, fallback: bool = True) -> DischargePlan:
         """
         Generates a discharge plan using LLM and persists it.
+        With fallback=False, LLM failures raise instead of saving the
+        manual-review plan (see DischargePlanJobs).
         """
         encounter = db.query(Encounter).filter(Encounter.id == encounter_id).first()
         if not encounter:
             raise ValueError("Encounter not found")
-            
+
+        context = DischargeService._plan_context(encounter, db)
+        
+        # Call LLM
+        plan_data = LLMService.generate_discharge_plan_json(context, fallback=fallback)
+        return DischargeService._save_plan(encounter, plan_data, db)
+
+    @staticmethod
+    def draft_basis(encounter_id: int, db: Session) -> tuple:
+        """
+        (newest alert id, newest observation id) for the encounter: what a
+        draft plan was written from.
+        """
+        last_alert_id = db.query(func.max(Alert.id)).filter(Alert.encounter_id == encounter_id).scalar()
+        last_observation_id = db.query(func.max(Observation.id)).filter(Observation.encounter_id == encounter_id).scalar()
+        return last_alert_id, last_observation_id
+
+    @staticmethod
+    def generate_draft(encounter_id: int, db: Session) -> DischargePlanDraft:
+        """
+        Drafts a discharge plan ahead of the discharge decision (see
+        DischargePlanDrafter), replacing any earlier draft. LLM errors raise.
+        """
+        encounter = db.query(Encounter).filter(Encounter.id == encounter_id).first()
+        if not encounter:
+            raise ValueError("Encounter not found")
+
+        # Taken before the LLM call, so anything arriving meanwhile invalidates the draft
+        last_alert_id, last_observation_id = DischargeService.draft_basis(encounter_id, db)
+        context = DischargeService._plan_context(encounter, db)
+        plan_data = LLMService.generate_discharge_plan_json(context, fallback=False, task="discharge_draft")
+
+        db.query(DischargePlanDraft).filter(DischargePlanDraft.encounter_id == encounter_id).delete()
+        draft = DischargePlanDraft(
+            encounter_id=encounter_id,
+            summary=plan_data.get("discharge_summary"),
+            home_care_instructions=json.dumps(plan_data.get("home_care_instructions")),
+            recommended_meds=json.dumps(plan_data.get("recommended_meds")),
+            followup_days=plan_data.get("followup_days", 7),
+            last_alert_id=last_alert_id,
+            last_observation_id=last_observation_id
+        )
+        db.add(draft)
+        db.commit()
+        db.refresh(draft)
+        return draft
+
+    @staticmethod
+    def valid_draft(encounter_id: int, db: Session):
+        """
+        The encounter's draft plan, or None. A draft older than the newest
+        alert or observation is deleted instead.
+        """
+        draft = db.query(DischargePlanDraft).filter(DischargePlanDraft.encounter_id == encounter_id).first()
+        if not draft:
+            return None
+        if (draft.last_alert_id, draft.last_observation_id) != DischargeService.draft_basis(encounter_id, db):
+            db.delete(draft)
+            db.commit()
+            DRAFTS.inc(result="invalidated")
+            logger.info(f"Discarded stale discharge plan draft for encounter {encounter_id}")
+            return None
+        return draft
+
+    @staticmethod
+    def plan_from_draft(encounter_id: int, db: Session):
+        """
+        Persists a still-valid draft as the encounter's discharge plan (no LLM
+        call) and returns the plan, or None when there is no valid draft.
+        """
+        draft = DischargeService.valid_draft(encounter_id, db)
+        if not draft:
+            return None
+        encounter = db.query(Encounter).filter(Encounter.id == encounter_id).first()
+        plan_data = {
+            "discharge_summary": draft.summary,
+            "home_care_instructions": json.loads(draft.home_care_instructions) if draft.home_care_instructions else [],
+            "recommended_meds": json.loads(draft.recommended_meds) if draft.recommended_meds else [],
+            "followup_days": draft.followup_days or 7
+        }
+        db.delete(draft)
+        plan = DischargeService._save_plan(encounter, plan_data, db, generated_by="llm_draft")
+        DRAFTS.inc(result="used")
+        return plan
+
+    @staticmethod
+    def _plan_context(encounter: Encounter, db: Session) -> dict:
         # Collect context
         # Fetch recent vitals, alerts, patient info
         recent_vitals = db.query(Vitals).filter(
-            Vitals.encounter_id == encounter_id
+            Vitals.encounter_id == encounter.id
         ).order_by(Vitals.timestamp.desc()).limit(10).all()
         
         alerts = db.query(Alert).filter(
-            Alert.encounter_id == encounter_id
+            Alert.encounter_id == encounter.id
         ).all()
         
-        context = {
+        return {
             "patient_age": datetime.utcnow().year - encounter.patient.dob.year if encounter.patient.dob else "unknown",
             "gender": encounter.patient.gender,
             "admitted_at": encounter.admitted_at.isoformat() if encounter.admitted_at else None,
@@ -136,26 +233,25 @@ class DischargeService:
             ],
             "alerts_count": len(alerts)
         }
-        
-        # Call LLM
-        plan_data = LLMService.generate_discharge_plan_json(context)
-        
+
+    @staticmethod
+    def _save_plan(encounter: Encounter, plan_data: dict, db: Session, generated_by: str = "llm") -> DischargePlan:
         # Create DischargePlan
         plan = DischargePlan(
-            encounter_id=encounter_id,
+            encounter_id=encounter.id,
             patient_id=encounter.patient_id,
             summary=plan_data.get("discharge_summary"),
             home_care_instructions=json.dumps(plan_data.get("home_care_instructions")),
             recommended_meds=json.dumps(plan_data.get("recommended_meds")),
             followup_days=plan_data.get("followup_days", 7),
-            generated_by="llm"
+            generated_by=generated_by
         )
         db.add(plan)
         
         # Create FollowupAppointment
         followup_date = datetime.utcnow() + timedelta(days=plan.followup_days)
         appointment = FollowupAppointment(
-            encounter_id=encounter_id,
+            encounter_id=encounter.id,
             patient_id=encounter.patient_id,
             scheduled_for=followup_date,
             status="pending"
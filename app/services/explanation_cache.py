@@ -0,0 +1,216 @@
+"""
+Cache of LLM alert explanations, keyed on a normalized alert context.
+
+Most alerts the copilot explains look alike once the context is coarsened:
+same type and severity, a similar patient and similar vitals. The key keeps
+the alert type, severity, gender, a 10-year age band and the latest vitals
+rounded into clinical buckets, so those alerts share one LLM answer.
+
+Entries live in an in-process LRU (bounded, with a TTL) in front of the
+`explanation_cache` table, which every copilot worker and process reads, so
+an explanation generated once is reused everywhere until it expires.
+"""
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from sqlalchemy import delete
+from sqlalchemy.dialects.postgresql import insert
+from app.core.config import Config
+from app.core.database import SessionLocal
+from app.core.metrics import REGISTRY
+from app.domain.models import ExplanationCacheEntry
+
+logger = logging.getLogger(__name__)
+
+LOOKUPS = REGISTRY.counter(
+    'copilot_explanation_cache_total', 'Explanation cache lookups, by result (memory / database / miss)', ('result',))
+HIT_RATIO = REGISTRY.gauge('copilot_explanation_cache_hit_ratio', 'Share of explanation cache lookups that hit')
+SECONDS_SAVED = REGISTRY.counter(
+    'copilot_llm_seconds_saved_total', 'LLM generation time avoided by explanation cache hits')
+
+# vital -> bucket width
+VITAL_BUCKETS = {'hr': 10, 'spo2': 2, 'bp_systolic': 10, 'bp_diastolic': 10, 'temp': 0.5, 'rr': 4}
+
+# LLMService returns these risk levels; anything else is its error fallback, which is not cached
+CACHEABLE_RISK_LEVELS = {'High', 'Moderate', 'Low'}
+
+
+def _bucket(value, width):
+    if value is None:
+        return None
+    try:
+        return round(float(value) // width * width, 1)
+    except (TypeError, ValueError):
+        return None
+
+
+def _age_band(age):
+    if not isinstance(age, int):
+        return 'unknown'
+    if age >= 90:
+        return '90+'
+    low = age // 10 * 10
+    return f"{low}-{low + 9}"
+
+
+def normalize_context(context):
+    """The parts of an alert context that drive the explanation, coarsened into buckets."""
+    latest = (context.get('recent_vitals') or [{}])[0]
+    systolic, _, diastolic = str(latest.get('bp') or '').partition('/')
+    readings = {
+        'hr': latest.get('hr'),
+        'spo2': latest.get('spo2'),
+        'bp_systolic': systolic if systolic not in ('', 'None') else None,
+        'bp_diastolic': diastolic if diastolic not in ('', 'None') else None,
+        'temp': latest.get('temp'),
+        'rr': latest.get('rr'),
+    }
+    return {
+        'alert_type': str(context.get('alert_type') or '').upper(),
+        'severity': str(context.get('severity') or '').lower(),
+        'age_band': _age_band(context.get('patient_age')),
+        'gender': str(context.get('gender') or 'unknown').lower(),
+        'vitals': {vital: _bucket(readings[vital], width) for vital, width in VITAL_BUCKETS.items()},
+    }
+
+
+def has_vitals(normalized):
+    """
+    True if the context has at least one recent vital. Without any, every
+    alert of a type / severity / age band / gender would share one key, so
+    such contexts are not cached.
+    """
+    return any(value is not None for value in normalized['vitals'].values())
+
+
+def cache_key(normalized):
+    return hashlib.sha256(json.dumps(normalized, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+class ExplanationCache:
+    """
+    Two-level (process LRU, then database) cache of explanation dicts.
+    Thread-safe; database errors are logged and treated as misses so the
+    copilot falls back to the LLM.
+    """
+
+    def __init__(self, ttl_s=None, max_entries=None, session_factory=SessionLocal, clock=time.time):
+        self.ttl_s = ttl_s if ttl_s is not None else Config.EXPLANATION_CACHE_TTL_S
+        self.max_entries = max_entries or Config.EXPLANATION_CACHE_MAX_ENTRIES
+        self.session_factory = session_factory
+        self.clock = clock
+        # key -> (expires_at, explanation, llm_seconds)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._lookups = 0
+        self._hits = 0
+        self._puts = 0
+
+    @property
+    def enabled(self):
+        return self.ttl_s > 0
+
+    def get(self, context):
+        """Returns the cached explanation for an alert context, or None."""
+        if not self.enabled:
+            return None
+        normalized = normalize_context(context)
+        if not has_vitals(normalized):
+            return None
+        key = cache_key(normalized)
+
+        entry = self._get_local(key)
+        result = 'memory'
+        if entry is None:
+            entry = self._get_shared(key)
+            result = 'database' if entry else 'miss'
+        self._record(result, entry)
+        return dict(entry[1]) if entry else None
+
+    def put(self, context, explanation, llm_seconds):
+        """Stores a freshly generated explanation in both levels (LLM error fallbacks are skipped)."""
+        if not self.enabled or explanation.get('risk_level') not in CACHEABLE_RISK_LEVELS:
+            return
+        normalized = normalize_context(context)
+        if not has_vitals(normalized):
+            return
+        key = cache_key(normalized)
+        self._put_local(key, (self.clock() + self.ttl_s, dict(explanation), llm_seconds))
+
+        db = self.session_factory()
+        try:
+            stmt = insert(ExplanationCacheEntry).values(
+                key=key,
+                context=json.dumps(normalized, sort_keys=True),
+                explanation=json.dumps(explanation),
+                llm_seconds=llm_seconds,
+            )
+            db.execute(stmt.on_conflict_do_update(
+                index_elements=[ExplanationCacheEntry.key],
+                set_={'explanation': stmt.excluded.explanation, 'llm_seconds': stmt.excluded.llm_seconds,
+                      'created_at': datetime.now(timezone.utc)},
+            ))
+            self._puts += 1
+            if self._puts % 100 == 0:
+                db.execute(delete(ExplanationCacheEntry).where(ExplanationCacheEntry.created_at < self._cutoff()))
+            db.commit()
+        except Exception as e:
+            logger.warning(f"Failed to store cached explanation: {e}")
+            db.rollback()
+        finally:
+            db.close()
+
+    def _cutoff(self):
+        return datetime.fromtimestamp(self.clock() - self.ttl_s, timezone.utc)
+
+    def _get_local(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= self.clock():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def _put_local(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _get_shared(self, key):
+        db = self.session_factory()
+        try:
+            row = db.query(ExplanationCacheEntry).filter(
+                ExplanationCacheEntry.key == key,
+                ExplanationCacheEntry.created_at >= self._cutoff(),
+            ).first()
+            if row is None:
+                return None
+            # Expires locally when the shared row does
+            expires_at = row.created_at.timestamp() + self.ttl_s
+            entry = (expires_at, json.loads(row.explanation), row.llm_seconds or 0.0)
+        except Exception as e:
+            logger.warning(f"Explanation cache lookup failed: {e}")
+            return None
+        finally:
+            db.close()
+        self._put_local(key, entry)
+        return entry
+
+    def _record(self, result, entry):
+        LOOKUPS.inc(result=result)
+        with self._lock:
+            self._lookups += 1
+            if entry:
+                self._hits += 1
+            HIT_RATIO.set(round(self._hits / self._lookups, 4))
+        if entry:
+            SECONDS_SAVED.inc(entry[2])
@@ -0,0 +1,175 @@
+"""
+Live alert explanations for the API.
+
+ExplanationStreamHub runs at most one explanation generation per alert in
+this process. The first viewer of an alert without a stored explanation
+starts it on a background thread; later viewers attach to the same
+generation and get the latest partial result, then the final one. The
+generation finishes (and is persisted, once) even if every viewer
+disconnects. Across processes the unique AlertExplanation.alert_id keeps a
+single row: if the copilot or another API worker saved one first, that row
+is what viewers get.
+"""
+import json
+import logging
+import threading
+import time
+from sqlalchemy.exc import IntegrityError
+from app.core.database import SessionLocal
+from app.core.metrics import REGISTRY
+from app.domain.models import Alert, AlertExplanation
+from app.services.llm_service import LLMService
+from app.services.alert_copilot import patient_context, alert_context, recent_vitals, explanation_route
+from app.services.explanation_templates import rule_explanation
+from app.services.explanation_cache import ExplanationCache
+
+logger = logging.getLogger(__name__)
+
+VIEWERS = REGISTRY.counter(
+    'explanation_stream_viewers_total', 'Explanation stream viewers, by whether they started or joined a generation', ('mode',))
+
+
+def explanation_to_dict(explanation):
+    return {
+        "alert_id": explanation.alert_id,
+        "summary": explanation.summary,
+        "risk_level": explanation.risk_level,
+        "suggested_checks": json.loads(explanation.suggested_checks) if explanation.suggested_checks else [],
+        "suggested_actions": json.loads(explanation.suggested_actions) if explanation.suggested_actions else [],
+        "created_at": explanation.created_at
+    }
+
+
+class _Generation:
+    """Latest partial result and, once finished, the final event of one generation."""
+
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.version = 0
+        self.partial = None
+        self.result = None
+
+    def update(self, partial):
+        with self.cond:
+            self.partial = partial
+            self.version += 1
+            self.cond.notify_all()
+
+    def finish(self, event, data):
+        with self.cond:
+            self.result = (event, data)
+            self.cond.notify_all()
+
+    def follow(self, heartbeat_s):
+        """
+        Yields ('partial', dict) whenever the partial result changed, then
+        the final (event, data); yields None after `heartbeat_s` without news.
+        Slow viewers skip intermediate partials rather than queueing them.
+        """
+        seen = 0
+        while True:
+            with self.cond:
+                if self.version == seen and self.result is None:
+                    self.cond.wait(heartbeat_s)
+                version, partial, result = self.version, self.partial, self.result
+            if result is not None:
+                yield result
+                return
+            if version != seen:
+                seen = version
+                yield ('partial', partial)
+            else:
+                yield None
+
+
+class ExplanationStreamHub:
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self, session_factory=SessionLocal, cache=None, heartbeat_s=15):
+        self.session_factory = session_factory
+        self.cache = cache or ExplanationCache(session_factory=session_factory)
+        self.heartbeat_s = heartbeat_s
+        self._generations = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def get(cls):
+        """The process-wide hub, created on first use."""
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = cls()
+            return cls._instance
+
+    def subscribe(self, alert_id):
+        """
+        Starts or joins the generation for `alert_id`. Returns an iterator of
+        ('partial', dict) events, ending with ('explanation', dict) once the
+        explanation is stored or ('error', dict); None marks a heartbeat.
+        """
+        with self._lock:
+            generation = self._generations.get(alert_id)
+            if generation is None:
+                generation = self._generations[alert_id] = _Generation()
+                threading.Thread(target=self._generate, args=(alert_id, generation),
+                                 name=f"explain-alert-{alert_id}", daemon=True).start()
+                VIEWERS.inc(mode='started')
+            else:
+                VIEWERS.inc(mode='joined')
+        return generation.follow(self.heartbeat_s)
+
+    def _generate(self, alert_id, generation):
+        db = self.session_factory()
+        try:
+            alert = db.query(Alert).filter(Alert.id == alert_id).first()
+            if not alert:
+                generation.finish('error', {"error": "Alert not found"})
+                return
+            if alert.explanation:
+                generation.finish('explanation', explanation_to_dict(alert.explanation))
+                return
+
+            if explanation_route(alert.type, alert.severity) == 'rule':
+                generation.finish('explanation', self._save(db, alert.id, rule_explanation(
+                    alert.type, alert.severity, alert.message, recent_vitals(db, alert.encounter_id))))
+                return
+
+            context = alert_context(alert, patient_context(db, alert.patient_id, alert.encounter_id))
+            explanation_data = self.cache.get(context)
+            if explanation_data is None:
+                started = time.perf_counter()
+                for partial in LLMService.stream_alert_explanation_json(context):
+                    explanation_data = partial
+                    generation.update(partial)
+                if not isinstance(explanation_data, dict):
+                    raise ValueError(f"LLM returned no explanation object: {explanation_data!r}")
+                self.cache.put(context, explanation_data, time.perf_counter() - started)
+
+            generation.finish('explanation', self._save(db, alert.id, explanation_data))
+            logger.info(f"Streamed explanation for alert {alert_id}")
+        except Exception as e:
+            logger.error(f"Failed to stream explanation for alert {alert_id}: {e}")
+            db.rollback()
+            generation.finish('error', {"error": "Explanation generation failed"})
+        finally:
+            with self._lock:
+                if self._generations.get(alert_id) is generation:
+                    del self._generations[alert_id]
+            db.close()
+
+    def _save(self, db, alert_id, explanation_data):
+        explanation = AlertExplanation(
+            alert_id=alert_id,
+            summary=explanation_data.get("summary"),
+            risk_level=explanation_data.get("risk_level"),
+            suggested_checks=json.dumps(explanation_data.get("suggested_checks")),
+            suggested_actions=json.dumps(explanation_data.get("suggested_actions"))
+        )
+        db.add(explanation)
+        try:
+            db.commit()
+        except IntegrityError:
+            # Saved by the copilot (or another API worker) in the meantime
+            db.rollback()
+            explanation = db.query(AlertExplanation).filter(AlertExplanation.alert_id == alert_id).first()
+        return explanation_to_dict(explanation)
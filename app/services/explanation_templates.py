@@ -0,0 +1,154 @@
+"""
+Rule-based alert explanations, built without a model call and labelled as
+such in the summary, so clinicians know no AI review ran.
+
+- render_explanation: from the alert alone (no context queries), used when
+  the copilot is shedding load.
+- rule_explanation: from the alert and the recent vitals trend, used as the
+  copilot's fast path for routine single-parameter alerts.
+"""
+
+# alert type -> (suggested checks, suggested actions)
+TEMPLATES = {
+    'TACHYCARDIA': (
+        ["Confirm heart rate manually and check rhythm on ECG", "Assess for pain, fever, dehydration or bleeding"],
+        ["Review recent medications and fluid balance", "Escalate to the physician if sustained or symptomatic"],
+    ),
+    'BRADYCARDIA': (
+        ["Confirm heart rate manually and check rhythm on ECG", "Check level of consciousness and blood pressure"],
+        ["Review rate-limiting medications", "Escalate to the physician if symptomatic"],
+    ),
+    'HYPOXIA': (
+        ["Check probe placement and waveform", "Assess airway, breathing and work of breathing"],
+        ["Start or titrate supplemental oxygen per protocol", "Escalate to the physician if SpO2 does not recover"],
+    ),
+    'FEVER': (
+        ["Repeat temperature measurement", "Look for a source of infection"],
+        ["Consider blood cultures per protocol", "Give antipyretics if prescribed"],
+    ),
+    'HYPERTENSION': (
+        ["Repeat blood pressure with the correct cuff size", "Assess for headache, chest pain or visual changes"],
+        ["Review antihypertensive orders", "Escalate to the physician if persistently elevated"],
+    ),
+    'HYPOTENSION': (
+        ["Repeat blood pressure and check perfusion", "Assess for bleeding, sepsis or dehydration"],
+        ["Review fluid orders", "Escalate to the physician promptly"],
+    ),
+    'TACHYPNEA': (
+        ["Count respiratory rate manually", "Check SpO2 and work of breathing"],
+        ["Sit the patient up if appropriate", "Escalate to the physician if worsening"],
+    ),
+    'BRADYPNEA': (
+        ["Count respiratory rate manually", "Check level of consciousness and SpO2"],
+        ["Review opioids and sedatives", "Escalate to the physician promptly"],
+    ),
+    'SEPSIS_RISK': (
+        ["Check lactate and blood cultures per sepsis protocol", "Assess mental status and perfusion"],
+        ["Start the sepsis pathway per protocol", "Escalate to the physician immediately"],
+    ),
+    'RESPIRATORY_DISTRESS': (
+        ["Assess airway, breathing and accessory muscle use", "Check SpO2 and respiratory rate"],
+        ["Give supplemental oxygen per protocol", "Escalate to the physician immediately"],
+    ),
+}
+
+DEFAULT_TEMPLATE = (
+    ["Verify the reading at the bedside", "Review the recent vitals trend"],
+    ["Escalate to the physician if the finding is confirmed"],
+)
+
+RISK_LEVELS = {'critical': 'High', 'high': 'High', 'medium': 'Moderate', 'low': 'Low'}
+
+
+def render_explanation(alert_type, severity, message):
+    """Returns an explanation dict shaped like LLMService.generate_alert_explanation_json."""
+    checks, actions = TEMPLATES.get((alert_type or '').upper(), DEFAULT_TEMPLATE)
+    return {
+        "summary": f"{message} (Automated checklist; AI explanation was skipped due to high alert volume.)",
+        "risk_level": RISK_LEVELS.get((severity or '').lower(), 'Unknown'),
+        "suggested_checks": list(checks),
+        "suggested_actions": list(actions),
+    }
+
+
+# alert type -> (vital key in the recent vitals summary, label, unit, direction that worsens it, notable change)
+TREND_VITALS = {
+    'TACHYCARDIA': ('hr', 'Heart rate', ' bpm', 1, 10),
+    'BRADYCARDIA': ('hr', 'Heart rate', ' bpm', -1, 10),
+    'HYPOXIA': ('spo2', 'SpO2', '%', -1, 2),
+    'FEVER': ('temp', 'Temperature', ' C', 1, 0.5),
+    'HYPERTENSION': ('bp_systolic', 'Systolic BP', ' mmHg', 1, 15),
+    'HYPOTENSION': ('bp_systolic', 'Systolic BP', ' mmHg', -1, 15),
+    'TACHYPNEA': ('rr', 'Respiratory rate', ' bpm', 1, 4),
+    'BRADYPNEA': ('rr', 'Respiratory rate', ' bpm', -1, 4),
+}
+
+RISK_ORDER = ['Low', 'Moderate', 'High']
+
+
+def _vital(reading, key):
+    if key == 'bp_systolic':
+        try:
+            return float(str(reading.get('bp')).split('/')[0])
+        except (TypeError, ValueError):
+            return None
+    value = reading.get(key)
+    return float(value) if isinstance(value, (int, float)) else None
+
+
+def vitals_trend(alert_type, recent_vitals):
+    """
+    Trend of the vital behind `alert_type` over `recent_vitals` (newest
+    first, as the copilot fetches them). Returns None without two readings,
+    else a dict with label, unit, first, last, change and direction
+    ('worsening', 'improving' or 'stable').
+    """
+    spec = TREND_VITALS.get((alert_type or '').upper())
+    if not spec:
+        return None
+    key, label, unit, worse, notable = spec
+    values = [v for v in (_vital(r, key) for r in recent_vitals or []) if v is not None]
+    if len(values) < 2:
+        return None
+    first, last = values[-1], values[0]
+    change = last - first
+    if abs(change) < notable:
+        direction = 'stable'
+    else:
+        direction = 'worsening' if change * worse > 0 else 'improving'
+    return {"label": label, "unit": unit, "first": first, "last": last, "change": change,
+            "direction": direction, "readings": len(values)}
+
+
+def _fmt(value):
+    return f"{value:g}"
+
+
+def rule_explanation(alert_type, severity, message, recent_vitals=None):
+    """
+    Deterministic explanation from the alert and its recent vitals trend,
+    shaped like LLMService.generate_alert_explanation_json. A worsening
+    trend raises the risk level one step and adds escalation actions.
+    """
+    checks, actions = TEMPLATES.get((alert_type or '').upper(), DEFAULT_TEMPLATE)
+    checks, actions = list(checks), list(actions)
+    risk_level = RISK_LEVELS.get((severity or '').lower(), 'Moderate')
+
+    trend = vitals_trend(alert_type, recent_vitals)
+    if trend is None:
+        trend_text = "No recent trend available."
+    else:
+        trend_text = (f"{trend['label']} {trend['direction']} over the last {trend['readings']} readings "
+                      f"({_fmt(trend['first'])} -> {_fmt(trend['last'])}{trend['unit']}).")
+        if trend['direction'] == 'worsening':
+            risk_level = RISK_ORDER[min(RISK_ORDER.index(risk_level) + 1, len(RISK_ORDER) - 1)]
+            actions.insert(0, "Increase observation frequency and reassess within 15 minutes")
+        elif trend['direction'] == 'improving':
+            checks.append("Confirm the improvement is sustained at the next observation")
+
+    return {
+        "summary": f"{message}. {trend_text} (Rule-based explanation for a routine alert; no AI review.)",
+        "risk_level": risk_level,
+        "suggested_checks": checks,
+        "suggested_actions": actions,
+    }
@@ -0,0 +1,37 @@
+"""
+Runs the stream consumers as threads of the current process.
+
+With MESSAGE_BUS=memory there is no broker between the API and the
+consumers, so the alert engine and the alert copilot must live in the same
+process as the publishers. `start_background_services` (app/app.py) starts
+them here; run the API as a single process (one gunicorn worker, or
+`flask run` without the reloader).
+"""
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+_threads = []
+
+
+def start_inprocess_consumers(stop_event=None):
+    """Starts the alert engine and copilot threads once per process. Returns the threads."""
+    if _threads:
+        return _threads
+
+    from app.services.alert_consumer import run_alert_engine
+    from app.services.alert_copilot import AlertCopilotService
+
+    copilot = AlertCopilotService()
+    targets = {
+        # The copilot's metrics endpoint already serves the shared registry
+        'alert-engine': lambda: run_alert_engine(stop_event=stop_event, metrics_port=0),
+        'alert-copilot': lambda: copilot.start(stop_event),
+    }
+    for name, target in targets.items():
+        thread = threading.Thread(target=target, name=name, daemon=True)
+        thread.start()
+        _threads.append(thread)
+    logger.info("Started in-process alert engine and copilot (MESSAGE_BUS=memory)")
+    return _threads
@@ -1,4 +1,4 @@
-from app.llm.client import get_default_llm
+from app.llm.runtime import LLMRuntime
 from langchain_core.prompts import PromptTemplate
 from langchain_core.output_parsers import JsonOutputParser
 import logging
@@ -6,20 +6,12 @@ import json
 
 logger = logging.getLogger(__name__)
 
-class LLMService:
-    @staticmethod
-    def generate_discharge_plan_json(context: dict) -> dict:
-        """
-        Generates a structured discharge plan using an LLM.
-        """
-        logger.info(f"Generating discharge plan for context: {context}")
-        
-        try:
-            llm = get_default_llm()
-            parser = JsonOutputParser()
-            
-            prompt = PromptTemplate(
-                template="""You are a medical assistant. Generate a discharge plan for a patient based on the following context:
+# Prompts and parser are built once at import; the chains that use them are
+# compiled once per process by LLMRuntime.
+JSON_PARSER = JsonOutputParser()
+
+DISCHARGE_PLAN_PROMPT = PromptTemplate(
+    template="""You are a medical assistant. Generate a discharge plan for a patient based on the following context:
                 {context}
                 
                 IMPORTANT: Your output is for informational purposes only and does not constitute medical advice or a prescription. All suggestions must be reviewed by a qualified medical professional.
@@ -32,16 +24,73 @@ class LLMService:
                 
                 {format_instructions}
                 """,
-                input_variables=["context"],
-                partial_variables={"format_instructions": parser.get_format_instructions()}
-            )
-            
-            chain = prompt | llm | parser
-            return chain.invoke({"context": json.dumps(context)})
+    input_variables=["context"],
+    partial_variables={"format_instructions": JSON_PARSER.get_format_instructions()}
+)
+
+ALERT_EXPLANATION_PROMPT = PromptTemplate(
+    template="""You are a medical assistant. Analyze the following alert and patient context:
+                {context}
+                
+                IMPORTANT: Your output is for informational purposes only and does not constitute medical advice. All suggestions must be reviewed by a qualified medical professional.
+                
+                Return the output as a JSON object with the following keys:
+                - summary: A short summary of the situation.
+                - risk_level: "High", "Moderate", or "Low".
+                - suggested_checks: A list of things to check.
+                - suggested_actions: A list of immediate actions.
+                
+                {format_instructions}
+                """,
+    input_variables=["context"],
+    partial_variables={"format_instructions": JSON_PARSER.get_format_instructions()}
+)
+
+ALERT_BATCH_EXPLANATION_PROMPT = PromptTemplate(
+    template="""You are a medical assistant. Analyze each of the following alerts, raised together for the same patient, using the shared patient context:
+                {context}
+                
+                IMPORTANT: Your output is for informational purposes only and does not constitute medical advice. All suggestions must be reviewed by a qualified medical professional.
+                
+                Return the output as a JSON object with the key "explanations": a list with one object per alert, each with the following keys:
+                - alert_id: The id of the alert being explained.
+                - summary: A short summary of the situation.
+                - risk_level: "High", "Moderate", or "Low".
+                - suggested_checks: A list of things to check.
+                - suggested_actions: A list of immediate actions.
+                
+                {format_instructions}
+                """,
+    input_variables=["context"],
+    partial_variables={"format_instructions": JSON_PARSER.get_format_instructions()}
+)
+
+
+def _json_chain(prompt):
+    return lambda llm: prompt | llm | JSON_PARSER
+
+
+class LLMService:
+    @staticmethod
+    def generate_discharge_plan_json(context: dict, fallback: bool = True, task: str = "discharge_plan") -> dict:
+        """
+        Generates a structured discharge plan using an LLM.
+        With fallback=False, errors are raised instead of returning the
+        manual-review plan (so background jobs can retry). `task` labels the
+        call for timeouts and metrics (drafts use "discharge_draft").
+        """
+        logger.info(f"Generating discharge plan for context: {context}")
+        
+        try:
+            runtime = LLMRuntime.get()
+            chain = runtime.chain(task, _json_chain(DISCHARGE_PLAN_PROMPT))
+            return runtime.run(task, lambda config: chain.invoke({"context": json.dumps(context)}, config=config))
             
         except Exception as e:
             logger.error(f"LLM generation failed: {e}")
-            # Fallback to mock if LLM fails (e.g. connection error)
+            if not fallback:
+                raise
+            # Fallback to mock if LLM fails (e.g. connection error, timeout or open circuit)
             return {
                 "discharge_summary": "Error generating plan. Please review manually.",
                 "home_care_instructions": ["Follow standard discharge procedures."],
@@ -57,29 +106,9 @@ class LLMService:
         logger.info(f"Generating alert explanation for context: {context}")
         
         try:
-            llm = get_default_llm()
-            parser = JsonOutputParser()
-            
-            prompt = PromptTemplate(
-                template="""You are a medical assistant. Analyze the following alert and patient context:
-                {context}
-                
-                IMPORTANT: Your output is for informational purposes only and does not constitute medical advice. All suggestions must be reviewed by a qualified medical professional.
-                
-                Return the output as a JSON object with the following keys:
-                - summary: A short summary of the situation.
-                - risk_level: "High", "Moderate", or "Low".
-                - suggested_checks: A list of things to check.
-                - suggested_actions: A list of immediate actions.
-                
-                {format_instructions}
-                """,
-                input_variables=["context"],
-                partial_variables={"format_instructions": parser.get_format_instructions()}
-            )
-            
-            chain = prompt | llm | parser
-            return chain.invoke({"context": json.dumps(context)})
+            runtime = LLMRuntime.get()
+            chain = runtime.chain("alert_explanation", _json_chain(ALERT_EXPLANATION_PROMPT))
+            return runtime.run("alert_explanation", lambda config: chain.invoke({"context": json.dumps(context)}, config=config))
             
         except Exception as e:
             logger.error(f"LLM generation failed: {e}")
@@ -90,3 +119,53 @@ class LLMService:
                 "suggested_checks": ["Check patient status manually"],
                 "suggested_actions": ["Verify alert validity"]
             }
+
+    @staticmethod
+    def stream_alert_explanation_json(context: dict):
+        """
+        Streams a structured explanation for an alert as the model generates
+        it: yields the partially parsed JSON object after each chunk, the last
+        one complete. Unlike generate_alert_explanation_json there is no
+        fallback; errors are raised to the caller.
+        """
+        logger.info(f"Streaming alert explanation for context: {context}")
+        runtime = LLMRuntime.get()
+        chain = runtime.chain("alert_explanation", _json_chain(ALERT_EXPLANATION_PROMPT))
+        yield from runtime.stream("alert_explanation_stream", lambda config: chain.stream({"context": json.dumps(context)}, config=config))
+
+    @staticmethod
+    def generate_alert_explanations_json(context: dict) -> dict:
+        """
+        Explains several alerts for one patient in a single call. `context`
+        holds the shared patient context and an "alerts" list of objects with
+        an "id". Returns explanations keyed by alert id; alerts the model left
+        out are missing from the result.
+        """
+        logger.info(f"Generating explanations for {len(context.get('alerts', []))} alerts for context: {context}")
+        alert_ids = [a.get("id") for a in context.get("alerts", [])]
+
+        try:
+            runtime = LLMRuntime.get()
+            chain = runtime.chain("alert_batch_explanation", _json_chain(ALERT_BATCH_EXPLANATION_PROMPT))
+            result = runtime.run("alert_batch_explanation", lambda config: chain.invoke({"context": json.dumps(context)}, config=config))
+            explanations = result.get("explanations", []) if isinstance(result, dict) else result
+
+            by_id = {str(alert_id): alert_id for alert_id in alert_ids}
+            explained = {}
+            for item in explanations or []:
+                if isinstance(item, dict) and str(item.get("alert_id")) in by_id:
+                    explained[by_id[str(item["alert_id"])]] = {k: v for k, v in item.items() if k != "alert_id"}
+            return explained
+
+        except Exception as e:
+            logger.error(f"LLM generation failed: {e}")
+            # Fallback
+            return {
+                alert_id: {
+                    "summary": "Error analyzing alert. Please check vitals manually.",
+                    "risk_level": "Unknown",
+                    "suggested_checks": ["Check patient status manually"],
+                    "suggested_actions": ["Verify alert validity"]
+                }
+                for alert_id in alert_ids
+            }
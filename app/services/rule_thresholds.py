@@ -0,0 +1,257 @@
+import json
+import logging
+import os
+import threading
+import time
+from sqlalchemy import func, cast, String
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+from app.core.config import Config
+from app.core.database import SessionLocal
+from app.domain.models import RuleThreshold, Encounter, Room
+
+logger = logging.getLogger(__name__)
+
+# Built-in thresholds; DB rows and the optional JSON file override these per department.
+DEFAULT_THRESHOLDS = {
+    'hr_high': 130,         # Tachycardia
+    'hr_very_high': 150,    # Tachycardia escalates to high severity (API path)
+    'hr_low': 50,           # Bradycardia
+    'spo2_low': 90,         # Hypoxia
+    'temp_high': 38.5,      # Fever
+    'bp_sys_high': 180,     # Hypertension
+    'bp_dia_high': 110,     # Hypertension
+    'bp_sys_low': 90,       # Hypotension
+    'resp_high': 24,        # Tachypnea
+    'resp_low': 8,          # Bradypnea
+    'sepsis_temp': 38.5,    # Sepsis pattern
+    'sepsis_hr': 100,
+    'sepsis_resp': 20,
+    'distress_spo2': 92,    # Respiratory distress
+    'distress_resp': 24,
+}
+
+DEFAULT_DEPARTMENT = 'default'
+
+
+class RuleSet:
+    """
+    Immutable snapshot of thresholds for every department.
+    Evaluators are compiled once per (compiler, department) and reused for
+    every reading until the next version replaces the whole RuleSet.
+    """
+
+    def __init__(self, version, thresholds):
+        self.version = version
+        self.thresholds = thresholds  # department -> {key: value}
+        self._compiled = {}
+
+    def for_department(self, department):
+        return self.thresholds.get(department) or self.thresholds[DEFAULT_DEPARTMENT]
+
+    def evaluator(self, compiler, department):
+        key = (compiler, department)
+        fn = self._compiled.get(key)
+        if fn is None:
+            fn = compiler(self.for_department(department))
+            self._compiled[key] = fn
+        return fn
+
+
+class ThresholdRegistry:
+    """
+    Process-wide holder of the current RuleSet.
+
+    A background thread polls a cheap fingerprint of the `rule_thresholds` table
+    (row count and a checksum of the contents) and of the optional
+    RULE_THRESHOLDS_FILE and, when it changes, builds and
+    precompiles a new RuleSet and swaps it in with a single assignment. Readers
+    never lock: they grab whatever RuleSet is current.
+
+    Encounters admitted since the last reload are not in the department map
+    yet: they get the default thresholds, and the miss wakes the reloader
+    thread to resolve their departments in one query. Evaluation itself never
+    touches the database.
+    """
+    _ruleset = RuleSet(0, {DEFAULT_DEPARTMENT: dict(DEFAULT_THRESHOLDS)})
+    _encounter_departments = {}
+    _unresolved = set()
+    _wake = threading.Event()
+    _compilers = []
+    _fingerprint = None
+    _reloader = None
+    _lock = threading.Lock()
+
+    @classmethod
+    def register_compiler(cls, compiler):
+        """Registers an evaluator factory to precompile on every reload."""
+        if compiler not in cls._compilers:
+            cls._compilers.append(compiler)
+
+    @classmethod
+    def current(cls):
+        return cls._ruleset
+
+    @classmethod
+    def evaluator_for(cls, compiler, encounter_id):
+        """Returns the compiled evaluator for the encounter's department."""
+        return cls._ruleset.evaluator(compiler, cls.department_for(encounter_id))
+
+    @classmethod
+    def department_for(cls, encounter_id):
+        department = cls._encounter_departments.get(encounter_id)
+        if department is None:
+            if encounter_id is not None and encounter_id not in cls._unresolved:
+                # Admitted since the last reload: the reloader looks it up
+                cls._unresolved.add(encounter_id)
+                cls._wake.set()
+            return DEFAULT_DEPARTMENT
+        return department
+
+    @classmethod
+    def resolve_departments(cls, db):
+        """
+        Adds the departments of encounters that missed the map to it, in one
+        query. Encounters without a room get the default department.
+        Returns the number resolved.
+        """
+        pending = set(cls._unresolved)
+        if not pending:
+            return 0
+        found = dict(db.query(Encounter.id, Room.department).join(
+            Room, Room.id == Encounter.room_id
+        ).filter(Encounter.id.in_(pending)).all())
+        cls._encounter_departments = {
+            **cls._encounter_departments,
+            **{encounter_id: found.get(encounter_id) or DEFAULT_DEPARTMENT for encounter_id in pending},
+        }
+        cls._unresolved -= pending
+        return len(pending)
+
+    @classmethod
+    def install(cls, thresholds, encounter_departments=None):
+        """
+        Compiles and atomically swaps in a new RuleSet.
+        `thresholds` maps department -> overrides of DEFAULT_THRESHOLDS.
+        """
+        merged = {DEFAULT_DEPARTMENT: {**DEFAULT_THRESHOLDS, **thresholds.get(DEFAULT_DEPARTMENT, {})}}
+        for department, overrides in thresholds.items():
+            if department != DEFAULT_DEPARTMENT:
+                merged[department] = {**merged[DEFAULT_DEPARTMENT], **overrides}
+
+        ruleset = RuleSet(cls._ruleset.version + 1, merged)
+        for compiler in cls._compilers:
+            for department in merged:
+                ruleset.evaluator(compiler, department)
+
+        cls._ruleset = ruleset
+        if encounter_departments is not None:
+            cls._encounter_departments = encounter_departments
+            cls._unresolved -= encounter_departments.keys()
+        logger.info(f"Installed rule thresholds v{ruleset.version} for departments: {sorted(merged)}")
+        return ruleset
+
+    @classmethod
+    def reload(cls, db, force=False):
+        """
+        Reloads thresholds if the DB table or file changed, and always refreshes
+        the encounter -> department map. Returns True if a new version was installed.
+        """
+        with cls._lock:
+            count, checksum = db.query(func.count(RuleThreshold.id), _content_checksum()).one()
+            file_path = Config.RULE_THRESHOLDS_FILE
+            file_mtime = os.path.getmtime(file_path) if file_path and os.path.exists(file_path) else None
+            fingerprint = (count, checksum, file_mtime)
+
+            encounter_departments = {
+                encounter_id: department or DEFAULT_DEPARTMENT
+                for encounter_id, department in db.query(Encounter.id, Room.department).join(
+                    Room, Room.id == Encounter.room_id
+                ).filter(Encounter.status == 'active').all()
+            }
+
+            if not force and fingerprint == cls._fingerprint:
+                cls._encounter_departments = encounter_departments
+                cls._unresolved -= encounter_departments.keys()
+                return False
+
+            cls.install(cls.load_overrides(db), encounter_departments)
+            cls._fingerprint = fingerprint
+            return True
+
+    @staticmethod
+    def load_overrides(db):
+        """
+        Reads threshold overrides from RULE_THRESHOLDS_FILE and the
+        `rule_thresholds` table (DB wins), as {department: {key: value}}.
+        """
+        file_path = Config.RULE_THRESHOLDS_FILE
+        thresholds = _load_file(file_path) if file_path and os.path.exists(file_path) else {}
+        for row in db.query(RuleThreshold).all():
+            if row.key not in DEFAULT_THRESHOLDS:
+                logger.warning(f"Ignoring unknown rule threshold '{row.key}'")
+                continue
+            thresholds.setdefault(row.department or DEFAULT_DEPARTMENT, {})[row.key] = row.value
+        return thresholds
+
+    @classmethod
+    def start_reloader(cls, interval=None):
+        """Starts the background reload thread once per process."""
+        interval = interval if interval is not None else Config.RULES_RELOAD_INTERVAL_S
+        if interval <= 0 or cls._reloader is not None:
+            return
+        cls._reloader = threading.Thread(target=cls._reload_loop, args=(interval,), name="rule-threshold-reloader", daemon=True)
+        cls._reloader.start()
+
+    @classmethod
+    def _reload_loop(cls, interval):
+        while True:
+            cls._with_session(cls.reload, "reload rule thresholds")
+            # Between reloads, resolve newly admitted encounters as they show up
+            deadline = time.monotonic() + interval
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not cls._wake.wait(remaining):
+                    break
+                cls._wake.clear()
+                cls._with_session(cls.resolve_departments, "resolve encounter departments")
+
+    @staticmethod
+    def _with_session(fn, action):
+        db = SessionLocal()
+        try:
+            fn(db)
+        except Exception as e:
+            logger.error(f"Failed to {action}: {e}")
+        finally:
+            db.close()
+
+
+def _content_checksum():
+    """
+    md5 over every (department, key, value) row, so edits made with plain SQL
+    (which leave updated_at alone) still change the fingerprint.
+    """
+    row = func.concat(func.coalesce(RuleThreshold.department, ''), ':', RuleThreshold.key, '=',
+                      cast(RuleThreshold.value, String))
+    return func.md5(func.string_agg(row, aggregate_order_by(',', RuleThreshold.id)))
+
+
+def _load_file(path):
+    """
+    Reads thresholds from JSON shaped like {"default": {...}, "ICU": {...}}.
+    """
+    try:
+        with open(path) as f:
+            data = json.load(f)
+    except (OSError, ValueError) as e:
+        logger.error(f"Failed to read rule thresholds file {path}: {e}")
+        return {}
+
+    thresholds = {}
+    for department, values in data.items():
+        for key, value in values.items():
+            if key not in DEFAULT_THRESHOLDS:
+                logger.warning(f"Ignoring unknown rule threshold '{key}' in {path}")
+                continue
+            thresholds.setdefault(department, {})[key] = float(value)
+    return thresholds
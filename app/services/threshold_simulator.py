@@ -0,0 +1,205 @@
+import logging
+import time
+from collections import Counter, defaultdict
+import numpy as np
+from sqlalchemy import select
+from app.domain.models import Vitals, Encounter, Room
+from app.services.rule_thresholds import DEFAULT_THRESHOLDS, DEFAULT_DEPARTMENT
+
+logger = logging.getLogger(__name__)
+
+VITAL_COLUMNS = ('hr_bpm', 'spo2_pct', 'resp_rate_bpm', 'bp_systolic', 'bp_diastolic', 'temp_c')
+
+
+def resolve_rule_set(overrides):
+    """
+    Expands {"default": {...}, "ICU": {...}} overrides into full per-department
+    thresholds, the same way ThresholdRegistry.install merges them.
+    """
+    merged = {DEFAULT_DEPARTMENT: {**DEFAULT_THRESHOLDS, **overrides.get(DEFAULT_DEPARTMENT, {})}}
+    for department, values in overrides.items():
+        if department != DEFAULT_DEPARTMENT:
+            merged[department] = {**merged[DEFAULT_DEPARTMENT], **values}
+    return merged
+
+
+def evaluate_chunk(columns, thresholds):
+    """
+    Vectorized equivalent of RuleEngine.evaluate over a chunk of readings.
+
+    `columns` maps vital name -> float array (NaN for missing) and `thresholds`
+    maps threshold key -> array of per-row values (so every row can carry its
+    own department's thresholds). Returns rule type -> boolean mask.
+    """
+    def present(name):
+        # RuleEngine uses truthiness, so 0 counts as missing as well as None
+        col = columns[name]
+        return ~np.isnan(col) & (col != 0)
+
+    hr, spo2, temp = columns['hr_bpm'], columns['spo2_pct'], columns['temp_c']
+    sys, dia, resp = columns['bp_systolic'], columns['bp_diastolic'], columns['resp_rate_bpm']
+    has_hr, has_spo2, has_temp = present('hr_bpm'), present('spo2_pct'), present('temp_c')
+    has_sys, has_dia, has_resp = present('bp_systolic'), present('bp_diastolic'), present('resp_rate_bpm')
+    t = thresholds
+
+    with np.errstate(invalid='ignore'):
+        return {
+            'TACHYCARDIA': has_hr & (hr > t['hr_high']),
+            'HYPOXIA': has_spo2 & (spo2 < t['spo2_low']),
+            'FEVER': has_temp & (temp > t['temp_high']),
+            'HYPERTENSION': (has_sys & (sys > t['bp_sys_high'])) | (has_dia & (dia > t['bp_dia_high'])),
+            'BRADYCARDIA': has_hr & (hr < t['hr_low']),
+            'HYPOTENSION': has_sys & (sys < t['bp_sys_low']),
+            'TACHYPNEA': has_resp & (resp > t['resp_high']),
+            'BRADYPNEA': has_resp & ~(resp > t['resp_high']) & (resp < t['resp_low']),
+            'SEPSIS_RISK': has_temp & has_hr & has_resp
+                & (temp > t['sepsis_temp']) & (hr > t['sepsis_hr']) & (resp > t['sepsis_resp']),
+            'RESPIRATORY_DISTRESS': has_spo2 & has_resp
+                & (spo2 < t['distress_spo2']) & (resp > t['distress_resp']),
+        }
+
+
+class _Tally:
+    def __init__(self):
+        self.by_type = Counter()
+        self.by_department = defaultdict(Counter)
+        self.by_encounter = defaultdict(Counter)
+
+    def add(self, masks, encounter_ids, departments, department_names):
+        for rule_type, mask in masks.items():
+            hits = int(mask.sum())
+            if not hits:
+                continue
+            self.by_type[rule_type] += hits
+            for dept_idx, count in zip(*np.unique(departments[mask], return_counts=True)):
+                self.by_department[department_names[dept_idx]][rule_type] += int(count)
+            for encounter_id, count in zip(*np.unique(encounter_ids[mask], return_counts=True)):
+                self.by_encounter[int(encounter_id)][rule_type] += int(count)
+
+
+class ThresholdSimulator:
+    """
+    Replays a historical window of `vitals` through one or more threshold rule
+    sets and counts the alerts each would have raised.
+
+    Rows are streamed from a server-side cursor in columnar chunks, so memory
+    stays bounded by `chunk_size` regardless of the window length.
+    """
+
+    def __init__(self, rule_sets, chunk_size=50000):
+        # name -> {department: full thresholds}
+        self.rule_sets = {name: resolve_rule_set(overrides) for name, overrides in rule_sets.items()}
+        self.chunk_size = chunk_size
+
+    def run(self, db, since, until):
+        started = time.monotonic()
+        stmt = select(
+            Vitals.encounter_id,
+            Vitals.timestamp,
+            Room.department,
+            *[getattr(Vitals, c) for c in VITAL_COLUMNS],
+        ).join(Encounter, Encounter.id == Vitals.encounter_id).outerjoin(
+            Room, Room.id == Encounter.room_id
+        ).where(Vitals.timestamp >= since, Vitals.timestamp < until)
+
+        department_names = []
+        department_index = {}
+
+        def department_code(name):
+            name = name or DEFAULT_DEPARTMENT
+            code = department_index.get(name)
+            if code is None:
+                code = department_index[name] = len(department_names)
+                department_names.append(name)
+            return code
+
+        tallies = {name: _Tally() for name in self.rule_sets}
+        first_seen, last_seen = {}, {}
+        readings = 0
+
+        result = db.connection().execution_options(stream_results=True, yield_per=self.chunk_size).execute(stmt)
+        for rows in result.partitions(self.chunk_size):
+            encounter_ids = np.fromiter((r[0] for r in rows), dtype=np.int64, count=len(rows))
+            epochs = np.fromiter((r[1].timestamp() for r in rows), dtype=np.float64, count=len(rows))
+            departments = np.fromiter((department_code(r[2]) for r in rows), dtype=np.int64, count=len(rows))
+            # None -> NaN, Decimal -> float
+            vitals = np.array([r[3:] for r in rows], dtype=np.float64).reshape(len(rows), len(VITAL_COLUMNS))
+            columns = {name: vitals[:, i] for i, name in enumerate(VITAL_COLUMNS)}
+            readings += len(rows)
+            self._track_span(encounter_ids, epochs, first_seen, last_seen)
+
+            for name, rule_set in self.rule_sets.items():
+                thresholds = self._per_row_thresholds(rule_set, department_names, departments)
+                tallies[name].add(evaluate_chunk(columns, thresholds), encounter_ids, departments, department_names)
+
+        bed_days = sum(last_seen[e] - first_seen[e] for e in first_seen) / 86400.0
+        elapsed = time.monotonic() - started
+        logger.info(f"Simulated {len(self.rule_sets)} rule sets over {readings} readings in {elapsed:.1f}s")
+        return self._report(tallies, readings, len(first_seen), bed_days, elapsed)
+
+    @staticmethod
+    def _per_row_thresholds(rule_set, department_names, departments):
+        default = rule_set[DEFAULT_DEPARTMENT]
+        table = {
+            key: np.array([rule_set.get(d, default)[key] for d in department_names], dtype=np.float64)
+            for key in DEFAULT_THRESHOLDS
+        }
+        return {key: values[departments] for key, values in table.items()}
+
+    @staticmethod
+    def _track_span(encounter_ids, epochs, first_seen, last_seen):
+        order = np.lexsort((epochs, encounter_ids))
+        ids, ts = encounter_ids[order], epochs[order]
+        boundaries = np.flatnonzero(np.diff(ids)) + 1
+        starts = np.concatenate(([0], boundaries))
+        ends = np.concatenate((boundaries, [len(ids)])) - 1
+        for start, end in zip(starts, ends):
+            encounter_id = int(ids[start])
+            first_seen[encounter_id] = min(first_seen.get(encounter_id, ts[start]), ts[start])
+            last_seen[encounter_id] = max(last_seen.get(encounter_id, ts[end]), ts[end])
+
+    @staticmethod
+    def _report(tallies, readings, encounters, bed_days, elapsed):
+        report = {
+            'readings': readings,
+            'encounters': encounters,
+            'bed_days': round(bed_days, 2),
+            'elapsed_s': round(elapsed, 2),
+            'rule_sets': {},
+        }
+        for name, tally in tallies.items():
+            total = sum(tally.by_type.values())
+            report['rule_sets'][name] = {
+                'total_alerts': total,
+                'alerts_per_bed_day': round(total / bed_days, 2) if bed_days else None,
+                'by_type': dict(tally.by_type),
+                'by_department': {d: dict(c) for d, c in tally.by_department.items()},
+                'by_encounter': {str(e): dict(c) for e, c in tally.by_encounter.items()},
+            }
+        return report
+
+
+def diff_reports(report, baseline='current'):
+    """
+    Adds a `delta_vs_<baseline>` section to every other rule set: alert count
+    changes per type and per department, and per bed-day.
+    """
+    base = report['rule_sets'][baseline]
+    for name, result in report['rule_sets'].items():
+        if name == baseline:
+            continue
+        types = set(base['by_type']) | set(result['by_type'])
+        departments = set(base['by_department']) | set(result['by_department'])
+        result[f'delta_vs_{baseline}'] = {
+            'total_alerts': result['total_alerts'] - base['total_alerts'],
+            'alerts_per_bed_day': (
+                round(result['alerts_per_bed_day'] - base['alerts_per_bed_day'], 2)
+                if report['bed_days'] else None
+            ),
+            'by_type': {t: result['by_type'].get(t, 0) - base['by_type'].get(t, 0) for t in sorted(types)},
+            'by_department': {
+                d: sum(result['by_department'].get(d, {}).values()) - sum(base['by_department'].get(d, {}).values())
+                for d in sorted(departments)
+            },
+        }
+    return report
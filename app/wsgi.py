@@ -0,0 +1,13 @@
+"""
+WSGI entrypoint: the app plus its background threads (threshold reloader,
+LLM health prober, discharge plan worker and drafter, and the in-process
+consumers with MESSAGE_BUS=memory). Every process serving this module runs
+its own set; see the DISCHARGE_* settings to leave jobs to one process.
+
+    FLASK_APP=app.wsgi:app flask run
+    gunicorn app.wsgi:app
+"""
+from app.app import create_app, start_background_services
+
+app = create_app()
+start_background_services()
@@ -0,0 +1,2 @@
+-- Records why an alert was resolved ("manual" or "auto: ...")
+ALTER TABLE alerts ADD COLUMN IF NOT EXISTS resolution_reason VARCHAR;
@@ -0,0 +1,25 @@
+-- One alert per (encounter, rule type, reading timestamp); see Alert in app/domain/models.py.
+-- Alerts without an encounter dedupe too: PARTITION BY groups NULLs, and the index is NULLS NOT DISTINCT.
+-- Drop existing duplicates first, keeping one row per key: one with an explanation if any, else the oldest.
+BEGIN;
+
+CREATE TEMP TABLE duplicate_alerts ON COMMIT DROP AS
+SELECT id FROM (
+    SELECT a.id,
+           row_number() OVER (
+               PARTITION BY a.encounter_id, lower(a.type), a.timestamp
+               ORDER BY EXISTS (SELECT 1 FROM alert_explanations e WHERE e.alert_id = a.id) DESC, a.id
+           ) AS rank
+    FROM alerts a
+) ranked
+WHERE rank > 1;
+
+-- The kept row has its own explanation or none; alert_id is unique, so the losers' cannot be moved over
+DELETE FROM alert_explanations WHERE alert_id IN (SELECT id FROM duplicate_alerts);
+DELETE FROM alerts WHERE id IN (SELECT id FROM duplicate_alerts);
+
+-- Recreated, so running this again replaces an index built without NULLS NOT DISTINCT
+DROP INDEX IF EXISTS uq_alerts_natural_key;
+CREATE UNIQUE INDEX uq_alerts_natural_key ON alerts (encounter_id, lower(type), timestamp) NULLS NOT DISTINCT;
+
+COMMIT;
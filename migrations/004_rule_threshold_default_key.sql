@@ -0,0 +1,19 @@
+-- One default (department IS NULL) row per threshold key; the (department, key)
+-- constraint treats NULL departments as distinct. See RuleThreshold in app/domain/models.py.
+-- Drop existing duplicates first, keeping the most recently updated row.
+BEGIN;
+
+DELETE FROM rule_thresholds
+WHERE id IN (
+    SELECT id FROM (
+        SELECT id,
+               row_number() OVER (PARTITION BY key ORDER BY updated_at DESC NULLS LAST, id DESC) AS rank
+        FROM rule_thresholds
+        WHERE department IS NULL
+    ) ranked
+    WHERE rank > 1
+);
+
+CREATE UNIQUE INDEX IF NOT EXISTS uq_rule_thresholds_default_key ON rule_thresholds (key) WHERE department IS NULL;
+
+COMMIT;
@@ -0,0 +1,199 @@
+"""
+Throughput benchmark: per-message alert consumer loop vs the batched
+poll/evaluate/commit loop.
+
+Both loops are driven from an in-memory stand-in for KafkaConsumer. By default
+the database and producer are dry-run stand-ins that charge a configurable
+round-trip latency per commit/statement and per producer flush, which is where
+the per-message loop spends its time; pass --with-db / --publish to use the
+real ones instead.
+
+Example:
+    python scripts/bench_alert_consumer.py --scenario sepsis --patients 50 --readings 40 --batch-size 500
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from collections import namedtuple
+from datetime import datetime
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.config import Config
+from app.core.kafka_client import KafkaClient
+from app.domain.models import Alert
+from app.services.rule_engine import RuleEngine
+from app.services.alert_consumer import AlertEngine
+from scripts.replay_vitals import DryRunSession, synthetic_readings
+
+Record = namedtuple('Record', ['topic', 'partition', 'offset', 'value'])
+TopicPartition = namedtuple('TopicPartition', ['topic', 'partition'])
+
+
+class InMemoryConsumer:
+    """Serves pre-loaded records through the KafkaConsumer poll/iter/commit API."""
+
+    def __init__(self, values, partitions=3):
+        self._records = [
+            Record(Config.KAFKA_TOPIC_VITALS, i % partitions, i // partitions, value)
+            for i, value in enumerate(values)
+        ]
+        self._position = 0
+        self.commits = 0
+
+    def __iter__(self):
+        while self._position < len(self._records):
+            record = self._records[self._position]
+            self._position += 1
+            yield record
+
+    def poll(self, timeout_ms=0, max_records=500):
+        chunk = self._records[self._position:self._position + max_records]
+        self._position += len(chunk)
+        batch = {}
+        for record in chunk:
+            batch.setdefault(TopicPartition(record.topic, record.partition), []).append(record)
+        return batch
+
+    def commit(self):
+        self.commits += 1
+
+    def exhausted(self):
+        return self._position >= len(self._records)
+
+
+class Costs:
+    def __init__(self, db_latency_s, flush_latency_s):
+        self.db_latency_s = db_latency_s
+        self.flush_latency_s = flush_latency_s
+        self.db_round_trips = 0
+        self.flushes = 0
+
+    def db(self):
+        self.db_round_trips += 1
+        if self.db_latency_s:
+            time.sleep(self.db_latency_s)
+
+    def flush(self):
+        self.flushes += 1
+        if self.flush_latency_s:
+            time.sleep(self.flush_latency_s)
+
+
+def costed_session_factory(costs):
+    class CostedSession(DryRunSession):
+        def execute(self, statement, params=None):
+            costs.db()
+            return super().execute(statement, params)
+
+        def commit(self):
+            costs.db()
+
+    return CostedSession
+
+
+def legacy_loop(consumer, session_factory):
+    """The pre-batching loop: per-message session, per-alert send+flush, no offset commits."""
+    logger = logging.getLogger("legacy_alert_engine")
+    for message in consumer:
+        vitals_data = message.value
+        logger.info(f"Received vitals: {vitals_data}")
+        alerts = RuleEngine.evaluate(vitals_data)
+        if alerts:
+            db = session_factory()
+            try:
+                for alert_data in alerts:
+                    db.add(Alert(
+                        patient_id=alert_data['patient_id'],
+                        encounter_id=vitals_data.get('encounter_id'),
+                        timestamp=datetime.fromisoformat(alert_data['timestamp']),
+                        type=alert_data['type'],
+                        severity=alert_data.get('severity', 'medium'),
+                        message=alert_data['message'],
+                        resolved=False
+                    ))
+                    KafkaClient.send_message(Config.KAFKA_TOPIC_ALERTS, alert_data)
+                db.commit()
+            finally:
+                db.close()
+
+
+def batched_loop(consumer, session_factory, batch_size):
+    engine = AlertEngine(session_factory=session_factory)
+    while not consumer.exhausted():
+        batch = consumer.poll(timeout_ms=0, max_records=batch_size)
+        readings = [record.value for records in batch.values() for record in records]
+        if readings:
+            engine.process_batch(readings)
+            consumer.commit()
+
+
+def run(name, loop, readings, costs):
+    consumer = InMemoryConsumer(readings)
+    started = time.perf_counter()
+    loop(consumer)
+    elapsed = time.perf_counter() - started
+    return {
+        'loop': name,
+        'readings': len(readings),
+        'elapsed_s': round(elapsed, 4),
+        'readings_per_s': round(len(readings) / elapsed, 1) if elapsed else 0.0,
+        'db_round_trips': costs.db_round_trips,
+        'producer_flushes': costs.flushes,
+        'offset_commits': consumer.commits,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark per-message vs batched alert consumer loops")
+    parser.add_argument("--scenario", choices=["normal", "sepsis", "recovery"], default="sepsis")
+    parser.add_argument("--patients", type=int, default=50)
+    parser.add_argument("--readings", type=int, default=40, help="Readings per patient")
+    parser.add_argument("--batch-size", type=int, default=Config.ALERT_ENGINE_BATCH_SIZE)
+    parser.add_argument("--db-latency-ms", type=float, default=1.0, help="Simulated cost per DB round trip (dry-run)")
+    parser.add_argument("--flush-latency-ms", type=float, default=2.0, help="Simulated cost per producer flush (dry-run)")
+    parser.add_argument("--with-db", action="store_true", help="Use the configured database")
+    parser.add_argument("--publish", action="store_true", help="Publish to the configured Kafka")
+    parser.add_argument("--output", help="Write results JSON here")
+    args = parser.parse_args()
+
+    # Keep the legacy loop's per-message INFO logging cost, but off the terminal
+    logging.getLogger().handlers = [logging.NullHandler()]
+    logging.getLogger().setLevel(logging.INFO)
+
+    readings = synthetic_readings(args.scenario, args.patients, args.readings)
+    results = []
+    for name in ('per_message', 'batched'):
+        costs = Costs(args.db_latency_ms / 1000.0, args.flush_latency_ms / 1000.0)
+        if args.with_db:
+            from app.core.database import SessionLocal
+            session_factory = SessionLocal
+        else:
+            session_factory = costed_session_factory(costs)
+        if not args.publish:
+            KafkaClient.send_message = classmethod(lambda cls, topic, message, key=None: costs.flush())
+            KafkaClient.send_batch = classmethod(lambda cls, topic, messages: costs.flush())
+
+        if name == 'per_message':
+            loop = lambda consumer: legacy_loop(consumer, session_factory)
+        else:
+            loop = lambda consumer: batched_loop(consumer, session_factory, args.batch_size)
+        results.append(run(name, loop, readings, costs))
+
+    for r in results:
+        print(f"{r['loop']:<12} {r['readings_per_s']:>10.1f} readings/s  {r['db_round_trips']:>6} DB round trips  "
+              f"{r['producer_flushes']:>6} flushes  {r['offset_commits']:>5} offset commits  ({r['elapsed_s']}s)")
+    speedup = results[1]['readings_per_s'] / results[0]['readings_per_s'] if results[0]['readings_per_s'] else 0
+    print(f"batched / per_message throughput: {speedup:.1f}x")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'scenario': args.scenario, 'batch_size': args.batch_size, 'results': results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Per-call LLM overhead: fresh client and chain per call vs the shared LLMRuntime.
+
+Runs alert explanations against a local fake Ollama server (tests/fake_ollama.py)
+with no model latency, so the timings are pure client-side overhead: building
+ChatOllama and its HTTP client, parsing the prompt template, building the
+chain, and the TCP connection setup that keep-alive avoids.
+
+Examples:
+    python scripts/bench_llm_runtime.py --calls 200
+    python scripts/bench_llm_runtime.py --calls 200 --concurrency 4 --latency 0.05
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_core.prompts import PromptTemplate
+from langchain_core.output_parsers import JsonOutputParser
+from app.llm.client import get_default_llm
+from app.llm.runtime import LLMRuntime
+from app.services.llm_service import LLMService, ALERT_EXPLANATION_PROMPT
+from scripts.replay_vitals import percentile
+from tests.fake_ollama import FakeOllama
+
+CONTEXT = {
+    "alert_type": "TACHYCARDIA", "severity": "high", "message": "High Heart Rate detected: 142 BPM",
+    "patient_age": 58, "gender": "Male",
+    "recent_vitals": [{"hr": 142, "spo2": 96, "bp": "132/85", "temp": 37.4}],
+}
+
+
+def explain_per_call(context):
+    """What every call did before LLMRuntime: new client, parser, prompt and chain."""
+    llm = get_default_llm()
+    parser = JsonOutputParser()
+    prompt = PromptTemplate(
+        template=ALERT_EXPLANATION_PROMPT.template,
+        input_variables=["context"],
+        partial_variables={"format_instructions": parser.get_format_instructions()}
+    )
+    chain = prompt | llm | parser
+    return chain.invoke({"context": json.dumps(context)})
+
+
+def explain_runtime(context):
+    return LLMService.generate_alert_explanation_json(context)
+
+
+def run(name, fn, calls, concurrency, server):
+    LLMRuntime.reset()
+    fn(CONTEXT)  # warm imports and, for the runtime, the shared client
+    connections, requests = server.connections, server.requests
+
+    def timed(_):
+        started = time.perf_counter()
+        fn(CONTEXT)
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = sorted(pool.map(timed, range(calls)))
+    elapsed = time.perf_counter() - started
+    return {
+        'mode': name,
+        'calls': server.requests - requests,
+        'connections_opened': server.connections - connections,
+        'calls_per_s': round(calls / elapsed, 1),
+        'mean_ms': round(sum(latencies) / len(latencies) * 1000, 3),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure per-call LLM client overhead against a fake Ollama server")
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--latency", type=float, default=0.0, help="Simulated model latency per call (seconds)")
+    parser.add_argument("--output", help="Write results JSON here")
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    with FakeOllama(latency_s=args.latency) as server:
+        os.environ["OLLAMA_BASE_URL"] = server.url
+        results = [
+            run("per-call", explain_per_call, args.calls, args.concurrency, server),
+            run("runtime", explain_runtime, args.calls, args.concurrency, server),
+        ]
+
+    for r in results:
+        print(f"{r['mode']:<9} {r['calls']} calls  {r['calls_per_s']:>8.1f}/s  mean {r['mean_ms']:>8.3f}ms  "
+              f"p50 {r['p50_ms']:>8.3f}ms  p95 {r['p95_ms']:>8.3f}ms  connections {r['connections_opened']}")
+    base, shared = results
+    if shared['mean_ms']:
+        print(f"overhead removed per call: {base['mean_ms'] - shared['mean_ms']:.3f}ms "
+              f"({base['mean_ms'] / shared['mean_ms']:.1f}x faster)")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'latency_s': args.latency, 'concurrency': args.concurrency, 'results': results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
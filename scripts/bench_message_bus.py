@@ -0,0 +1,149 @@
+"""
+End-to-end alert latency benchmark for the message bus backends.
+
+Publishes synthetic vitals the way the API does (KafkaClient.send_message),
+runs the alert engine on them through StreamConsumer, and measures the time
+from publishing a reading to a downstream consumer of the alerts topic
+receiving the alert it raised. The database is a dry-run session, so the
+numbers isolate the bus: serialization, the network hop and broker
+persistence for Kafka; a bounded in-process handoff for the memory bus.
+
+Examples:
+    python scripts/bench_message_bus.py --backend memory
+    python scripts/bench_message_bus.py --backend kafka --rate 500
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import threading
+import time
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.config import Config
+from app.core.kafka_client import KafkaClient
+from app.core.bus import create_consumer
+from app.core.stream import StreamConsumer
+from app.services.alert_consumer import AlertEngine
+from scripts.replay_vitals import DryRunSession, synthetic_readings, percentile
+
+
+def wait_for_assignment(streams, timeout_s=30):
+    """Polls until every consumer owns its partitions, so no reading is published before anyone listens."""
+    deadline = time.monotonic() + timeout_s
+    while time.monotonic() < deadline:
+        if all(stream.consumer.assignment() for stream in streams):
+            return True
+        for stream in streams:
+            stream.poll_once()
+    return False
+
+
+def run(backend, readings, rate, batch_size, idle_s):
+    Config.MESSAGE_BUS = backend
+    KafkaClient._producer = None
+    suffix = f"bench_{int(time.time())}"
+    vitals_topic, alerts_topic = f"{Config.KAFKA_TOPIC_VITALS}_{suffix}", f"{Config.KAFKA_TOPIC_ALERTS}_{suffix}"
+
+    engine = AlertEngine(session_factory=DryRunSession)
+    # The engine publishes to the configured alerts topic; point it at ours
+    Config.KAFKA_TOPIC_ALERTS = alerts_topic
+
+    sent_at = {}
+    latencies = []
+
+    def on_alert(alert):
+        started = sent_at.get((alert['encounter_id'], alert['timestamp']))
+        if started is not None:
+            latencies.append(time.perf_counter() - started)
+
+    kafka_config = {'auto_offset_reset': 'latest', 'enable_auto_commit': False}
+    engine_stream = StreamConsumer(
+        create_consumer(vitals_topic, group_id=f"{suffix}_engine", **kafka_config), vitals_topic,
+        process_message=lambda reading: engine.process_batch([reading]),
+        process_batch=engine.process_batch,
+        max_records=batch_size, timeout_ms=50,
+    )
+    sink_stream = StreamConsumer(
+        create_consumer(alerts_topic, group_id=f"{suffix}_sink", **kafka_config), alerts_topic,
+        process_message=on_alert, max_records=batch_size, timeout_ms=50,
+    )
+    if not wait_for_assignment([engine_stream, sink_stream]):
+        raise SystemExit(f"{backend}: consumers were not assigned partitions in time")
+
+    stop = threading.Event()
+    threads = [threading.Thread(target=s.run, args=(stop,), daemon=True) for s in (engine_stream, sink_stream)]
+    for thread in threads:
+        thread.start()
+
+    started = time.perf_counter()
+    for i, reading in enumerate(readings):
+        if rate:
+            delay = started + i / rate - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        sent_at[(reading['encounter_id'], reading['timestamp'])] = time.perf_counter()
+        KafkaClient.send_message(vitals_topic, reading, key=reading['encounter_id'])
+    published_s = time.perf_counter() - started
+
+    # Drain: stop once no alert has arrived for idle_s
+    seen = -1
+    while seen != len(latencies):
+        seen = len(latencies)
+        time.sleep(idle_s)
+    stop.set()
+    for thread in threads:
+        thread.join(timeout=5)
+    for stream in (engine_stream, sink_stream):
+        stream.consumer.close()
+
+    latencies.sort()
+    return {
+        'backend': backend,
+        'readings': len(readings),
+        'alerts': len(latencies),
+        'publish_readings_per_s': round(len(readings) / published_s, 1) if published_s else 0.0,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 3),
+        'max_ms': round(latencies[-1] * 1000, 3) if latencies else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare end-to-end alert latency across message bus backends")
+    parser.add_argument("--backend", choices=["memory", "kafka", "all"], default="memory")
+    parser.add_argument("--scenario", choices=["normal", "sepsis", "recovery"], default="sepsis")
+    parser.add_argument("--patients", type=int, default=20)
+    parser.add_argument("--readings", type=int, default=100, help="Readings per patient")
+    parser.add_argument("--rate", type=float, default=1000.0, help="Published readings/sec (0 = as fast as possible)")
+    parser.add_argument("--batch-size", type=int, default=Config.ALERT_ENGINE_BATCH_SIZE)
+    parser.add_argument("--idle", type=float, default=2.0, help="Seconds without new alerts before a run ends")
+    parser.add_argument("--output", help="Write results JSON here")
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    readings = synthetic_readings(args.scenario, args.patients, args.readings)
+    backends = ("memory", "kafka") if args.backend == "all" else (args.backend,)
+    alerts_topic = Config.KAFKA_TOPIC_ALERTS
+
+    results = []
+    for backend in backends:
+        Config.KAFKA_TOPIC_ALERTS = alerts_topic
+        results.append(run(backend, readings, args.rate, args.batch_size, args.idle))
+
+    for r in results:
+        print(f"{r['backend']:<7} {r['readings']} readings -> {r['alerts']} alerts  "
+              f"publish {r['publish_readings_per_s']:>9.1f}/s  latency p50 {r['p50_ms']:>8.3f}ms  "
+              f"p95 {r['p95_ms']:>8.3f}ms  p99 {r['p99_ms']:>8.3f}ms  max {r['max_ms']:>8.3f}ms")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'scenario': args.scenario, 'rate': args.rate, 'results': results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,262 @@
+"""
+Copilot and discharge-plan load test against the fake Ollama server.
+
+Starts tests/fake_ollama.py with a chosen latency distribution, token pacing
+and error rate, then:
+
+- copilot: publishes alert bursts (several alerts per encounter, mixed types
+  and severities) to the in-memory bus and runs AlertCopilotService until
+  every alert is explained, through the real pipeline (priority queue,
+  workers, coalescing, routing, LLM runtime and circuit breaker);
+- discharge: generates discharge plans for the encounters from a thread pool
+  through DischargeService.
+
+The database is an in-memory fixture session serving the generated alerts,
+patients and vitals, so only the model is simulated.
+
+Examples:
+    python scripts/load_test_llm.py --alerts 400 --latency lognormal:0.4:0.5
+    python scripts/load_test_llm.py --latency uniform:0.2:1 --error-rate 0.05 --workers 8 --output run.json
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Before Config is imported: no broker, no metrics port
+os.environ.setdefault('MESSAGE_BUS', 'memory')
+os.environ.setdefault('COPILOT_METRICS_PORT', '0')
+
+from app.core.bus import InMemoryBroker
+from app.core.config import Config
+from app.domain.models import Alert, Patient, Vitals, Encounter
+from app.llm.runtime import LLMRuntime, LLM_CALLS
+from app.services import alert_copilot
+from app.services.alert_copilot import AlertCopilotService, EXPLANATIONS
+from app.services.discharge_service import DischargeService
+from app.services.explanation_cache import ExplanationCache
+from scripts.replay_vitals import percentile
+from tests.fake_ollama import FakeOllama
+
+# (type, severity, message) groups raised together by one reading
+BURSTS = [
+    [('TACHYCARDIA', 'high', 'High Heart Rate detected: 128 BPM')],
+    [('FEVER', 'medium', 'High Temperature detected: 38.9 C')],
+    [('TACHYCARDIA', 'high', 'High Heart Rate detected: 124 BPM'), ('TACHYPNEA', 'medium', 'Rapid breathing detected: 26 bpm'),
+     ('FEVER', 'medium', 'High Temperature detected: 39.1 C'),
+     ('SEPSIS_RISK', 'critical', 'Possible Sepsis Pattern: Temp 39.1C, HR 124, Resp 26')],
+    [('HYPOXIA', 'high', 'Low SpO2 detected: 88%'),
+     ('RESPIRATORY_DISTRESS', 'critical', 'Respiratory Distress: SpO2 88%, Resp 30')],
+    [('BASELINE_DEVIATION_HR', 'medium', 'Heart rate 35% above this patient\'s baseline')],
+]
+
+
+class FixtureQuery:
+    def __init__(self, rows, criteria=()):
+        self._rows = rows
+        self._criteria = criteria
+
+    def filter(self, *criteria):
+        return FixtureQuery(self._rows, self._criteria + criteria)
+
+    def order_by(self, *args):
+        return self
+
+    def limit(self, n):
+        return FixtureQuery(self._rows[:n] if not self._criteria else self._matching()[:n])
+
+    def _matching(self):
+        rows = self._rows
+        for criterion in self._criteria:
+            column = getattr(getattr(criterion, 'left', None), 'key', None)
+            value = getattr(getattr(criterion, 'right', None), 'value', None)
+            if column and value is not None and getattr(criterion.operator, '__name__', '') == 'eq':
+                rows = [r for r in rows if getattr(r, column, None) == value]
+        return rows
+
+    def first(self):
+        rows = self._matching()
+        return rows[0] if rows else None
+
+    def all(self):
+        return self._matching()
+
+
+class FixtureSession:
+    """Session stand-in serving generated rows; writes are counted, not stored."""
+
+    def __init__(self, store):
+        self.store = store
+
+    def query(self, model):
+        return FixtureQuery(self.store.get(model, []))
+
+    def add(self, obj):
+        with self.store['lock']:
+            self.store['writes'] += 1
+        if getattr(obj, 'id', None) is None:
+            obj.id = 0
+
+    def execute(self, statement, params=None):
+        pass
+
+    def refresh(self, obj):
+        pass
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def build_fixtures(alert_count, seed):
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    alerts, patients, encounters, vitals = [], [], [], []
+    while len(alerts) < alert_count:
+        n = len(encounters) + 1
+        patient = SimpleNamespace(id=n, dob=datetime(1940 + rng.randint(0, 60), 1, 1), gender=rng.choice(["Male", "Female"]))
+        encounter = SimpleNamespace(id=n, patient_id=n, patient=patient, room=None, status="admitted",
+                                    admitted_at=now - timedelta(days=2), discharged_at=None)
+        patients.append(patient)
+        encounters.append(encounter)
+        for minutes in range(5):
+            vitals.append(SimpleNamespace(
+                encounter_id=n, timestamp=now - timedelta(minutes=minutes * 10), hr_bpm=rng.randint(90, 130),
+                spo2_pct=rng.randint(88, 99), bp_systolic=rng.randint(95, 150), bp_diastolic=rng.randint(60, 95),
+                temp_c=round(rng.uniform(36.8, 39.4), 1), resp_rate_bpm=rng.randint(14, 30)))
+        for alert_type, severity, message in rng.choice(BURSTS):
+            alerts.append(SimpleNamespace(id=len(alerts) + 1, type=alert_type, severity=severity, message=message,
+                                          patient_id=n, encounter_id=n, explanation=None,
+                                          timestamp=now.isoformat()))
+    return {Alert: alerts[:alert_count], Patient: patients, Encounter: encounters, Vitals: vitals,
+            'lock': threading.Lock(), 'writes': 0}
+
+
+def _paths():
+    return {path: sum(EXPLANATIONS.value(severity=s, path=path) for s in ('critical', 'high', 'medium', 'low'))
+            for path in ('llm', 'cache', 'rule', 'template')}
+
+
+def run_copilot(store, workers, cache):
+    alert_copilot.SessionLocal = lambda: FixtureSession(store)
+    Config.COPILOT_CONCURRENCY = workers
+    service = AlertCopilotService()
+    if not cache:
+        service.cache = ExplanationCache(ttl_s=0)
+    broker = InMemoryBroker.instance()
+    # Join the copilot's group first: the in-memory bus drops messages nobody consumes
+    broker.join(Config.KAFKA_TOPIC_ALERTS, 'alert_copilot_group')
+    for alert in store[Alert]:
+        broker.publish(Config.KAFKA_TOPIC_ALERTS, {'id': alert.id, 'severity': alert.severity,
+                                                   'timestamp': alert.timestamp}, key=str(alert.encounter_id))
+
+    paths_before = _paths()
+    stop = threading.Event()
+    started = time.perf_counter()
+    runner = threading.Thread(target=service.start, args=(stop,), daemon=True)
+    runner.start()
+    while runner.is_alive() and (service.stream is None or service.stream.processed < len(store[Alert])):
+        time.sleep(0.01)
+    elapsed = time.perf_counter() - started
+    stop.set()
+    runner.join(30)
+    broker.leave(Config.KAFKA_TOPIC_ALERTS, 'alert_copilot_group')
+    paths = {k: v - paths_before[k] for k, v in _paths().items()}
+    return {
+        'scenario': 'copilot',
+        'alerts': len(store[Alert]),
+        'elapsed_s': round(elapsed, 3),
+        'alerts_per_s': round(len(store[Alert]) / elapsed, 1),
+        'paths': paths,
+    }
+
+
+def run_discharge(store, workers):
+    encounter_ids = [e.id for e in store[Encounter]]
+
+    def plan(encounter_id):
+        started = time.perf_counter()
+        DischargeService.generate_discharge_plan(encounter_id, FixtureSession(store))
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        latencies = sorted(pool.map(plan, encounter_ids))
+    elapsed = time.perf_counter() - started
+    return {
+        'scenario': 'discharge',
+        'plans': len(encounter_ids),
+        'elapsed_s': round(elapsed, 3),
+        'plans_per_s': round(len(encounter_ids) / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 1),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the copilot and discharge plans against a fake Ollama")
+    parser.add_argument("--alerts", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=Config.COPILOT_CONCURRENCY)
+    parser.add_argument("--latency", default="lognormal:0.3:0.5", help="Model latency distribution (tests/fake_ollama.py)")
+    parser.add_argument("--token-delay", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--cache", action="store_true", help="Enable the explanation cache (in-memory level only)")
+    parser.add_argument("--scenario", choices=["copilot", "discharge", "both"], default="both")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="Write results JSON here")
+    args = parser.parse_args()
+
+    logging.getLogger().handlers = [logging.NullHandler()]
+    logging.getLogger().setLevel(logging.WARNING)
+    store = build_fixtures(args.alerts, args.seed)
+
+    results = []
+    with FakeOllama(latency=args.latency, token_delay_s=args.token_delay, error_rate=args.error_rate,
+                    seed=args.seed) as server:
+        os.environ["OLLAMA_BASE_URL"] = server.url
+        for scenario in (['copilot', 'discharge'] if args.scenario == 'both' else [args.scenario]):
+            LLMRuntime.reset()
+            before = server.stats()
+            rejected = sum(LLM_CALLS.value(task=t, result='rejected') for t in Config.LLM_TASK_TIMEOUT_S)
+            if scenario == 'copilot':
+                result = run_copilot(store, args.workers, args.cache)
+            else:
+                result = run_discharge(store, args.workers)
+            after = server.stats()
+            result.update({
+                'llm_requests': after['requests'] - before['requests'],
+                'llm_errors': after['errors'] - before['errors'],
+                'circuit_rejections': sum(LLM_CALLS.value(task=t, result='rejected') for t in Config.LLM_TASK_TIMEOUT_S) - rejected,
+            })
+            results.append(result)
+
+    for r in results:
+        rate = f"{r['alerts_per_s']:>7.1f} alerts/s" if r['scenario'] == 'copilot' else f"{r['plans_per_s']:>7.1f} plans/s"
+        extra = (f"paths {r['paths']}" if r['scenario'] == 'copilot'
+                 else f"p50 {r['p50_ms']}ms  p95 {r['p95_ms']}ms")
+        print(f"{r['scenario']:<9} {rate}  {r['llm_requests']} LLM calls  {r['llm_errors']} errors  "
+              f"{r['circuit_rejections']} rejected  {extra}  ({r['elapsed_s']}s)")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'latency': args.latency, 'error_rate': args.error_rate, 'workers': args.workers,
+                       'results': results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
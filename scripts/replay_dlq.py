@@ -0,0 +1,121 @@
+"""
+Dead-letter queue replay.
+
+Lists or republishes messages that a stream consumer moved to `<topic>.dlq`
+(see app/core/stream.py), e.g. once the bug or bad reference data that made
+them fail has been fixed.
+
+Replayed messages are sent back to their source topic with their original
+key, so they land on the same partition as before. Messages not selected by
+the filters are re-appended to the DLQ, which keeps them for a later replay
+while still letting this run commit its progress. A run stops at the DLQ end
+offsets it saw when it started, so kept messages are not read twice.
+
+Examples:
+    # What is in the vitals DLQ?
+    python scripts/replay_dlq.py --topic vitals_stream --list
+
+    # Push back everything that failed with a ValueError
+    python scripts/replay_dlq.py --topic vitals_stream --error-type ValueError
+"""
+import argparse
+import json
+import os
+import sys
+from collections import Counter
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from kafka import KafkaConsumer, KafkaProducer, TopicPartition
+from app.core.config import Config
+from app.core.stream import dlq_topic
+
+
+def original_bytes(entry):
+    """The original message value, as it was before it failed."""
+    if entry.get('value') is not None:
+        return json.dumps(entry['value']).encode('utf-8')
+    return (entry.get('raw_value') or '').encode('utf-8')
+
+
+def matches(entry, args):
+    if args.error_type and entry.get('error_type') not in args.error_type:
+        return False
+    if args.since and entry.get('failed_at', '') < args.since:
+        return False
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="List or replay dead-lettered stream messages")
+    parser.add_argument("--topic", required=True, help="Source topic whose DLQ to read (e.g. vitals_stream)")
+    parser.add_argument("--list", action="store_true", help="Only print a summary; replay nothing and commit nothing")
+    parser.add_argument("--error-type", action="append", help="Only replay these exception types (repeatable)")
+    parser.add_argument("--since", help="Only replay messages dead-lettered at or after this ISO time")
+    parser.add_argument("--to", help="Publish to this topic instead of the original one")
+    parser.add_argument("--limit", type=int, help="Stop after this many DLQ messages")
+    parser.add_argument("--group", default="dlq_replay", help="Consumer group used to track replay progress")
+    parser.add_argument("--idle-timeout-ms", type=int, default=5000, help="Stop once no message arrives for this long")
+    args = parser.parse_args()
+
+    source = dlq_topic(args.topic)
+    consumer = KafkaConsumer(
+        bootstrap_servers=Config.KAFKA_BOOTSTRAP_SERVERS,
+        group_id=None if args.list else args.group,
+        auto_offset_reset='earliest',
+        enable_auto_commit=False,
+        consumer_timeout_ms=args.idle_timeout_ms,
+        value_deserializer=lambda x: json.loads(x.decode('utf-8')),
+    )
+    partitions = [TopicPartition(source, p) for p in sorted(consumer.partitions_for_topic(source) or [])]
+    consumer.assign(partitions)
+    end_offsets = consumer.end_offsets(partitions) if partitions else {}
+    producer = None if args.list else KafkaProducer(bootstrap_servers=Config.KAFKA_BOOTSTRAP_SERVERS)
+
+    seen = replayed = kept = 0
+    errors = Counter()
+    try:
+        for message in consumer:
+            tp = TopicPartition(message.topic, message.partition)
+            if message.offset >= end_offsets[tp]:
+                # Reached what was there at start: leave the rest for the next run
+                consumer.seek(tp, end_offsets[tp])
+                consumer.pause(tp)
+                if len(consumer.paused()) == len(partitions):
+                    break
+                continue
+            entry = message.value
+            seen += 1
+            errors[entry.get('error_type')] += 1
+
+            if args.list:
+                print(f"{entry.get('source_topic')}[{entry.get('partition')}]@{entry.get('offset')} "
+                      f"{entry.get('failed_at')} {entry.get('error_type')}: {entry.get('error')}")
+            elif matches(entry, args):
+                key = entry['key'].encode('utf-8') if entry.get('key') is not None else None
+                producer.send(args.to or entry['source_topic'], original_bytes(entry), key=key)
+                replayed += 1
+            else:
+                producer.send(source, json.dumps(entry).encode('utf-8'), key=message.key)
+                kept += 1
+
+            if args.limit and seen >= args.limit:
+                break
+
+        if producer:
+            producer.flush()
+            consumer.commit()
+    finally:
+        consumer.close()
+        if producer:
+            producer.close()
+
+    print(f"{source}: {seen} messages" + ("" if args.list else f", {replayed} replayed, {kept} kept in the DLQ"))
+    for error_type, count in errors.most_common():
+        print(f"  {error_type:<28} {count}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,309 @@
+"""
+Vitals replay harness and rule-engine benchmark.
+
+Feeds recorded vitals (CSV / NDJSON / a DB window) or synthetic simulator
+scenarios through RuleEngine, AlertService and the alert consumer's
+AlertEngine (one reading per batch), and reports readings/sec, alerts/sec
+and p50/p99 evaluation latency. Results can be saved as JSON and compared against a
+previous run to catch regressions.
+
+Examples:
+    python scripts/replay_vitals.py --scenario sepsis --patients 50 --readings 200
+    python scripts/replay_vitals.py --input vitals.ndjson --speedup 60 --output run.json
+    python scripts/replay_vitals.py --from-db --since 2024-11-01 --compare baseline.json
+"""
+import argparse
+import csv
+import json
+import logging
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.kafka_client import KafkaClient
+from app.domain.models import Vitals
+from app.services.rule_engine import RuleEngine
+from app.services.alert_service import AlertService
+from app.services.alert_consumer import AlertEngine
+
+VITAL_FIELDS = {
+    'hr_bpm': int,
+    'spo2_pct': int,
+    'resp_rate_bpm': int,
+    'bp_systolic': int,
+    'bp_diastolic': int,
+    'temp_c': float,
+}
+
+TARGETS = ('rule_engine', 'alert_service', 'consumer')
+
+
+class DryRunSession:
+    """
+    Session stand-in used when replaying without a database: keeps the ORM
+    object construction and flush/commit call pattern of the real code paths
+    but performs no I/O.
+    """
+
+    def __init__(self):
+        self.added = 0
+        self._next_id = 1
+
+    def add(self, obj):
+        self.added += 1
+        if getattr(obj, 'id', None) is None:
+            obj.id = self._next_id
+            self._next_id += 1
+
+    def flush(self):
+        pass
+
+    def execute(self, statement, params=None):
+        # Bulk INSERT ... RETURNING: hand back every row with a fake id
+        rows = params if isinstance(params, list) else []
+        created = [SimpleNamespace(id=self._next_id + i, **row) for i, row in enumerate(rows)]
+        self._next_id += len(rows)
+        return DryRunResult(created)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class DryRunResult:
+    def __init__(self, rows):
+        self._rows = rows
+
+    def all(self):
+        return self._rows
+
+
+def _coerce(row):
+    reading = {
+        'patient_id': int(row['patient_id']),
+        'encounter_id': int(row['encounter_id']) if row.get('encounter_id') not in (None, '') else None,
+        'timestamp': row['timestamp'] if isinstance(row['timestamp'], str) else row['timestamp'].isoformat(),
+    }
+    for field, cast in VITAL_FIELDS.items():
+        value = row.get(field)
+        reading[field] = cast(value) if value not in (None, '') else None
+    return reading
+
+
+def load_file(path):
+    """Loads readings from a CSV (header row) or NDJSON file."""
+    with open(path, newline='') as f:
+        if path.endswith('.csv'):
+            return [_coerce(row) for row in csv.DictReader(f)]
+        return [_coerce(json.loads(line)) for line in f if line.strip()]
+
+
+def load_db(since=None, until=None, limit=None):
+    """Exports a window of the vitals table, oldest first."""
+    from app.core.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        query = db.query(Vitals)
+        if since:
+            query = query.filter(Vitals.timestamp >= since)
+        if until:
+            query = query.filter(Vitals.timestamp < until)
+        query = query.order_by(Vitals.timestamp)
+        if limit:
+            query = query.limit(limit)
+        return [
+            _coerce({field: getattr(v, field) for field in ('patient_id', 'encounter_id', 'timestamp', *VITAL_FIELDS)})
+            for v in query.yield_per(5000)
+        ]
+    finally:
+        db.close()
+
+
+def synthetic_readings(scenario, patients, readings, interval_s=2, seed=42):
+    """
+    Builds an interleaved stream from the tests/simulator.py scenarios, one
+    device per patient sending every `interval_s` seconds.
+    """
+    from tests.simulator import get_normal_vitals, get_sepsis_vitals, get_recovery_vitals
+
+    random.seed(seed)
+    start = datetime(2024, 1, 1)
+    stream = []
+    for step in range(readings):
+        ts = (start + timedelta(seconds=step * interval_s)).isoformat()
+        for patient in range(1, patients + 1):
+            if scenario == "sepsis":
+                vitals = get_sepsis_vitals()
+            elif scenario == "recovery":
+                vitals = get_recovery_vitals(step)
+            else:
+                vitals = get_normal_vitals()
+            vitals.pop('device_flags', None)
+            stream.append({'patient_id': patient, 'encounter_id': patient, 'timestamp': ts, **vitals})
+    return stream
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100.0 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def _evaluator(target, session_factory):
+    if target == 'rule_engine':
+        return RuleEngine.evaluate
+    if target == 'alert_service':
+        def evaluate(reading):
+            vitals = Vitals(**{k: v for k, v in reading.items() if k != 'timestamp'},
+                            timestamp=datetime.fromisoformat(reading['timestamp']))
+            return AlertService.evaluate_vitals(session_factory(), vitals)
+        return evaluate
+    engine = AlertEngine(session_factory=session_factory)
+    return lambda reading: engine.process_batch([reading])
+
+
+def run_replay(readings, target, speedup=0.0, session_factory=DryRunSession, warmup=200):
+    """
+    Replays `readings` through `target`. With speedup > 0 readings are paced by
+    their recorded timestamps divided by `speedup`; 0 replays as fast as possible.
+    The first `warmup` readings are run once untimed on a throwaway evaluator.
+    Returns a result dict.
+    """
+    warm = _evaluator(target, session_factory)
+    for reading in readings[:warmup]:
+        warm(reading)
+
+    evaluate = _evaluator(target, session_factory)
+    latencies_us = []
+    alerts = 0
+
+    first_ts = datetime.fromisoformat(readings[0]['timestamp']) if readings else None
+    started = time.perf_counter()
+
+    for reading in readings:
+        if speedup > 0:
+            offset = (datetime.fromisoformat(reading['timestamp']) - first_ts).total_seconds() / speedup
+            delay = started + offset - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+
+        t0 = time.perf_counter_ns()
+        alerts += len(evaluate(reading))
+        latencies_us.append((time.perf_counter_ns() - t0) / 1000.0)
+
+    elapsed = time.perf_counter() - started
+    latencies_us.sort()
+    return {
+        'target': target,
+        'readings': len(readings),
+        'alerts': alerts,
+        'elapsed_s': round(elapsed, 4),
+        'readings_per_s': round(len(readings) / elapsed, 1) if elapsed else 0.0,
+        'alerts_per_s': round(alerts / elapsed, 1) if elapsed else 0.0,
+        'p50_us': round(percentile(latencies_us, 50), 2),
+        'p99_us': round(percentile(latencies_us, 99), 2),
+    }
+
+
+def compare(results, baseline_path, tolerance):
+    """
+    Prints throughput/latency deltas against a saved run.
+    Returns False if any target regressed by more than `tolerance` (fraction).
+    """
+    with open(baseline_path) as f:
+        baseline = {r['target']: r for r in json.load(f)['results']}
+
+    ok = True
+    for result in results:
+        base = baseline.get(result['target'])
+        if not base:
+            continue
+        throughput = result['readings_per_s'] / base['readings_per_s'] - 1 if base['readings_per_s'] else 0.0
+        p99 = result['p99_us'] / base['p99_us'] - 1 if base['p99_us'] else 0.0
+        regressed = throughput < -tolerance or p99 > tolerance
+        ok = ok and not regressed
+        print(f"{result['target']:<14} readings/s {throughput:+.1%}  p99 {p99:+.1%}{'  REGRESSION' if regressed else ''}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay vitals through the alerting pipeline and benchmark it")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--input", help="CSV or NDJSON file of recorded vitals")
+    source.add_argument("--from-db", action="store_true", help="Replay a window of the vitals table")
+    source.add_argument("--scenario", choices=["normal", "sepsis", "recovery"], default="normal", help="Synthetic simulator scenario")
+    parser.add_argument("--since", type=datetime.fromisoformat, help="Start of DB window (with --from-db)")
+    parser.add_argument("--until", type=datetime.fromisoformat, help="End of DB window (with --from-db)")
+    parser.add_argument("--limit", type=int, help="Max readings to load from the DB")
+    parser.add_argument("--patients", type=int, default=20, help="Synthetic devices")
+    parser.add_argument("--readings", type=int, default=500, help="Synthetic readings per device")
+    parser.add_argument("--target", choices=TARGETS + ('all',), default="all")
+    parser.add_argument("--speedup", type=float, default=0.0, help="Replay speed relative to recorded time (0 = as fast as possible)")
+    parser.add_argument("--with-db", action="store_true", help="Write alerts to the configured database instead of a dry-run session")
+    parser.add_argument("--publish", action="store_true", help="Publish alerts to Kafka instead of discarding them")
+    parser.add_argument("--warmup", type=int, default=200, help="Untimed readings to run before measuring")
+    parser.add_argument("--verbose", action="store_true", help="Keep INFO logging from the pipeline")
+    parser.add_argument("--output", help="Write results JSON here")
+    parser.add_argument("--compare", help="Compare against a previous results JSON")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="Allowed regression fraction for --compare")
+    args = parser.parse_args()
+
+    if not args.verbose:
+        logging.getLogger().setLevel(logging.WARNING)
+
+    if args.input:
+        readings = load_file(args.input)
+        source_name = args.input
+    elif args.from_db:
+        readings = load_db(args.since, args.until, args.limit)
+        source_name = "db"
+    else:
+        readings = synthetic_readings(args.scenario, args.patients, args.readings)
+        source_name = f"scenario:{args.scenario}"
+
+    if not readings:
+        print("No readings to replay")
+        return 1
+
+    if not args.publish:
+        KafkaClient.send_message = classmethod(lambda cls, topic, message, key=None: None)
+        KafkaClient.send_batch = classmethod(lambda cls, topic, messages: None)
+
+    session_factory = DryRunSession
+    if args.with_db:
+        from app.core.database import SessionLocal
+        session_factory = SessionLocal
+
+    targets = TARGETS if args.target == 'all' else (args.target,)
+    results = [run_replay(readings, target, args.speedup, session_factory, args.warmup) for target in targets]
+
+    print(f"Source: {source_name} ({len(readings)} readings)")
+    for r in results:
+        print(f"{r['target']:<14} {r['readings_per_s']:>10.1f} readings/s {r['alerts_per_s']:>9.1f} alerts/s "
+              f"p50 {r['p50_us']:>8.1f}us  p99 {r['p99_us']:>8.1f}us")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'source': source_name, 'speedup': args.speedup, 'created_at': datetime.utcnow().isoformat(),
+                       'results': results}, f, indent=2)
+
+    if args.compare and not compare(results, args.compare, args.tolerance):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,16 @@
+import os
+import sys
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.config import Config
+from app.services.discharge_jobs import DischargePlanWorker
+from app.services.discharge_drafts import DischargePlanDrafter
+
+if __name__ == "__main__":
+    # Run API processes with DISCHARGE_JOB_CONCURRENCY=0 to leave all jobs to this worker
+    print("Starting Discharge Plan Worker...")
+    DischargePlanDrafter.start()
+    worker = DischargePlanWorker(concurrency=max(Config.DISCHARGE_JOB_CONCURRENCY, 1))
+    worker.run()
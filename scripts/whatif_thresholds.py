@@ -0,0 +1,94 @@
+"""
+What-if threshold simulator.
+
+Runs candidate rule sets over a historical window of the vitals table and
+compares their alert counts (per type, per department, per encounter and per
+bed-day) with the thresholds currently in force.
+
+Examples:
+    # TACHYCARDIA at 125 instead of 130, everywhere
+    python scripts/whatif_thresholds.py --since 2024-08-01 --until 2024-11-01 --set hr_high=125
+
+    # ICU-only change, plus a full candidate file
+    python scripts/whatif_thresholds.py --since 2024-10-01 --set ICU:spo2_low=88 --candidate icu_v2.json
+"""
+import argparse
+import json
+import os
+import sys
+from datetime import datetime
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.database import SessionLocal
+from app.services.rule_thresholds import ThresholdRegistry, DEFAULT_THRESHOLDS, DEFAULT_DEPARTMENT
+from app.services.threshold_simulator import ThresholdSimulator, diff_reports
+
+
+def parse_set(values, base):
+    """Applies KEY=VALUE or DEPARTMENT:KEY=VALUE overrides on top of `base`."""
+    overrides = {d: dict(v) for d, v in base.items()}
+    for item in values:
+        target, value = item.split('=', 1)
+        department, key = target.split(':', 1) if ':' in target else (DEFAULT_DEPARTMENT, target)
+        if key not in DEFAULT_THRESHOLDS:
+            raise SystemExit(f"Unknown threshold '{key}'. Known: {', '.join(sorted(DEFAULT_THRESHOLDS))}")
+        overrides.setdefault(department, {})[key] = float(value)
+    return overrides
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare alert volume of candidate thresholds over historical vitals")
+    parser.add_argument("--since", type=datetime.fromisoformat, required=True, help="Window start (ISO date/time)")
+    parser.add_argument("--until", type=datetime.fromisoformat, default=datetime.utcnow(), help="Window end (default: now)")
+    parser.add_argument("--set", action="append", default=[], metavar="[DEPT:]KEY=VALUE",
+                        help="Override a current threshold (repeatable)")
+    parser.add_argument("--candidate", action="append", default=[],
+                        help='JSON file of overrides {"default": {...}, "ICU": {...}} (repeatable)')
+    parser.add_argument("--chunk-size", type=int, default=50000, help="Rows per streamed chunk")
+    parser.add_argument("--top-encounters", type=int, default=20, help="Encounters to keep per rule set in the report (0 = all)")
+    parser.add_argument("--output", help="Write the full report JSON here")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        current = ThresholdRegistry.load_overrides(db)
+        rule_sets = {'current': current}
+        if args.set:
+            rule_sets['candidate'] = parse_set(args.set, current)
+        for path in args.candidate:
+            with open(path) as f:
+                rule_sets[os.path.splitext(os.path.basename(path))[0]] = json.load(f)
+        if len(rule_sets) == 1:
+            parser.error("give at least one --set or --candidate")
+
+        report = ThresholdSimulator(rule_sets, chunk_size=args.chunk_size).run(db, args.since, args.until)
+    finally:
+        db.close()
+
+    diff_reports(report)
+    if args.top_encounters:
+        for result in report['rule_sets'].values():
+            ranked = sorted(result['by_encounter'].items(), key=lambda kv: -sum(kv[1].values()))
+            result['by_encounter'] = dict(ranked[:args.top_encounters])
+
+    print(f"Window {args.since.isoformat()} -> {args.until.isoformat()}: "
+          f"{report['readings']} readings, {report['encounters']} encounters, {report['bed_days']} bed-days "
+          f"({report['elapsed_s']}s)")
+    for name, result in report['rule_sets'].items():
+        print(f"\n[{name}] {result['total_alerts']} alerts, {result['alerts_per_bed_day']} per bed-day")
+        delta = result.get('delta_vs_current')
+        for rule_type, count in sorted(result['by_type'].items()):
+            change = f" ({delta['by_type'][rule_type]:+d})" if delta else ""
+            print(f"  {rule_type:<22} {count:>8}{change}")
+        if delta and delta['alerts_per_bed_day'] is not None:
+            print(f"  per bed-day change: {delta['alerts_per_bed_day']:+}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
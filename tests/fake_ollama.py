@@ -0,0 +1,256 @@
+"""
+Stand-in for the Ollama HTTP API, for tests, benchmarks and load tests.
+
+Serves POST /api/chat (streamed NDJSON or a single JSON reply, as the client
+asks), GET /api/tags and GET /, over HTTP/1.1 with keep-alive. Replies are
+schema-valid JSON picked from the prompt: a discharge plan, an alert
+explanation, one explanation per alert for the combined (coalesced) prompt,
+or "OK" for the health check prompt.
+
+Model behaviour is configurable:
+- `latency`: seconds before the first token; a number, a callable, or a
+  spec string for parse_latency ("0.8", "uniform:0.2:1.5",
+  "lognormal:0.8:0.5", "normal:1.0:0.2").
+- `token_delay_s`: pause between streamed tokens.
+- `error_rate`: share of chat requests answered with HTTP 500.
+
+It counts TCP connections, requests and errors, so callers can check that
+clients reuse connections and handle failures.
+
+    with FakeOllama(latency="lognormal:0.5:0.4", error_rate=0.02) as server:
+        os.environ["OLLAMA_BASE_URL"] = server.url
+
+Run standalone (e.g. for the API or the copilot against a fake model):
+
+    python -m tests.fake_ollama --port 11434 --latency uniform:0.5:2 --error-rate 0.05
+"""
+import argparse
+import json
+import random
+import re
+import socket
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DISCHARGE_PLAN = {
+    "discharge_summary": "Patient is stable and ready for discharge.",
+    "home_care_instructions": ["Rest", "Stay hydrated"],
+    "recommended_meds": [{"name": "Paracetamol", "dose": "500mg", "duration": "3 days"}],
+    "followup_days": 7,
+}
+
+ALERT_EXPLANATION = {
+    "summary": "Vital signs outside the expected range.",
+    "risk_level": "Moderate",
+    "suggested_checks": ["Repeat the measurement"],
+    "suggested_actions": ["Notify the attending physician"],
+}
+
+
+def parse_latency(spec, rng=None):
+    """
+    Returns a callable giving one latency sample (seconds) per call, from a
+    number, a callable, or "fixed:s", "uniform:low:high",
+    "lognormal:median:sigma" or "normal:mean:sd".
+    """
+    rng = rng or random.Random()
+    if callable(spec):
+        return spec
+    if spec is None or isinstance(spec, (int, float)):
+        return lambda: float(spec or 0.0)
+    kind, _, params = str(spec).partition(':')
+    if not params:
+        return lambda: float(kind)
+    args = [float(p) for p in params.split(':')]
+    if kind == 'fixed':
+        return lambda: args[0]
+    if kind == 'uniform':
+        return lambda: rng.uniform(args[0], args[1])
+    if kind == 'lognormal':
+        median, sigma = args
+        return lambda: median * rng.lognormvariate(0.0, sigma)
+    if kind == 'normal':
+        return lambda: max(0.0, rng.gauss(args[0], args[1]))
+    raise ValueError(f"Unknown latency distribution: {spec}")
+
+
+def _alert_ids(prompt):
+    alerts = prompt.split('"alerts":', 1)
+    if len(alerts) < 2:
+        return []
+    return [json.loads(i) for i in re.findall(r'"id": ("[^"]*"|-?\d+)', alerts[1].split(']', 1)[0])]
+
+
+def reply_for(prompt):
+    if "Respond ONLY with the word: OK" in prompt:
+        return "OK"
+    if "discharge_summary" in prompt:
+        return json.dumps(DISCHARGE_PLAN)
+    if '"explanations"' in prompt:
+        return json.dumps({"explanations": [dict(ALERT_EXPLANATION, alert_id=i) for i in _alert_ids(prompt)]})
+    return json.dumps(ALERT_EXPLANATION)
+
+
+class FakeOllama:
+    def __init__(self, host="127.0.0.1", port=0, latency_s=0.0, model="llama3", latency=None,
+                 token_delay_s=0.0, error_rate=0.0, seed=None):
+        rng = random.Random(seed)
+        self.latency = parse_latency(latency if latency is not None else latency_s, rng)
+        self.token_delay_s = token_delay_s
+        self.error_rate = error_rate
+        self.model = model
+        self.connections = 0
+        self.requests = 0
+        self.errors = 0
+        self._rng = rng
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-ollama", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def stats(self):
+        with self._lock:
+            return {'connections': self.connections, 'requests': self.requests, 'errors': self.errors}
+
+    def _count(self, field):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    def _should_fail(self):
+        with self._lock:
+            return self.error_rate > 0 and self._rng.random() < self.error_rate
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                # Streamed replies are many small writes; don't let Nagle hold them back
+                self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                fake._count('connections')
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                if self.path == "/api/tags":
+                    self._json({"models": [{"name": f"{fake.model}:latest", "model": f"{fake.model}:latest"}]})
+                elif self.path == "/":
+                    self._send(200, b"Ollama is running", "text/plain")
+                else:
+                    self._send(404, b"not found", "text/plain")
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                if self.path != "/api/chat":
+                    self._send(404, b"not found", "text/plain")
+                    return
+                fake._count('requests')
+                latency = fake.latency()
+                if latency > 0:
+                    time.sleep(latency)
+                if fake._should_fail():
+                    fake._count('errors')
+                    self._send(500, json.dumps({"error": "model runner has unexpectedly stopped"}).encode("utf-8"),
+                               "application/json")
+                    return
+                prompt = "\n".join(str(m.get("content", "")) for m in body.get("messages", []))
+                content = reply_for(prompt)
+                if body.get("stream", True):
+                    self._stream(content)
+                else:
+                    self._json(self._message(content, done=True))
+
+            def _message(self, content, done):
+                message = {
+                    "model": fake.model,
+                    "created_at": datetime.now(timezone.utc).isoformat(),
+                    "message": {"role": "assistant", "content": content},
+                    "done": done,
+                }
+                if done:
+                    message.update(done_reason="stop", total_duration=0, eval_count=len(content.split()),
+                                   prompt_eval_count=0)
+                return message
+
+            def _stream(self, content):
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                words = content.split(" ")
+                for i, word in enumerate(words):
+                    if i and fake.token_delay_s:
+                        time.sleep(fake.token_delay_s)
+                    self._chunk(self._message(word if i == 0 else " " + word, done=False))
+                done = self._message("", done=True)
+                done["eval_count"] = len(words)
+                self._chunk(done)
+                self.wfile.write(b"0\r\n\r\n")
+
+            def _chunk(self, message):
+                data = (json.dumps(message) + "\n").encode("utf-8")
+                self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+
+            def _json(self, payload):
+                self._send(200, json.dumps(payload).encode("utf-8"), "application/json")
+
+            def _send(self, status, data, content_type):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Ollama-compatible server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--model", default="llama3")
+    parser.add_argument("--latency", default="0", help="Seconds to first token, or a distribution (see parse_latency)")
+    parser.add_argument("--token-delay", type=float, default=0.0, help="Seconds between streamed tokens")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of chat requests failing with HTTP 500")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    server = FakeOllama(args.host, args.port, model=args.model, latency=args.latency,
+                        token_delay_s=args.token_delay, error_rate=args.error_rate, seed=args.seed)
+    print(f"Fake Ollama serving {args.model} on {server.url}")
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server._server.server_close()
+
+
+if __name__ == "__main__":
+    main()
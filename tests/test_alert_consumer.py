@@ -0,0 +1,176 @@
+import unittest
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+from sqlalchemy.exc import OperationalError
+from app.core.stream import RetryPolicy
+from app.services.alert_consumer import AlertEngine, EngineRebalanceListener
+from app.services.baseline_detector import BaselineDetector
+from app.services.alert_resolver import AlertAutoResolver
+
+class TestAlertEngine(unittest.TestCase):
+    def _engine(self, db):
+        return AlertEngine(
+            detector=BaselineDetector(warmup=1000),
+            resolver=AlertAutoResolver(normal_readings=2),
+            session_factory=lambda: db
+        )
+
+    def _reading(self, **vitals):
+        return {'patient_id': 1, 'encounter_id': 10, 'timestamp': '2023-10-27T10:00:00', **vitals}
+
+    @patch('app.services.alert_service.KafkaClient')
+    def test_batch_is_one_transaction_and_one_publish(self, mock_kafka):
+        db = MagicMock()
+        db.execute.side_effect = lambda stmt, rows: MagicMock(all=lambda: [
+            SimpleNamespace(id=101 + i, **row) for i, row in enumerate(rows)
+        ])
+        engine = self._engine(db)
+
+        payloads = engine.process_batch([
+            self._reading(hr_bpm=140),
+            self._reading(hr_bpm=80),
+            self._reading(spo2_pct=85),
+        ])
+
+        self.assertEqual([p['id'] for p in payloads], [101, 102])
+        self.assertEqual([p['type'] for p in payloads], ['TACHYCARDIA', 'HYPOXIA'])
+        db.execute.assert_called_once()
+        db.commit.assert_called_once()
+        mock_kafka.send_batch.assert_called_once()
+        self.assertEqual(engine.resolver.open_count(), 2)
+
+    @patch('app.services.alert_service.KafkaClient')
+    def test_quiet_batch_skips_database(self, mock_kafka):
+        db = MagicMock()
+        engine = self._engine(db)
+
+        self.assertEqual(engine.process_batch([self._reading(hr_bpm=80)]), [])
+        db.commit.assert_not_called()
+        mock_kafka.send_batch.assert_not_called()
+
+    @patch('app.services.alert_service.KafkaClient')
+    def test_db_failure_raises_and_does_not_publish(self, mock_kafka):
+        db = MagicMock()
+        db.execute.side_effect = Exception("connection lost")
+        engine = self._engine(db)
+
+        with self.assertRaises(Exception):
+            engine.process_batch([self._reading(hr_bpm=140)])
+        db.rollback.assert_called_once()
+        mock_kafka.send_batch.assert_not_called()
+
+    @patch('app.services.alert_service.KafkaClient')
+    def test_redelivered_alerts_are_not_published_again(self, mock_kafka):
+        db = MagicMock()
+        # Natural-key conflict: the database created nothing
+        db.execute.return_value.all.return_value = []
+        db.query.return_value.filter.return_value.all.return_value = []
+        engine = self._engine(db)
+
+        self.assertEqual(engine.process_batch([self._reading(hr_bpm=140)]), [])
+        db.commit.assert_called_once()
+        mock_kafka.send_batch.assert_not_called()
+        self.assertEqual(engine.resolver.open_count(), 0)
+
+    @patch('app.services.alert_service.KafkaClient')
+    def test_alert_inserted_first_by_api_is_still_tracked(self, mock_kafka):
+        db = MagicMock()
+        db.execute.return_value.all.return_value = []
+        # The API path's lowercase row won the natural key
+        db.query.return_value.filter.return_value.all.return_value = [
+            SimpleNamespace(id=55, encounter_id=10, type='tachycardia')]
+        engine = self._engine(db)
+
+        self.assertEqual(engine.process_batch([self._reading(hr_bpm=140)]), [])
+        mock_kafka.send_batch.assert_not_called()
+        self.assertEqual(engine.resolver.open_count(), 1)
+
+        engine.process_batch([self._reading(hr_bpm=80)])
+        engine.process_batch([self._reading(hr_bpm=82)])
+        self.assertEqual(engine.resolver.open_count(), 0)
+
+    @patch('app.services.alert_service.KafkaClient')
+    def test_malformed_reading_rejected_before_state_changes(self, mock_kafka):
+        db = MagicMock()
+        engine = self._engine(db)
+
+        with self.assertRaises(ValueError):
+            engine.process_batch([self._reading(hr_bpm=80), {**self._reading(hr_bpm=90), 'timestamp': 'yesterday'}])
+        self.assertIsNone(engine.detector.get_state(10, 'hr_bpm'))
+        db.execute.assert_not_called()
+
+    @patch('app.services.alert_service.KafkaClient')
+    def test_retried_batch_folds_reading_into_state_once(self, mock_kafka):
+        db = MagicMock()
+        blips = [OperationalError("insert", {}, Exception("connection reset")),
+                 OperationalError("insert", {}, Exception("connection reset"))]
+        def execute(stmt, *args):
+            if blips:
+                raise blips.pop()
+            return MagicMock()
+        db.execute.side_effect = execute
+        engine = self._engine(db)
+        engine.resolver = AlertAutoResolver(normal_readings=3)
+        engine.resolver.track(10, 'TACHYCARDIA', 7)
+        # Two in-range readings already seen: the next one queues the resolve
+        engine.resolver.observe(self._reading(hr_bpm=90), [])
+        engine.resolver.observe(self._reading(hr_bpm=90), [])
+
+        RetryPolicy(max_attempts=3, sleep=lambda s: None).call(engine.process_batch, [self._reading(hr_bpm=80)])
+
+        self.assertEqual(engine.detector.get_state(10, 'hr_bpm')[2], 1)
+        self.assertEqual(engine.resolver.open_count(), 0)
+
+    @patch('app.services.alert_service.KafkaClient')
+    def test_failed_batch_leaves_baseline_and_streaks_untouched(self, mock_kafka):
+        db = MagicMock()
+        db.execute.side_effect = OperationalError("insert", {}, Exception("connection reset"))
+        engine = self._engine(db)
+        engine.resolver = AlertAutoResolver(normal_readings=3)
+        engine.resolver.track(10, 'TACHYCARDIA', 7)
+
+        for _ in range(3):
+            with self.assertRaises(OperationalError):
+                engine.process_batch([self._reading(hr_bpm=80), self._reading(spo2_pct=85)])
+
+        self.assertIsNone(engine.detector.get_state(10, 'hr_bpm'))
+        self.assertEqual(engine.resolver.open_count(), 1)
+        self.assertFalse(engine.resolver.has_pending())
+        self.assertEqual(engine.resolver._streaks[(10, 'TACHYCARDIA')], 0)
+
+    @patch('app.services.alert_consumer.ThresholdRegistry')
+    def test_warm_start_loads_state_in_bulk_and_reports(self, mock_registry):
+        db = MagicMock()
+        detector, resolver = MagicMock(), MagicMock()
+        detector.load.return_value, detector.seed.return_value, resolver.load.return_value = 12, 40, 3
+        engine = AlertEngine(detector=detector, resolver=resolver, session_factory=lambda: db)
+
+        summary = engine.load_state()
+
+        mock_registry.reload.assert_called_once_with(db)
+        self.assertEqual((summary['baselines'], summary['seed_readings'], summary['open_alerts']), (12, 40, 3))
+        self.assertGreaterEqual(summary['seconds'], 0)
+        self.assertGreaterEqual(summary['bytes'], 0)
+        db.close.assert_called_once()
+
+    @patch('app.services.alert_consumer.tracemalloc')
+    @patch('app.services.alert_consumer.ThresholdRegistry')
+    def test_rebalance_reloads_handed_over_state_without_a_warm_start(self, mock_registry, mock_tracemalloc):
+        engine = MagicMock(warm_started=True)
+        listener = EngineRebalanceListener(MagicMock(), engine)
+
+        listener.on_partitions_assigned({MagicMock(partition=0)})
+        engine.refresh_state.assert_not_called()
+
+        listener.on_partitions_assigned({MagicMock(partition=1)})
+        engine.refresh_state.assert_called_once()
+        engine.load_state.assert_not_called()
+
+        db = MagicMock()
+        AlertEngine(detector=MagicMock(), resolver=MagicMock(), session_factory=lambda: db).refresh_state()
+        mock_registry.reload.assert_not_called()
+        mock_tracemalloc.start.assert_not_called()
+        db.close.assert_called_once()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,14 +1,20 @@
+import threading
+import time
 import unittest
 from unittest.mock import MagicMock, patch
-from app.services.alert_copilot import AlertCopilotService
+from app.core.config import Config
+from app.services.alert_copilot import AlertCopilotService, alert_priority, explanation_route
+from app.core.coalesce import Coalescer
 from app.domain.models import Alert, AlertExplanation, Patient, Vitals
 from datetime import datetime
 
 class TestAlertCopilotService(unittest.TestCase):
-    @patch('app.services.alert_copilot.KafkaConsumer')
+    @patch('app.services.alert_copilot.ExplanationCache')
+    @patch('app.core.bus.KafkaConsumer')
     @patch('app.services.alert_copilot.SessionLocal')
     @patch('app.services.alert_copilot.LLMService')
-    def test_process_alert(self, mock_llm, mock_session_cls, mock_kafka):
+    def test_process_alert(self, mock_llm, mock_session_cls, mock_kafka, mock_cache_cls):
+        mock_cache_cls.return_value.get.return_value = None
         # Setup mocks
         mock_db = MagicMock()
         mock_session_cls.return_value = mock_db
@@ -16,7 +22,7 @@ class TestAlertCopilotService(unittest.TestCase):
         # Mock Alert
         mock_alert = MagicMock()
         mock_alert.id = 1
-        mock_alert.type = "tachycardia"
+        mock_alert.type = "sepsis_risk"
         mock_alert.severity = "high"
         mock_alert.message = "HR > 100"
         mock_alert.patient_id = 1
@@ -52,5 +58,186 @@ class TestAlertCopilotService(unittest.TestCase):
         self.assertEqual(explanation.summary, "Summary")
         self.assertEqual(explanation.risk_level, "High")
 
+    def _alert(self, severity):
+        return MagicMock(id=2, type="FEVER", severity=severity, message="High Temperature detected: 39.2 C",
+                         patient_id=1, encounter_id=1, explanation=None)
+
+    @patch('app.core.bus.KafkaConsumer')
+    @patch('app.services.alert_copilot.SessionLocal')
+    @patch('app.services.alert_copilot.LLMService')
+    def test_low_severity_is_shed_to_template_under_backlog(self, mock_llm, mock_session_cls, mock_kafka):
+        mock_db = mock_session_cls.return_value
+        mock_db.query.return_value.filter.return_value.first.return_value = self._alert("medium")
+        service = AlertCopilotService()
+        service.stream = MagicMock(backlog=100)
+
+        service.process_alert({"id": 2, "severity": "medium"}, waited_s=1.0)
+
+        mock_llm.generate_alert_explanation_json.assert_not_called()
+        explanation = mock_db.add.call_args[0][0]
+        self.assertEqual(explanation.risk_level, "Moderate")
+        self.assertIn("Automated checklist", explanation.summary)
+
+    @patch('app.services.alert_copilot.ExplanationCache')
+    @patch('app.core.bus.KafkaConsumer')
+    @patch('app.services.alert_copilot.SessionLocal')
+    @patch('app.services.alert_copilot.LLMService')
+    def test_critical_alerts_always_use_llm(self, mock_llm, mock_session_cls, mock_kafka, mock_cache_cls):
+        mock_cache_cls.return_value.get.return_value = None
+        mock_db = mock_session_cls.return_value
+        mock_db.query.return_value.filter.return_value.first.return_value = self._alert("critical")
+        mock_llm.generate_alert_explanation_json.return_value = {"summary": "Sepsis", "risk_level": "High"}
+        service = AlertCopilotService()
+        service.stream = MagicMock(backlog=100)
+
+        service.process_alert({"id": 2, "severity": "critical"}, waited_s=3600)
+
+        mock_llm.generate_alert_explanation_json.assert_called_once()
+
+    @patch('app.services.alert_copilot.ExplanationCache')
+    @patch('app.core.bus.KafkaConsumer')
+    @patch('app.services.alert_copilot.SessionLocal')
+    @patch('app.services.alert_copilot.LLMService')
+    def test_critical_alert_waits_only_the_critical_window(self, mock_llm, mock_session_cls, mock_kafka, mock_cache_cls):
+        mock_cache_cls.return_value.get.return_value = None
+        mock_db = mock_session_cls.return_value
+        mock_db.query.return_value.filter.return_value.first.return_value = self._alert("critical")
+        mock_llm.generate_alert_explanation_json.return_value = {"summary": "Sepsis", "risk_level": "High"}
+        service = AlertCopilotService()
+        service.coalescer = Coalescer(window_s=5, max_items=8)
+
+        started = time.monotonic()
+        with patch.object(Config, 'COPILOT_COALESCE_CRITICAL_WINDOW_S', 0.05):
+            service.process_alert({"id": 2, "severity": "critical"})
+
+        self.assertLess(time.monotonic() - started, 2)
+        mock_llm.generate_alert_explanation_json.assert_called_once()
+
+    @patch('app.services.alert_copilot.ExplanationCache')
+    @patch('app.core.bus.KafkaConsumer')
+    @patch('app.services.alert_copilot.SessionLocal')
+    @patch('app.services.alert_copilot.LLMService')
+    def test_deterioration_burst_shares_one_llm_call(self, mock_llm, mock_session_cls, mock_kafka, mock_cache_cls):
+        # One reading's alerts, with the rule engine's severities: only SEPSIS_RISK routes to the LLM
+        mock_cache_cls.return_value.get.return_value = None
+        burst = {13: ("SEPSIS_RISK", "critical"), 10: ("TACHYCARDIA", "high"),
+                 11: ("TACHYPNEA", "medium"), 12: ("FEVER", "medium")}
+        dbs = {}
+        for alert_id, (alert_type, severity) in burst.items():
+            db = dbs[f"alert-{alert_id}"] = MagicMock()
+            alert = MagicMock(id=alert_id, type=alert_type, severity=severity, message=alert_type,
+                              patient_id=1, encounter_id=7, explanation=None)
+            db.query.return_value.filter.return_value.first.side_effect = [alert, MagicMock(dob=datetime(1970, 1, 1), gender="Female")]
+            db.query.return_value.filter.return_value.order_by.return_value.limit.return_value.all.return_value = []
+        mock_session_cls.side_effect = lambda: dbs[threading.current_thread().name]
+        mock_llm.generate_alert_explanations_json.return_value = {
+            alert_id: {"summary": f"{alert_type} explained", "risk_level": "High"}
+            for alert_id, (alert_type, _) in burst.items()
+        }
+        service = AlertCopilotService()
+        service.coalescer = Coalescer(window_s=5, max_items=4)
+
+        threads = {alert_id: threading.Thread(target=service.process_alert, args=({"id": alert_id},), name=f"alert-{alert_id}")
+                   for alert_id in burst}
+        with patch.object(Config, 'COPILOT_COALESCE_CRITICAL_WINDOW_S', 5):
+            # Critical alerts are dequeued first
+            threads[13].start()
+            deadline = time.monotonic() + 5
+            while not service.coalescer._open and time.monotonic() < deadline:
+                time.sleep(0.01)
+            for alert_id in (10, 11, 12):
+                threads[alert_id].start()
+            for t in threads.values():
+                t.join(10)
+
+        mock_llm.generate_alert_explanations_json.assert_called_once()
+        mock_llm.generate_alert_explanation_json.assert_not_called()
+        context = mock_llm.generate_alert_explanations_json.call_args[0][0]
+        self.assertEqual(sorted(a["id"] for a in context["alerts"]), [10, 11, 12, 13])
+        saved = {db.add.call_args[0][0].alert_id: db.add.call_args[0][0] for db in dbs.values()}
+        self.assertEqual(saved[12].summary, "FEVER explained")
+        self.assertEqual(saved[10].summary, "TACHYCARDIA explained")
+
+    @patch('app.core.bus.KafkaConsumer')
+    @patch('app.services.alert_copilot.SessionLocal')
+    @patch('app.services.alert_copilot.LLMService')
+    def test_routine_alert_uses_rule_path_with_vitals_trend(self, mock_llm, mock_session_cls, mock_kafka):
+        mock_db = mock_session_cls.return_value
+        mock_db.query.return_value.filter.return_value.first.return_value = self._alert("medium")
+        mock_db.query.return_value.filter.return_value.order_by.return_value.limit.return_value.all.return_value = [
+            MagicMock(hr_bpm=96, spo2_pct=97, bp_systolic=120, bp_diastolic=80, temp_c=39.2, resp_rate_bpm=18),
+            MagicMock(hr_bpm=90, spo2_pct=98, bp_systolic=118, bp_diastolic=78, temp_c=38.1, resp_rate_bpm=16),
+        ]
+        service = AlertCopilotService()
+        service.stream = MagicMock(backlog=0)
+
+        service.process_alert({"id": 2, "severity": "medium"})
+
+        mock_llm.generate_alert_explanation_json.assert_not_called()
+        explanation = mock_db.add.call_args[0][0]
+        self.assertIn("Temperature worsening over the last 2 readings (38.1 -> 39.2 C)", explanation.summary)
+        self.assertEqual(explanation.risk_level, "High")
+
+    def test_routing_sends_composite_and_critical_alerts_to_llm(self):
+        self.assertEqual(explanation_route("FEVER", "medium"), "rule")
+        self.assertEqual(explanation_route("tachycardia", "high"), "rule")
+        self.assertEqual(explanation_route("TACHYCARDIA", "critical"), "llm")
+        self.assertEqual(explanation_route("SEPSIS_RISK", "critical"), "llm")
+        self.assertEqual(explanation_route("BASELINE_DEVIATION_HR", "medium"), "llm")
+        with patch.dict(Config.COPILOT_EXPLANATION_ROUTES, {"FEVER": "llm"}):
+            self.assertEqual(explanation_route("FEVER", "medium"), "llm")
+
+    @patch('app.services.alert_copilot.ExplanationCache')
+    @patch('app.core.bus.KafkaConsumer')
+    @patch('app.services.alert_copilot.SessionLocal')
+    @patch('app.services.alert_copilot.LLMService')
+    def test_alert_burst_for_one_encounter_shares_one_llm_call(self, mock_llm, mock_session_cls, mock_kafka, mock_cache_cls):
+        mock_cache_cls.return_value.get.return_value = None
+        types = {10: "BASELINE_DEVIATION_HR", 11: "BASELINE_DEVIATION_RESP", 12: "BASELINE_DEVIATION_TEMP", 13: "SEPSIS_RISK"}
+        dbs = {}
+        for alert_id, alert_type in types.items():
+            db = dbs[f"alert-{alert_id}"] = MagicMock()
+            alert = MagicMock(id=alert_id, type=alert_type, severity="high", message=alert_type,
+                              patient_id=1, encounter_id=7, explanation=None)
+            db.query.return_value.filter.return_value.first.side_effect = [alert, MagicMock(dob=datetime(1970, 1, 1), gender="Female")]
+            db.query.return_value.filter.return_value.order_by.return_value.limit.return_value.all.return_value = []
+        mock_session_cls.side_effect = lambda: dbs[threading.current_thread().name]
+        # The model leaves out SEPSIS_RISK
+        mock_llm.generate_alert_explanations_json.return_value = {
+            alert_id: {"summary": f"{alert_type} explained", "risk_level": "High"}
+            for alert_id, alert_type in types.items() if alert_id != 13
+        }
+        service = AlertCopilotService()
+        service.coalescer = Coalescer(window_s=5, max_items=4)
+
+        threads = [threading.Thread(target=service.process_alert, args=({"id": alert_id},), name=f"alert-{alert_id}")
+                   for alert_id in types]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join(10)
+
+        mock_llm.generate_alert_explanations_json.assert_called_once()
+        mock_llm.generate_alert_explanation_json.assert_not_called()
+        context = mock_llm.generate_alert_explanations_json.call_args[0][0]
+        self.assertEqual(sorted(a["id"] for a in context["alerts"]), [10, 11, 12, 13])
+        saved = {db.add.call_args[0][0].alert_id: db.add.call_args[0][0] for db in dbs.values()}
+        self.assertEqual(saved[12].summary, "BASELINE_DEVIATION_TEMP explained")
+        self.assertEqual(saved[13].risk_level, "High")  # template for the left-out alert
+        self.assertIn("Automated checklist", saved[13].summary)
+        # Patient context fetched by one worker only
+        self.assertEqual(sum(db.query.return_value.filter.return_value.first.call_count for db in dbs.values()), 5)
+
+    def test_priority_orders_by_severity_then_age(self):
+        alerts = [
+            {"severity": "medium", "timestamp": "2024-01-01T10:00:00"},
+            {"severity": "critical", "timestamp": "2024-01-01T10:05:00"},
+            {"severity": "high", "timestamp": "2024-01-01T10:03:00"},
+            {"severity": "critical", "timestamp": "2024-01-01T10:01:00"},
+        ]
+        ordered = sorted(alerts, key=alert_priority)
+        self.assertEqual([(a["severity"], a["timestamp"][-5:]) for a in ordered],
+                         [("critical", "01:00"), ("critical", "05:00"), ("high", "03:00"), ("medium", "00:00")])
+
 if __name__ == '__main__':
     unittest.main()
@@ -1,6 +1,7 @@
 import unittest
 from unittest.mock import MagicMock, patch
 from app.services.rule_engine import RuleEngine
+from app.services.rule_thresholds import ThresholdRegistry
 from app.app import create_app
 from datetime import datetime
 
@@ -23,6 +24,68 @@ class TestAlertEngine(unittest.TestCase):
         alerts = RuleEngine.evaluate(vitals)
         self.assertEqual(len(alerts), 0)
 
+class TestDepartmentThresholds(unittest.TestCase):
+    def tearDown(self):
+        ThresholdRegistry.install({}, {})
+        ThresholdRegistry._unresolved.clear()
+        ThresholdRegistry._wake.clear()
+
+    def test_department_override(self):
+        ThresholdRegistry.install({'ICU': {'hr_high': 120}}, {101: 'ICU', 102: 'General'})
+        icu = {'hr_bpm': 125, 'patient_id': 1, 'encounter_id': 101, 'timestamp': '2023-10-27T10:00:00'}
+        general = {**icu, 'encounter_id': 102}
+
+        self.assertEqual([a['type'] for a in RuleEngine.evaluate(icu)], ['TACHYCARDIA'])
+        self.assertEqual(RuleEngine.evaluate(general), [])
+
+    def test_install_bumps_version_and_swaps_evaluators(self):
+        before = ThresholdRegistry.current()
+        vitals = {'temp_c': 38.2, 'patient_id': 1, 'timestamp': '2023-10-27T10:00:00'}
+        self.assertEqual(RuleEngine.evaluate(vitals), [])
+
+        after = ThresholdRegistry.install({'default': {'temp_high': 38.0}})
+        self.assertEqual(after.version, before.version + 1)
+        self.assertEqual([a['type'] for a in RuleEngine.evaluate(vitals)], ['FEVER'])
+
+    def test_reload_skips_unchanged_fingerprint(self):
+        db = MagicMock()
+        db.query.return_value.one.return_value = (0, None)
+        db.query.return_value.join.return_value.filter.return_value.all.return_value = [(101, 'ICU')]
+        db.query.return_value.all.return_value = []
+
+        ThresholdRegistry._fingerprint = None
+        self.assertTrue(ThresholdRegistry.reload(db))
+        self.assertFalse(ThresholdRegistry.reload(db))
+        self.assertEqual(ThresholdRegistry.department_for(101), 'ICU')
+
+    @patch('app.services.rule_thresholds.SessionLocal')
+    def test_encounter_admitted_since_reload_is_resolved_off_the_reading_path(self, mock_session):
+        ThresholdRegistry.install({'ICU': {'hr_high': 120}}, {})
+        icu = {'hr_bpm': 125, 'patient_id': 1, 'encounter_id': 103, 'timestamp': '2023-10-27T10:00:00'}
+
+        # Default thresholds until resolved; evaluation never opens a session
+        self.assertEqual(RuleEngine.evaluate(icu), [])
+        mock_session.assert_not_called()
+        self.assertTrue(ThresholdRegistry._wake.is_set())
+
+        db = MagicMock()
+        db.query.return_value.join.return_value.filter.return_value.all.return_value = [(103, 'ICU')]
+        self.assertEqual(ThresholdRegistry.resolve_departments(db), 1)
+        self.assertEqual([a['type'] for a in RuleEngine.evaluate(icu)], ['TACHYCARDIA'])
+        self.assertEqual(ThresholdRegistry.resolve_departments(db), 0)
+
+    def test_reload_picks_up_sql_edit_with_same_row_count(self):
+        db = MagicMock()
+        db.query.return_value.join.return_value.filter.return_value.all.return_value = []
+        db.query.return_value.all.return_value = []
+
+        ThresholdRegistry._fingerprint = None
+        db.query.return_value.one.return_value = (1, 'a1f3')
+        self.assertTrue(ThresholdRegistry.reload(db))
+        # UPDATE rule_thresholds SET value = ... leaves updated_at alone but changes the checksum
+        db.query.return_value.one.return_value = (1, '9c0e')
+        self.assertTrue(ThresholdRegistry.reload(db))
+
 class TestAlertAPI(unittest.TestCase):
     def setUp(self):
         self.app = create_app()
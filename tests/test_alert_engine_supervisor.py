@@ -0,0 +1,62 @@
+import queue
+import unittest
+from unittest.mock import MagicMock, patch
+from app.services.alert_engine_supervisor import WorkerPool
+
+class TestWorkerPool(unittest.TestCase):
+    def _pool(self):
+        pool = WorkerPool(workers=2, report_interval_s=10, max_backoff_s=4)
+        pool._spawn = MagicMock(side_effect=lambda worker_id: MagicMock(pid=1000 + worker_id, is_alive=lambda: True))
+        return pool
+
+    @patch('app.services.alert_engine_supervisor.time')
+    def test_crashed_worker_is_restarted_with_backoff(self, mock_time):
+        mock_time.monotonic.return_value = 100.0
+        pool = self._pool()
+        pool.start()
+        self.assertEqual(pool._spawn.call_count, 2)
+
+        crashed = MagicMock(exitcode=1, is_alive=lambda: False)
+        pool._procs[1] = crashed
+        pool.check_workers()
+        self.assertIsNone(pool._procs[1])
+
+        # Backoff (1s) not yet elapsed
+        mock_time.monotonic.return_value = 100.5
+        pool.check_workers()
+        self.assertEqual(pool._spawn.call_count, 2)
+
+        mock_time.monotonic.return_value = 101.0
+        pool.check_workers()
+        self.assertEqual(pool._spawn.call_count, 3)
+        self.assertEqual(pool.restarts, 1)
+
+        # A second crash before the worker became stable doubles the delay
+        pool._procs[1] = crashed
+        pool.check_workers()
+        self.assertEqual(pool._restart_at[1], 103.0)
+
+    @patch('app.services.alert_engine_supervisor.time')
+    def test_report_aggregates_worker_stats(self, mock_time):
+        mock_time.monotonic.return_value = 0.0
+        pool = self._pool()
+        pool.start()
+        pool.stats_queue = MagicMock()
+        messages = [
+            {'worker': 0, 'readings': 400, 'alerts': 10, 'lag': 5, 'partitions': [0, 1]},
+            {'worker': 1, 'readings': 600, 'alerts': 30, 'lag': 7, 'partitions': [2]},
+        ]
+        pool.stats_queue.get_nowait.side_effect = messages + [queue.Empty()]
+        pool.collect()
+
+        mock_time.monotonic.return_value = 10.0
+        summary = pool.report()
+
+        self.assertEqual(summary['readings_per_s'], 100.0)
+        self.assertEqual(summary['alerts_per_s'], 4.0)
+        self.assertEqual(summary['lag'], 12)
+        self.assertEqual(summary['workers_alive'], 2)
+        self.assertEqual(summary['partitions'], {0: [0, 1], 1: [2]})
+
+if __name__ == '__main__':
+    unittest.main()
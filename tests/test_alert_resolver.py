@@ -0,0 +1,61 @@
+import unittest
+from unittest.mock import MagicMock
+from app.services.alert_resolver import AlertAutoResolver
+
+class TestAlertAutoResolver(unittest.TestCase):
+    def _reading(self, **vitals):
+        vitals = vitals or {'hr_bpm': 80, 'spo2_pct': 98, 'temp_c': 37.0}
+        return {'patient_id': 1, 'encounter_id': 10, 'timestamp': '2023-10-27T10:00:00', **vitals}
+
+    def test_resolves_after_consecutive_normal_readings(self):
+        resolver = AlertAutoResolver(normal_readings=3)
+        resolver.track(10, 'tachycardia', 1)
+        resolver.track(10, 'FEVER', 2)
+
+        self.assertEqual(resolver.observe(self._reading(), [{'type': 'FEVER'}]), [])
+        self.assertEqual(resolver.observe(self._reading(), [{'type': 'FEVER'}]), [])
+        # Third reading without TACHYCARDIA (case-insensitive match) resolves it
+        self.assertEqual(resolver.observe(self._reading(), [{'type': 'FEVER'}]), [1])
+        self.assertEqual(resolver.open_count(), 1)
+
+    def test_firing_again_resets_streak(self):
+        resolver = AlertAutoResolver(normal_readings=2)
+        resolver.track(10, 'HYPOXIA', 5)
+
+        resolver.observe(self._reading(), [])
+        resolver.observe(self._reading(), [{'type': 'HYPOXIA'}])
+        self.assertEqual(resolver.observe(self._reading(), []), [])
+        self.assertEqual(resolver.observe(self._reading(), []), [5])
+
+    def test_readings_without_the_vital_do_not_resolve(self):
+        resolver = AlertAutoResolver(normal_readings=2)
+        resolver.track(10, 'HYPOXIA', 5)
+
+        # A BP-only feed says nothing about SpO2
+        for _ in range(5):
+            self.assertEqual(resolver.observe(self._reading(bp_systolic=120, bp_diastolic=80), []), [])
+        self.assertEqual(resolver.open_count(), 1)
+
+        resolver.observe(self._reading(spo2_pct=97), [])
+        self.assertEqual(resolver.observe(self._reading(spo2_pct=98, bp_systolic=120), []), [5])
+
+    def test_flush_issues_single_update(self):
+        resolver = AlertAutoResolver(normal_readings=1)
+        resolver.track(10, 'FEVER', 1)
+        resolver.track(10, 'HYPOXIA', 2)
+        resolver.observe(self._reading(), [])
+
+        db = MagicMock()
+        self.assertEqual(resolver.flush(db), 2)
+        db.execute.assert_called_once()
+        self.assertFalse(resolver.has_pending())
+        self.assertEqual(resolver.flush(db), 0)
+
+    def test_disabled(self):
+        resolver = AlertAutoResolver(normal_readings=0)
+        resolver.track(10, 'FEVER', 1)
+        self.assertEqual(resolver.open_count(), 0)
+        self.assertEqual(resolver.observe(self._reading(), []), [])
+
+if __name__ == '__main__':
+    unittest.main()
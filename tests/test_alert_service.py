@@ -1,11 +1,15 @@
 import unittest
 from unittest.mock import MagicMock, patch
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.schema import CreateIndex
+from app.domain.models import Alert
 from app.services.alert_service import AlertService
 from app.app import create_app
 from datetime import datetime
 
 class TestAlertService(unittest.TestCase):
-    def test_evaluate_vitals_tachycardia(self):
+    @patch('app.services.alert_service.KafkaClient')
+    def test_evaluate_vitals_tachycardia(self, mock_kafka):
         db = MagicMock()
         vitals = MagicMock()
         vitals.hr_bpm = 140
@@ -17,11 +21,44 @@ class TestAlertService(unittest.TestCase):
         vitals.encounter_id = 10
         vitals.timestamp = datetime.now()
         
+        created = MagicMock(id=7, patient_id=1, encounter_id=10, timestamp=vitals.timestamp,
+                            type='tachycardia', severity='medium', message='HR 140')
+        db.execute.return_value.all.return_value = [created]
+
         alerts = AlertService.evaluate_vitals(db, vitals)
         self.assertIn('tachycardia', alerts)
-        # Verify db.add was called
-        self.assertTrue(db.add.called)
-        # Verify Kafka publish (mocked inside)
+        # Verify the alert was written (bulk insert) and committed
+        self.assertTrue(db.execute.called)
+        db.commit.assert_called_once()
+        # Verify Kafka publish carries the new alert's id
+        payloads = mock_kafka.send_batch.call_args[0][1]
+        self.assertEqual(payloads[0]['id'], 7)
+
+    @patch('app.services.alert_service.KafkaClient')
+    def test_evaluate_vitals_duplicate_not_published(self, mock_kafka):
+        db = MagicMock()
+        vitals = MagicMock(hr_bpm=140, spo2_pct=98, temp_c=37.0, bp_systolic=120, bp_diastolic=80,
+                           patient_id=1, encounter_id=10, timestamp=datetime.now())
+        # Already raised for this reading (e.g. by the stream consumer)
+        db.execute.return_value.all.return_value = []
+
+        alerts = AlertService.evaluate_vitals(db, vitals)
+        self.assertIn('tachycardia', alerts)
+        mock_kafka.send_batch.assert_not_called()
+
+    def test_natural_key_dedupes_alerts_without_an_encounter(self):
+        index = next(i for i in Alert.__table__.indexes if i.name == "uq_alerts_natural_key")
+        ddl = str(CreateIndex(index).compile(dialect=postgresql.dialect()))
+        # Postgres treats NULL encounter_ids as distinct unless told otherwise
+        self.assertIn("NULLS NOT DISTINCT", ddl)
+
+        db = MagicMock()
+        db.execute.return_value.all.return_value = []
+        AlertService.insert_alerts(db, [{'patient_id': 1, 'encounter_id': None, 'timestamp': datetime.now(),
+                                         'type': 'TACHYCARDIA', 'severity': 'high', 'message': 'HR 140',
+                                         'resolved': False}])
+        sql = str(db.execute.call_args[0][0].compile(dialect=postgresql.dialect()))
+        self.assertIn("ON CONFLICT (encounter_id, lower(type), timestamp) DO NOTHING", sql)
 
     def test_evaluate_vitals_normal(self):
         db = MagicMock()
@@ -35,6 +72,7 @@ class TestAlertService(unittest.TestCase):
         alerts = AlertService.evaluate_vitals(db, vitals)
         self.assertEqual(len(alerts), 0)
         self.assertFalse(db.add.called)
+        self.assertFalse(db.execute.called)
 
 class TestAlertAPIIntegration(unittest.TestCase):
     def setUp(self):
@@ -74,5 +74,14 @@ class TestAPI(unittest.TestCase):
         response = self.client.post('/vitals', json=payload)
         self.assertEqual(response.status_code, 400)
 
+    @patch('app.app.DischargePlanDrafter')
+    @patch('app.app.DischargePlanWorker')
+    @patch('app.app.LLMHealthProber')
+    @patch('app.app.ThresholdRegistry')
+    def test_create_app_starts_no_background_threads(self, *starters):
+        create_app()
+        for starter in starters:
+            self.assertEqual(starter.method_calls, [])
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,112 @@
+import unittest
+from datetime import datetime, timezone
+from unittest.mock import MagicMock
+from app.services.baseline_detector import BaselineDetector
+
+class TestBaselineDetector(unittest.TestCase):
+    def _reading(self, **vitals):
+        return {'patient_id': 1, 'encounter_id': 10, 'timestamp': '2023-10-27T10:00:00', **vitals}
+
+    def test_no_alerts_during_warmup(self):
+        detector = BaselineDetector(alpha=0.1, z_threshold=3.0, warmup=5)
+        for _ in range(4):
+            self.assertEqual(detector.update(self._reading(hr_bpm=70)), [])
+        # Still in warm-up (4 readings seen), so even a big jump is not flagged
+        self.assertEqual(detector.update(self._reading(hr_bpm=140)), [])
+
+    def test_flags_deviation_from_patient_baseline(self):
+        detector = BaselineDetector(alpha=0.1, z_threshold=3.0, warmup=5)
+        for hr in [50, 52, 49, 51, 50, 50, 51, 49]:
+            detector.update(self._reading(hr_bpm=hr))
+
+        # HR 75 is normal by fixed thresholds but far above this athlete's baseline
+        alerts = detector.update(self._reading(hr_bpm=75))
+        self.assertEqual(len(alerts), 1)
+        self.assertEqual(alerts[0]['type'], 'BASELINE_DEVIATION_HR')
+        self.assertEqual(alerts[0]['vital'], 'hr_bpm')
+        self.assertGreater(alerts[0]['z_score'], 3.0)
+
+    def test_each_deviating_vital_gets_its_own_alert_type(self):
+        detector = BaselineDetector(alpha=0.1, z_threshold=3.0, warmup=5)
+        for hr, spo2 in [(50, 98), (52, 97), (49, 98), (51, 98), (50, 97), (50, 98)]:
+            detector.update(self._reading(hr_bpm=hr, spo2_pct=spo2))
+
+        alerts = detector.update(self._reading(hr_bpm=80, spo2_pct=90))
+        # Same reading, so they would collide on the natural key if the type were shared
+        self.assertEqual(sorted(a['type'] for a in alerts), ['BASELINE_DEVIATION_HR', 'BASELINE_DEVIATION_SPO2'])
+
+    def test_low_baseline_is_not_flagged(self):
+        detector = BaselineDetector(alpha=0.1, z_threshold=3.0, warmup=5)
+        # COPD patient living at SpO2 ~91
+        for spo2 in [91, 90, 91, 92, 91, 91, 90, 91, 92]:
+            self.assertEqual(detector.update(self._reading(spo2_pct=spo2)), [])
+
+    def test_ignores_readings_without_encounter(self):
+        detector = BaselineDetector()
+        self.assertEqual(detector.update({'patient_id': 1, 'hr_bpm': 80}), [])
+        self.assertEqual(len(detector), 0)
+
+    def test_snapshot_writes_dirty_states_once(self):
+        detector = BaselineDetector(warmup=5)
+        detector.update(self._reading(hr_bpm=70, temp_c=37.0))
+        db = MagicMock()
+
+        self.assertEqual(detector.snapshot(db), 2)
+        db.execute.assert_called_once()
+        db.commit.assert_called_once()
+
+        # Nothing changed since, so the next snapshot is a no-op
+        self.assertEqual(detector.snapshot(db), 0)
+        db.execute.assert_called_once()
+
+    def test_load_restores_state(self):
+        detector = BaselineDetector()
+        db = MagicMock()
+        db.query.return_value.join.return_value.filter.return_value.all.return_value = [
+            MagicMock(encounter_id=10, vital='hr_bpm', mean=55.0, variance=4.0, samples=200)
+        ]
+
+        self.assertEqual(detector.load(db), 1)
+        self.assertEqual(detector.get_state(10, 'hr_bpm'), (55.0, 4.0, 200))
+
+    def test_seed_replays_recent_readings_without_alerting(self):
+        detector = BaselineDetector(warmup=3, z_threshold=1.0)
+        db = MagicMock()
+        db.execute.return_value.all.return_value = [
+            MagicMock(_mapping={'encounter_id': 11, 'timestamp': None, 'hr_bpm': hr, 'recency': 4 - i})
+            for i, hr in enumerate([60, 62, 61, 120])
+        ]
+
+        self.assertEqual(detector.seed(db, readings=4), 4)
+        db.execute.assert_called_once()
+        mean, _, count = detector.get_state(11, 'hr_bpm')
+        self.assertEqual(count, 4)
+        self.assertGreater(mean, 61)
+
+    def test_redelivered_seed_readings_are_not_folded_in_twice(self):
+        detector = BaselineDetector(warmup=3)
+        db = MagicMock()
+        db.execute.return_value.all.return_value = [
+            MagicMock(_mapping={'encounter_id': 11, 'timestamp': datetime(2024, 1, 1, 10, i, tzinfo=timezone.utc),
+                                'hr_bpm': 60 + i, 'recency': 3 - i})
+            for i in range(3)
+        ]
+        detector.seed(db, readings=3)
+
+        # The stream redelivers the last seeded reading, then moves on
+        detector.update({'encounter_id': 11, 'timestamp': '2024-01-01T10:02:00', 'hr_bpm': 62})
+        self.assertEqual(detector.get_state(11, 'hr_bpm')[2], 3)
+        detector.update({'encounter_id': 11, 'timestamp': '2024-01-01T10:03:00', 'hr_bpm': 63})
+        self.assertEqual(detector.get_state(11, 'hr_bpm')[2], 4)
+
+        # A later seed (after a rebalance) leaves tracked encounters alone
+        self.assertEqual(detector.seed(db, readings=3), 0)
+        self.assertEqual(detector.get_state(11, 'hr_bpm')[2], 4)
+
+    def test_seed_disabled(self):
+        db = MagicMock()
+        self.assertEqual(BaselineDetector().seed(db, readings=0), 0)
+        db.execute.assert_not_called()
+
+if __name__ == '__main__':
+    unittest.main()
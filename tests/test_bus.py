@@ -0,0 +1,65 @@
+import unittest
+from unittest.mock import patch
+from kafka import TopicPartition
+from app.core.bus import InMemoryBroker, InMemoryConsumer, InMemoryProducer, BusFull
+from app.core.stream import StreamConsumer, RetryPolicy
+
+class TestInMemoryBus(unittest.TestCase):
+    def setUp(self):
+        self.broker = InMemoryBroker(maxsize=3, publish_timeout_s=0.01)
+
+    def test_each_group_receives_the_published_object(self):
+        engine = InMemoryConsumer('vitals', group_id='engine', broker=self.broker)
+        audit = InMemoryConsumer('vitals', group_id='audit', broker=self.broker)
+        reading = {'encounter_id': 1, 'hr_bpm': 140}
+        InMemoryProducer(self.broker).send('vitals', reading, key=1)
+
+        for consumer in (engine, audit):
+            batch = consumer.poll(timeout_ms=10)
+            record = batch[TopicPartition('vitals', 0)][0]
+            # Zero-copy: the consumer gets the very same object
+            self.assertIs(record.value, reading)
+
+    def test_seek_redelivers_uncommitted_records(self):
+        consumer = InMemoryConsumer('vitals', group_id='engine', broker=self.broker)
+        producer = InMemoryProducer(self.broker)
+        for n in range(3):
+            producer.send('vitals', {'n': n})
+
+        tp = TopicPartition('vitals', 0)
+        first = consumer.poll(timeout_ms=10)[tp]
+        self.assertEqual(consumer.highwater(tp) - consumer.position(tp), 0)
+        consumer.seek(tp, first[1].offset)
+        consumer.commit()
+
+        again = consumer.poll(timeout_ms=10)[tp]
+        self.assertEqual([r.value['n'] for r in again], [1, 2])
+
+    def test_full_channel_applies_backpressure(self):
+        InMemoryConsumer('vitals', group_id='engine', broker=self.broker)
+        producer = InMemoryProducer(self.broker)
+        for n in range(3):
+            producer.send('vitals', {'n': n})
+        with self.assertRaises(BusFull):
+            producer.send('vitals', {'n': 3})
+
+    def test_closed_group_no_longer_blocks_publishers(self):
+        consumer = InMemoryConsumer('vitals', group_id='engine', broker=self.broker)
+        consumer.close()
+        producer = InMemoryProducer(self.broker)
+        for n in range(10):
+            producer.send('vitals', {'n': n})
+        self.assertEqual(self.broker.dropped, 10)
+
+    @patch('app.core.stream.KafkaClient')
+    def test_stream_consumer_runs_on_memory_bus(self, mock_kafka):
+        handled = []
+        consumer = InMemoryConsumer('alerts', group_id='copilot', broker=self.broker)
+        stream = StreamConsumer(consumer, 'alerts', handled.append, retry=RetryPolicy(sleep=lambda s: None), timeout_ms=10)
+        InMemoryProducer(self.broker).send('alerts', {'id': 7})
+
+        self.assertEqual(stream.poll_once(), 1)
+        self.assertEqual(handled, [{'id': 7}])
+
+if __name__ == '__main__':
+    unittest.main()
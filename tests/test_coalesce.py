@@ -0,0 +1,83 @@
+import threading
+import time
+import unittest
+from app.core.coalesce import Coalescer
+
+class TestCoalescer(unittest.TestCase):
+    def _submit_all(self, coalescer, submissions, run):
+        results, errors = {}, {}
+
+        def submit(key, item):
+            try:
+                results[item] = coalescer.submit(key, item, run)
+            except Exception as e:
+                errors[item] = e
+
+        threads = [threading.Thread(target=submit, args=s) for s in submissions]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join(5)
+        return results, errors
+
+    def test_items_for_one_key_run_as_one_batch(self):
+        batches = []
+
+        def run(items):
+            batches.append(sorted(items))
+            return [item * 10 for item in items]
+
+        coalescer = Coalescer(window_s=5, max_items=3)
+        results, errors = self._submit_all(coalescer, [("a", 1), ("a", 2), ("a", 3)], run)
+
+        self.assertEqual(batches, [[1, 2, 3]])
+        self.assertEqual(results, {1: 10, 2: 20, 3: 30})
+        self.assertEqual(errors, {})
+
+    def test_keys_are_batched_separately_and_window_closes_batches(self):
+        batches = []
+
+        def run(items):
+            batches.append(items)
+            return items
+
+        coalescer = Coalescer(window_s=0.05)
+        results, _ = self._submit_all(coalescer, [("a", 1), ("b", 2)], run)
+        self.assertEqual(sorted(batches), [[1], [2]])
+        self.assertEqual(results, {1: 1, 2: 2})
+
+        # A later submission for the same key starts a new batch
+        self.assertEqual(coalescer.submit("a", 3, run), 3)
+
+    def test_batch_failure_reaches_every_submitter(self):
+        def run(items):
+            raise RuntimeError("LLM down")
+
+        coalescer = Coalescer(window_s=5, max_items=2)
+        results, errors = self._submit_all(coalescer, [("a", 1), ("a", 2)], run)
+        self.assertEqual(results, {})
+        self.assertEqual(sorted(errors), [1, 2])
+        self.assertIsInstance(errors[1], RuntimeError)
+
+    def test_shorter_window_runs_batch_early_and_join_needs_an_open_batch(self):
+        coalescer = Coalescer(window_s=5)
+        self.assertIsNone(coalescer.join("a", 1))
+
+        started = time.monotonic()
+        self.assertEqual(coalescer.submit("a", 2, lambda items: items, window_s=0.05), 2)
+        self.assertLess(time.monotonic() - started, 2)
+
+        results = {}
+        leader = threading.Thread(target=lambda: results.setdefault(3, coalescer.submit("a", 3, lambda items: [items] * len(items))))
+        leader.start()
+        while not coalescer._open:
+            time.sleep(0.01)
+        # An urgent item brings the run forward for the whole batch
+        started = time.monotonic()
+        self.assertEqual(coalescer.submit("a", 4, None, window_s=0.05), [3, 4])
+        self.assertLess(time.monotonic() - started, 2)
+        leader.join(5)
+        self.assertEqual(results[3], [3, 4])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,162 @@
+import threading
+import unittest
+from unittest.mock import MagicMock, patch
+from app.llm.breaker import CircuitBreaker
+from app.llm.runtime import LLMRuntime
+from app.services.discharge_service import DischargeService
+from app.services.discharge_drafts import DischargePlanDrafter
+
+PLAN = {
+    "discharge_summary": "Stable, ready for discharge",
+    "home_care_instructions": ["Rest"],
+    "recommended_meds": [],
+    "followup_days": 5
+}
+
+def _draft():
+    return MagicMock(encounter_id=3, summary="Stable, ready for discharge", home_care_instructions='["Rest"]',
+                     recommended_meds='[]', followup_days=5, last_alert_id=4, last_observation_id=2)
+
+class TestDischargePlanDrafts(unittest.TestCase):
+    def setUp(self):
+        self.db = MagicMock()
+
+    @patch.object(DischargeService, 'draft_basis', return_value=(4, 2))
+    def test_draft_is_valid_until_a_newer_alert_or_observation(self, mock_basis):
+        draft = _draft()
+        self.db.query.return_value.filter.return_value.first.return_value = draft
+        self.assertIs(DischargeService.valid_draft(3, self.db), draft)
+
+        mock_basis.return_value = (4, 3)
+        self.assertIsNone(DischargeService.valid_draft(3, self.db))
+        self.db.delete.assert_called_once_with(draft)
+
+    @patch('app.services.discharge_service.LLMService')
+    @patch.object(DischargeService, 'draft_basis', return_value=(4, 2))
+    def test_plan_from_draft_persists_without_llm(self, mock_basis, mock_llm):
+        draft = _draft()
+        encounter = MagicMock(id=3, patient_id=1)
+        self.db.query.return_value.filter.return_value.first.side_effect = [draft, encounter]
+
+        plan = DischargeService.plan_from_draft(3, self.db)
+
+        mock_llm.generate_discharge_plan_json.assert_not_called()
+        self.db.delete.assert_called_once_with(draft)
+        self.assertEqual(plan.summary, "Stable, ready for discharge")
+        self.assertEqual(plan.followup_days, 5)
+        self.assertEqual(plan.generated_by, "llm_draft")
+        self.db.commit.assert_called_once()
+
+    @patch('app.services.discharge_service.LLMService')
+    @patch.object(DischargeService, 'draft_basis', return_value=(4, 2))
+    def test_generate_draft_records_its_basis(self, mock_basis, mock_llm):
+        self.db.query.return_value.filter.return_value.first.return_value = MagicMock(id=3, room=None, admitted_at=None,
+                                                                                       discharged_at=None)
+        self.db.query.return_value.filter.return_value.order_by.return_value.limit.return_value.all.return_value = []
+        self.db.query.return_value.filter.return_value.all.return_value = []
+        mock_llm.generate_discharge_plan_json.return_value = PLAN
+
+        draft = DischargeService.generate_draft(3, self.db)
+
+        self.assertEqual((draft.last_alert_id, draft.last_observation_id), (4, 2))
+        self.assertEqual(draft.home_care_instructions, '["Rest"]')
+        _, kwargs = mock_llm.generate_discharge_plan_json.call_args
+        self.assertEqual(kwargs, {"fallback": False, "task": "discharge_draft"})
+
+class TestDischargePlanDrafter(unittest.TestCase):
+    def setUp(self):
+        self.db = MagicMock()
+        self.db.query.return_value.filter.return_value.count.return_value = 0
+        self.now = 0.0
+        self.drafter = DischargePlanDrafter(session_factory=lambda: self.db, batch=2, recheck_s=900,
+                                            clock=lambda: self.now)
+        self.drafter.sweep = MagicMock()
+        self.drafter.candidates = MagicMock(return_value={e: (4, 2) for e in (1, 2, 3, 4)})
+
+    def _runtime(self, mock_runtime, in_flight=0, state=CircuitBreaker.CLOSED):
+        mock_runtime.get.return_value = MagicMock(in_flight=in_flight, breaker=MagicMock(state=state))
+
+    @patch('app.services.discharge_drafts.DischargeService')
+    @patch('app.services.discharge_drafts.LLMRuntime')
+    def test_drafts_stable_encounters_up_to_batch(self, mock_runtime, mock_service):
+        self._runtime(mock_runtime)
+        mock_service.is_stable_for_discharge.side_effect = lambda encounter_id, db: encounter_id != 1
+
+        self.assertEqual(self.drafter.run_once(), 2)
+        self.assertEqual([c.args[0] for c in mock_service.generate_draft.call_args_list], [2, 3])
+
+    @patch('app.services.discharge_drafts.DischargeService')
+    @patch('app.services.discharge_drafts.LLMRuntime')
+    def test_unstable_encounter_is_checked_again_only_after_a_change(self, mock_runtime, mock_service):
+        self._runtime(mock_runtime)
+        mock_service.is_stable_for_discharge.return_value = False
+        self.drafter.candidates.return_value = {1: (4, 2)}
+
+        self.drafter.run_once()
+        self.drafter.run_once()
+        self.assertEqual(mock_service.is_stable_for_discharge.call_count, 1)
+
+        # New observation
+        self.drafter.candidates.return_value = {1: (4, 3)}
+        self.drafter.run_once()
+        self.assertEqual(mock_service.is_stable_for_discharge.call_count, 2)
+
+        # Nothing new, but alerts may have aged out of the stability window
+        self.now = 901
+        self.drafter.run_once()
+        self.assertEqual(mock_service.is_stable_for_discharge.call_count, 3)
+
+    def test_sweep_deletes_stale_drafts_in_one_statement(self):
+        self.db.query.return_value.filter.return_value.delete.return_value = 2
+
+        self.assertEqual(DischargePlanDrafter.sweep(self.db), 2)
+        self.db.query.return_value.filter.return_value.delete.assert_called_once_with(synchronize_session=False)
+        self.db.commit.assert_called_once()
+        self.db.delete.assert_not_called()
+
+    @patch('app.services.discharge_drafts.DischargeService')
+    @patch('app.services.discharge_drafts.LLMRuntime')
+    def test_waits_while_llm_is_busy(self, mock_runtime, mock_service):
+        self._runtime(mock_runtime, in_flight=1)
+        self.assertEqual(self.drafter.run_once(), 0)
+
+        self._runtime(mock_runtime, state=CircuitBreaker.OPEN)
+        self.assertEqual(self.drafter.run_once(), 0)
+
+        # Discharge plan jobs waiting
+        self._runtime(mock_runtime)
+        self.db.query.return_value.filter.return_value.count.return_value = 1
+        self.assertEqual(self.drafter.run_once(), 0)
+        mock_service.generate_draft.assert_not_called()
+
+    @patch('app.services.discharge_drafts.DischargeService')
+    @patch('app.services.discharge_drafts.LLMRuntime')
+    def test_llm_failure_stops_the_check(self, mock_runtime, mock_service):
+        self._runtime(mock_runtime)
+        mock_service.generate_draft.side_effect = ConnectionError("ollama down")
+
+        self.assertEqual(self.drafter.run_once(), 0)
+        mock_service.generate_draft.assert_called_once()
+        self.db.rollback.assert_called_once()
+
+class TestRuntimeInFlight(unittest.TestCase):
+    def test_counts_running_calls(self):
+        runtime = LLMRuntime(llm=MagicMock(), breaker=CircuitBreaker(5, 30, name='test'))
+        started, release = threading.Event(), threading.Event()
+
+        def call(config):
+            started.set()
+            release.wait(5)
+            return "done"
+
+        caller = threading.Thread(target=runtime.run, args=("discharge_draft", call))
+        caller.start()
+        started.wait(5)
+        self.assertEqual(runtime.in_flight, 1)
+        release.set()
+        caller.join(5)
+        self.assertEqual(runtime.in_flight, 0)
+        runtime._executor.shutdown(wait=False)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,196 @@
+import threading
+import time
+import unittest
+from datetime import datetime, timezone
+from unittest.mock import MagicMock, patch
+from app.app import create_app
+from app.services.discharge_jobs import DischargePlanJobs, DischargePlanWorker
+
+def _job(attempts=1, status="running"):
+    return MagicMock(id=7, encounter_id=3, attempts=attempts, status=status, error=None)
+
+class TestDischargePlanWorker(unittest.TestCase):
+    def setUp(self):
+        self.db = MagicMock()
+        self.worker = DischargePlanWorker(concurrency=2, session_factory=lambda: self.db, max_attempts=3, backoff_s=10)
+
+    def tearDown(self):
+        self.worker.executor.shutdown(wait=False)
+
+    def _lookups(self, job, plan=None):
+        # Job, then existing plan, then the job again after a rollback
+        self.db.query.return_value.filter.return_value.first.side_effect = [job, plan, job]
+
+    @patch('app.services.discharge_jobs.DischargeService')
+    def test_valid_draft_is_used_without_generating(self, mock_service):
+        job = _job()
+        self._lookups(job)
+
+        self.worker.run_job(7)
+
+        mock_service.plan_from_draft.assert_called_once_with(3, self.db)
+        mock_service.generate_discharge_plan.assert_not_called()
+        self.assertEqual(job.status, "ready")
+
+    @patch('app.services.discharge_jobs.DischargeService')
+    def test_success_marks_job_ready(self, mock_service):
+        job = _job()
+        mock_service.plan_from_draft.return_value = None
+        self._lookups(job)
+
+        self.worker.run_job(7)
+
+        mock_service.generate_discharge_plan.assert_called_once_with(3, self.db, fallback=False)
+        self.assertEqual(job.status, "ready")
+        self.assertIsNotNone(job.finished_at)
+
+    @patch('app.services.discharge_jobs.DischargeService')
+    def test_failed_attempt_is_retried_with_backoff(self, mock_service):
+        job = _job(attempts=2)
+        mock_service.plan_from_draft.return_value = None
+        self._lookups(job)
+        mock_service.generate_discharge_plan.side_effect = ConnectionError("ollama down")
+
+        self.worker.run_job(7)
+
+        self.db.rollback.assert_called_once()
+        self.assertEqual(job.status, "pending")
+        self.assertEqual(job.error, "ollama down")
+        delay = (job.next_attempt_at - datetime.now(timezone.utc)).total_seconds()
+        self.assertAlmostEqual(delay, 20, delta=1)
+
+    @patch('app.services.discharge_jobs.DischargeService')
+    def test_last_attempt_failure_marks_job_failed(self, mock_service):
+        job = _job(attempts=3)
+        mock_service.plan_from_draft.return_value = None
+        self._lookups(job)
+        mock_service.generate_discharge_plan.side_effect = TimeoutError("timed out")
+
+        self.worker.run_job(7)
+
+        self.assertEqual(job.status, "failed")
+        self.assertEqual(job.error, "timed out")
+
+    @patch('app.services.discharge_jobs.DischargeService')
+    def test_existing_plan_is_not_generated_again(self, mock_service):
+        job = _job()
+        self._lookups(job, plan=MagicMock())
+
+        self.worker.run_job(7)
+
+        mock_service.generate_discharge_plan.assert_not_called()
+        self.assertEqual(job.status, "ready")
+
+    def test_runs_at_most_concurrency_jobs_at_once(self):
+        pending = list(range(6))
+        lock = threading.Lock()
+        state = {"running": 0, "peak": 0, "done": 0}
+
+        def claim(limit):
+            with lock:
+                claimed, pending[:] = pending[:limit], pending[limit:]
+            return claimed
+
+        def run_job(job_id):
+            with lock:
+                state["running"] += 1
+                state["peak"] = max(state["peak"], state["running"])
+            time.sleep(0.05)
+            with lock:
+                state["running"] -= 1
+                state["done"] += 1
+            DischargePlanWorker.notify()
+
+        self.worker.claim = claim
+        self.worker.run_job = run_job
+        self.worker.poll_s = 0.01
+        stop = threading.Event()
+        runner = threading.Thread(target=self.worker.run, args=(stop,), daemon=True)
+        runner.start()
+        deadline = time.time() + 5
+        while state["done"] < 6 and time.time() < deadline:
+            time.sleep(0.01)
+        stop.set()
+        runner.join(5)
+
+        self.assertEqual(state["done"], 6)
+        self.assertEqual(state["peak"], 2)
+
+    def test_enqueue_reuses_unfinished_job(self):
+        existing = _job(status="pending")
+        self.db.query.return_value.filter.return_value.first.return_value = existing
+
+        self.assertIs(DischargePlanJobs.enqueue(3, self.db), existing)
+        self.db.add.assert_not_called()
+
+class TestDischargePlanAPI(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app()
+        self.client = self.app.test_client()
+        self.app.config['TESTING'] = True
+        self.headers = {'Authorization': 'Bearer fake-token'}
+
+    @patch('app.api.encounters.DischargePlanJobs')
+    @patch('app.api.encounters.DischargeService')
+    @patch('app.core.security.decode_access_token')
+    @patch('app.api.encounters.get_db')
+    def test_discharge_queues_plan_and_returns_job(self, mock_get_db, mock_decode, mock_service, mock_jobs):
+        mock_decode.return_value = {'sub': 'doc1', 'role': 'doctor', 'user_id': 10}
+        db = MagicMock()
+        db.query.return_value.filter.return_value.first.return_value = MagicMock(status="active")
+        mock_get_db.return_value = iter([db])
+        mock_service.plan_from_draft.return_value = None
+        mock_jobs.enqueue.return_value = _job(status="pending")
+
+        response = self.client.patch('/encounters/3/discharge', json={}, headers=self.headers)
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.get_json()['data'], {"job_id": 7, "status": "pending"})
+        mock_service.discharge_encounter.assert_called_once_with(3, db)
+        mock_service.generate_discharge_plan.assert_not_called()
+
+    @patch('app.api.encounters.DischargePlanJobs')
+    @patch('app.api.encounters.DischargeService')
+    @patch('app.core.security.decode_access_token')
+    @patch('app.api.encounters.get_db')
+    def test_discharge_with_valid_draft_is_ready_at_once(self, mock_get_db, mock_decode, mock_service, mock_jobs):
+        mock_decode.return_value = {'sub': 'doc1', 'role': 'doctor', 'user_id': 10}
+        db = MagicMock()
+        db.query.return_value.filter.return_value.first.return_value = MagicMock(status="active")
+        mock_get_db.return_value = iter([db])
+        mock_service.plan_from_draft.return_value = MagicMock(id=11)
+
+        response = self.client.patch('/encounters/3/discharge', json={}, headers=self.headers)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()['data'], {"plan_id": 11, "status": "ready"})
+        mock_jobs.enqueue.assert_not_called()
+
+    @patch('app.api.discharge.DischargePlanJobs')
+    @patch('app.core.security.decode_access_token')
+    @patch('app.api.discharge.get_db')
+    def test_plan_status_while_generating_and_after_failure(self, mock_get_db, mock_decode, mock_jobs):
+        mock_decode.return_value = {'sub': 'doc1', 'role': 'doctor', 'user_id': 10}
+        db = MagicMock()
+        db.query.return_value.filter.return_value.first.return_value = None
+        mock_get_db.side_effect = lambda: iter([db])
+
+        job = _job(status="running")
+        job.created_at = job.finished_at = None
+        mock_jobs.latest.return_value = job
+        response = self.client.get('/encounters/3/discharge_plan', headers=self.headers)
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.get_json()['data']['status'], "pending")
+
+        job.status, job.attempts, job.error = "failed", 3, "timed out"
+        response = self.client.get('/encounters/3/discharge_plan', headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()['data']['status'], "failed")
+        self.assertEqual(response.get_json()['data']['error'], "timed out")
+
+        mock_jobs.latest.return_value = None
+        response = self.client.get('/encounters/3/discharge_plan', headers=self.headers)
+        self.assertEqual(response.status_code, 404)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+import json
+import unittest
+from datetime import datetime, timezone
+from unittest.mock import MagicMock
+from app.services.explanation_cache import ExplanationCache, normalize_context, cache_key, SECONDS_SAVED
+
+def _context(hr=132, age=47, alert_type="TACHYCARDIA", rr=18):
+    return {
+        "alert_type": alert_type, "severity": "high", "message": f"High Heart Rate detected: {hr} BPM",
+        "patient_age": age, "gender": "Male",
+        "recent_vitals": [{"hr": hr, "spo2": 97, "bp": "128/82", "temp": 37.2, "rr": rr},
+                          {"hr": 120, "spo2": 98, "bp": "125/80", "temp": 37.1, "rr": 18}],
+    }
+
+EXPLANATION = {"summary": "Sustained tachycardia", "risk_level": "High", "suggested_checks": ["ECG"], "suggested_actions": ["Review fluids"]}
+
+class TestExplanationCache(unittest.TestCase):
+    def setUp(self):
+        self.now = 1_000_000.0
+        self.db = MagicMock()
+        self.db.query.return_value.filter.return_value.first.return_value = None
+        self.cache = ExplanationCache(ttl_s=600, max_entries=2, session_factory=lambda: self.db, clock=lambda: self.now)
+
+    def test_similar_contexts_share_a_key(self):
+        self.assertEqual(cache_key(normalize_context(_context(hr=132, age=47))),
+                         cache_key(normalize_context(_context(hr=138, age=41))))
+        self.assertNotEqual(cache_key(normalize_context(_context(hr=132))),
+                            cache_key(normalize_context(_context(hr=152))))
+        self.assertNotEqual(cache_key(normalize_context(_context())),
+                            cache_key(normalize_context(_context(alert_type="FEVER"))))
+
+    def test_contexts_without_vitals_are_not_cached(self):
+        no_vitals = {**_context(), "recent_vitals": []}
+        self.cache.put(no_vitals, EXPLANATION, llm_seconds=2.0)
+        self.assertIsNone(self.cache.get(no_vitals))
+        self.assertIsNone(self.cache.get({**_context(age=45), "recent_vitals": []}))
+        self.db.execute.assert_not_called()
+
+    def test_different_respiratory_rate_misses(self):
+        self.cache.put(_context(rr=18), EXPLANATION, llm_seconds=2.0)
+        self.assertIsNotNone(self.cache.get(_context(rr=19)))
+        self.assertIsNone(self.cache.get(_context(rr=28)))
+
+    def test_memory_hit_saves_llm_time_until_ttl(self):
+        saved = SECONDS_SAVED.value()
+        self.assertIsNone(self.cache.get(_context()))
+        self.cache.put(_context(), EXPLANATION, llm_seconds=4.5)
+        self.db.execute.assert_called_once()
+        self.db.commit.assert_called_once()
+
+        self.assertEqual(self.cache.get(_context(hr=135))["summary"], "Sustained tachycardia")
+        self.assertAlmostEqual(SECONDS_SAVED.value() - saved, 4.5)
+
+        self.now += 601
+        self.assertIsNone(self.cache.get(_context()))
+
+    def test_database_hit_is_shared_across_processes(self):
+        self.db.query.return_value.filter.return_value.first.return_value = MagicMock(
+            explanation=json.dumps(EXPLANATION), llm_seconds=3.0,
+            created_at=datetime.fromtimestamp(self.now - 60, timezone.utc))
+
+        self.assertEqual(self.cache.get(_context())["risk_level"], "High")
+        # Now served from memory
+        self.db.query.reset_mock()
+        self.assertIsNotNone(self.cache.get(_context()))
+        self.db.query.assert_not_called()
+
+    def test_lru_eviction_and_error_fallbacks_are_not_cached(self):
+        for hr in (110, 130, 150):
+            self.cache.put(_context(hr=hr), EXPLANATION, llm_seconds=1.0)
+        self.assertEqual(len(self.cache._entries), 2)
+        self.assertIsNone(self.cache._get_local(cache_key(normalize_context(_context(hr=110)))))
+
+        self.db.reset_mock()
+        self.cache.put(_context(hr=170), {"summary": "Error analyzing alert.", "risk_level": "Unknown"}, 30.0)
+        self.db.execute.assert_not_called()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,113 @@
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+from sqlalchemy.exc import IntegrityError
+from app.app import create_app
+from app.services.explanation_stream import ExplanationStreamHub
+
+def _db(explanation=None):
+    db = MagicMock()
+    alert = MagicMock(id=5, type="SEPSIS_RISK", severity="high", message="Possible Sepsis Pattern: Temp 39.4C, HR 118, Resp 24",
+                      patient_id=1, encounter_id=2, explanation=explanation)
+    db.query.return_value.filter.return_value.first.return_value = alert
+    db.query.return_value.filter.return_value.order_by.return_value.limit.return_value.all.return_value = []
+    return db
+
+class TestExplanationStreamHub(unittest.TestCase):
+    def setUp(self):
+        self.db = _db()
+        self.cache = MagicMock()
+        self.cache.get.return_value = None
+        self.hub = ExplanationStreamHub(session_factory=lambda: self.db, cache=self.cache, heartbeat_s=0.05)
+
+    @patch('app.services.explanation_stream.LLMService')
+    def test_viewers_share_one_generation_and_result_is_saved_once(self, mock_llm):
+        release = threading.Event()
+
+        def stream(context):
+            yield {"summary": "Fever"}
+            release.wait(5)
+            yield {"summary": "Fever with tachycardia", "risk_level": "High", "suggested_checks": ["Lactate"]}
+        mock_llm.stream_alert_explanation_json.side_effect = stream
+
+        first = self.hub.subscribe(5)
+        second = self.hub.subscribe(5)
+        self.assertEqual(next(e for e in first if e), ('partial', {"summary": "Fever"}))
+        release.set()
+        events = [e for e in second if e]
+
+        self.assertEqual(events[-1][0], 'explanation')
+        self.assertEqual(mock_llm.stream_alert_explanation_json.call_count, 1)
+        self.db.add.assert_called_once()
+        saved = self.db.add.call_args[0][0]
+        self.assertEqual(saved.alert_id, 5)
+        self.assertEqual(saved.risk_level, "High")
+        self.cache.put.assert_called_once()
+        self.assertEqual([e for e in first if e][-1][0], 'explanation')
+        # Finished generations are dropped (just after the final event); a later viewer starts a new one
+        deadline = time.time() + 5
+        while self.hub._generations and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(self.hub._generations, {})
+
+    @patch('app.services.explanation_stream.LLMService')
+    def test_explanation_saved_elsewhere_first_is_returned(self, mock_llm):
+        mock_llm.stream_alert_explanation_json.return_value = iter([{"summary": "Ours", "risk_level": "Low"}])
+        self.db.commit.side_effect = IntegrityError("insert", {}, Exception("duplicate key"))
+        existing = MagicMock(alert_id=5, summary="Copilot's", risk_level="High",
+                             suggested_checks='["ECG"]', suggested_actions=None, created_at=None)
+        self.db.query.return_value.filter.return_value.first.side_effect = [self.db.query.return_value.filter.return_value.first.return_value, None, existing]
+
+        event, data = [e for e in self.hub.subscribe(5) if e][-1]
+
+        self.db.rollback.assert_called_once()
+        self.assertEqual(event, 'explanation')
+        self.assertEqual(data["summary"], "Copilot's")
+        self.assertEqual(data["suggested_checks"], ["ECG"])
+
+    @patch('app.services.explanation_stream.LLMService')
+    def test_llm_failure_is_reported_and_not_saved(self, mock_llm):
+        mock_llm.stream_alert_explanation_json.side_effect = ConnectionError("ollama down")
+
+        self.assertEqual([e for e in self.hub.subscribe(5) if e],
+                         [('error', {"error": "Explanation generation failed"})])
+        self.db.add.assert_not_called()
+
+    @patch('app.services.explanation_stream.LLMService')
+    def test_routine_alert_gets_rule_explanation_without_llm(self, mock_llm):
+        self.db.query.return_value.filter.return_value.first.return_value.type = "FEVER"
+
+        event, data = [e for e in self.hub.subscribe(5) if e][-1]
+
+        self.assertEqual(event, 'explanation')
+        mock_llm.stream_alert_explanation_json.assert_not_called()
+        self.assertIn("Rule-based explanation", self.db.add.call_args[0][0].summary)
+
+class TestExplanationStreamAPI(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app()
+        self.client = self.app.test_client()
+        self.app.config['TESTING'] = True
+
+    @patch('app.api.alerts.ExplanationStreamHub')
+    @patch('app.core.security.decode_access_token')
+    @patch('app.api.alerts.get_db')
+    def test_stream_endpoint_sends_server_sent_events(self, mock_get_db, mock_decode, mock_hub):
+        mock_decode.return_value = {'sub': 'doc1', 'role': 'doctor', 'user_id': 10}
+        mock_get_db.return_value = iter([_db()])
+        mock_hub.get.return_value.subscribe.return_value = iter([
+            ('partial', {"summary": "Fev"}), None, ('explanation', {"alert_id": 5, "summary": "Fever"})])
+
+        response = self.client.get('/alerts/5/explanation/stream', headers={'Authorization': 'Bearer fake-token'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, 'text/event-stream')
+        self.assertEqual(response.get_data(as_text=True),
+                         'event: partial\ndata: {"summary": "Fev"}\n\n'
+                         ': keep-alive\n\n'
+                         'event: explanation\ndata: {"alert_id": 5, "summary": "Fever"}\n\n')
+        mock_hub.get.return_value.subscribe.assert_called_once_with(5)
+
+if __name__ == '__main__':
+    unittest.main()
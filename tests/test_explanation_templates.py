@@ -0,0 +1,29 @@
+import unittest
+from app.services.explanation_templates import rule_explanation, vitals_trend
+
+class TestRuleExplanation(unittest.TestCase):
+    def test_trend_direction_follows_the_alert_type(self):
+        falling_bp = [{"bp": "82/50"}, {"bp": "95/60"}, {"bp": "112/70"}]
+        self.assertEqual(vitals_trend("HYPOTENSION", falling_bp)["direction"], "worsening")
+        self.assertEqual(vitals_trend("HYPERTENSION", falling_bp)["direction"], "improving")
+        self.assertEqual(vitals_trend("TACHYCARDIA", [{"hr": 128}, {"hr": 124}])["direction"], "stable")
+        self.assertIsNone(vitals_trend("TACHYCARDIA", [{"hr": 128}]))
+        self.assertIsNone(vitals_trend("SEPSIS_RISK", falling_bp))
+
+    def test_worsening_trend_raises_risk_and_adds_escalation(self):
+        stable = rule_explanation("TACHYPNEA", "medium", "Rapid breathing detected: 26 bpm", [{"rr": 26}, {"rr": 25}])
+        worsening = rule_explanation("TACHYPNEA", "medium", "Rapid breathing detected: 26 bpm", [{"rr": 26}, {"rr": 18}])
+
+        self.assertEqual(stable["risk_level"], "Moderate")
+        self.assertEqual(worsening["risk_level"], "High")
+        self.assertEqual(worsening["suggested_actions"][0], "Increase observation frequency and reassess within 15 minutes")
+        self.assertEqual(set(stable), {"summary", "risk_level", "suggested_checks", "suggested_actions"})
+
+    def test_no_vitals_still_gives_a_complete_explanation(self):
+        result = rule_explanation("FEVER", "medium", "High Temperature detected: 39.0 C")
+        self.assertIn("No recent trend available", result["summary"])
+        self.assertEqual(result["risk_level"], "Moderate")
+        self.assertTrue(result["suggested_checks"])
+
+if __name__ == '__main__':
+    unittest.main()
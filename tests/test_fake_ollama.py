@@ -0,0 +1,54 @@
+import os
+import random
+import time
+import unittest
+from unittest.mock import patch
+from app.llm.runtime import LLMRuntime
+from app.services.llm_service import LLMService
+from tests.fake_ollama import FakeOllama, parse_latency
+
+class TestFakeOllama(unittest.TestCase):
+    def _runtime(self, server):
+        patcher = patch.dict(os.environ, {"OLLAMA_BASE_URL": server.url})
+        patcher.start()
+        LLMRuntime.reset()
+        self.addCleanup(LLMRuntime.reset)
+        self.addCleanup(patcher.stop)
+
+    def test_latency_distributions(self):
+        rng = random.Random(1)
+        self.assertEqual(parse_latency("0.25")(), 0.25)
+        self.assertEqual(parse_latency(0)(), 0.0)
+        samples = [parse_latency("uniform:0.1:0.3", rng)() for _ in range(200)]
+        self.assertTrue(all(0.1 <= s <= 0.3 for s in samples))
+        samples = sorted(parse_latency("lognormal:0.5:0.4", rng)() for _ in range(401))
+        self.assertAlmostEqual(samples[200], 0.5, delta=0.1)
+        with self.assertRaises(ValueError):
+            parse_latency("pareto:1:2")
+
+    def test_combined_prompt_gets_one_explanation_per_alert(self):
+        with FakeOllama() as server:
+            self._runtime(server)
+            explained = LLMService.generate_alert_explanations_json({
+                "patient_age": 61, "gender": "Female", "recent_vitals": [],
+                "alerts": [{"id": 3, "alert_type": "FEVER"}, {"id": 4, "alert_type": "SEPSIS_RISK"}],
+            })
+        self.assertEqual(sorted(explained), [3, 4])
+        self.assertEqual(explained[4]["risk_level"], "Moderate")
+
+    def test_errors_and_token_pacing(self):
+        with FakeOllama(error_rate=1.0) as server:
+            self._runtime(server)
+            plan = LLMService.generate_discharge_plan_json({"alerts_count": 0})
+            self.assertEqual(plan["discharge_summary"], "Error generating plan. Please review manually.")
+            self.assertEqual(server.stats()["errors"], 1)
+
+        with FakeOllama(token_delay_s=0.01) as server:
+            self._runtime(server)
+            started = time.perf_counter()
+            plan = LLMService.generate_discharge_plan_json({"alerts_count": 0})
+            self.assertEqual(plan["followup_days"], 7)
+            self.assertGreater(time.perf_counter() - started, 0.1)
+
+if __name__ == '__main__':
+    unittest.main()
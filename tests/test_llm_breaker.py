@@ -0,0 +1,128 @@
+import os
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock, patch
+from app.llm.breaker import CircuitBreaker, CircuitOpenError
+from app.llm.runtime import LLMRuntime, LLMTimeoutError, LLM_CALLS, LLM_TOKENS
+from app.services.llm_service import LLMService
+from tests.fake_ollama import FakeOllama
+
+class TestCircuitBreaker(unittest.TestCase):
+    def setUp(self):
+        self.now = 0.0
+        self.breaker = CircuitBreaker(failure_threshold=3, reset_timeout_s=30, name='test', clock=lambda: self.now)
+
+    def test_opens_after_consecutive_failures(self):
+        for _ in range(2):
+            self.breaker.record_failure()
+        self.breaker.record_success()
+        for _ in range(2):
+            self.breaker.record_failure()
+        self.assertTrue(self.breaker.allow())
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+        self.assertFalse(self.breaker.allow())
+
+    def test_half_open_lets_one_probe_through(self):
+        for _ in range(3):
+            self.breaker.record_failure()
+        self.now = 31
+        self.assertTrue(self.breaker.allow())
+        self.assertEqual(self.breaker.state, CircuitBreaker.HALF_OPEN)
+        self.assertFalse(self.breaker.allow())
+
+        # Failed probe re-opens for another reset period
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+        self.now = 50
+        self.assertFalse(self.breaker.allow())
+        self.now = 62
+        self.assertTrue(self.breaker.allow())
+        self.breaker.record_success()
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+        self.assertTrue(self.breaker.allow())
+
+class TestGuardedRuntime(unittest.TestCase):
+    def setUp(self):
+        self.breaker = CircuitBreaker(failure_threshold=2, reset_timeout_s=60, name='test')
+        self.runtime = LLMRuntime(llm=MagicMock(), breaker=self.breaker)
+
+    def tearDown(self):
+        self.runtime._executor.shutdown(wait=False)
+
+    def test_timeout_stops_waiting_and_counts_as_failure(self):
+        release = threading.Event()
+        started = time.perf_counter()
+        with self.assertRaises(LLMTimeoutError):
+            self.runtime.run("discharge_plan", lambda config: release.wait(5), timeout_s=0.05)
+        release.set()
+        self.assertLess(time.perf_counter() - started, 1)
+        self.assertEqual(self.breaker.failures, 1)
+
+    def test_failed_submit_releases_the_half_open_probe(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.breaker.opened_at -= 61
+        self.runtime._executor.shutdown(wait=False)
+
+        # Granted the probe, then the submit raises before any outcome
+        with self.assertRaises(RuntimeError):
+            self.runtime.run("discharge_plan", lambda config: "plan")
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+
+        self.breaker.opened_at -= 61
+        self.runtime._executor = ThreadPoolExecutor(max_workers=2)
+        self.assertEqual(self.runtime.run("discharge_plan", lambda config: "plan"), "plan")
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+
+    def test_timed_out_calls_hold_their_slot_until_they_return(self):
+        runtime = LLMRuntime(llm=MagicMock(), breaker=CircuitBreaker(5, 60, name='test'), max_calls=1)
+        release = threading.Event()
+        with self.assertRaises(LLMTimeoutError):
+            runtime.run("discharge_plan", lambda config: release.wait(5), timeout_s=0.05)
+
+        calls = []
+        with self.assertRaises(LLMTimeoutError):
+            runtime.run("discharge_plan", lambda config: calls.append(1), timeout_s=0.05)
+        self.assertEqual(calls, [])
+
+        release.set()
+        self.assertEqual(runtime.run("discharge_plan", lambda config: "plan", timeout_s=5), "plan")
+        runtime._executor.shutdown(wait=False)
+
+    @patch('app.services.llm_service.LLMRuntime')
+    def test_open_circuit_serves_fallback_without_calling(self, mock_runtime_cls):
+        mock_runtime_cls.get.return_value = self.runtime
+        self.runtime.llm.invoke.side_effect = ConnectionError("ollama down")
+        self.runtime.chain("discharge_plan", lambda llm: MagicMock(invoke=MagicMock(side_effect=ConnectionError("down"))))
+        rejected = LLM_CALLS.value(task='discharge_plan', result='rejected')
+
+        for _ in range(3):
+            result = LLMService.generate_discharge_plan_json({})
+            self.assertEqual(result["discharge_summary"], "Error generating plan. Please review manually.")
+
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+        self.assertEqual(LLM_CALLS.value(task='discharge_plan', result='rejected') - rejected, 1)
+        with self.assertRaises(CircuitOpenError):
+            self.runtime.invoke("ping")
+
+    def test_token_usage_is_recorded_per_task(self):
+        with FakeOllama() as server, patch.dict(os.environ, {"OLLAMA_BASE_URL": server.url}):
+            LLMRuntime.reset()
+            try:
+                before = LLM_TOKENS.count(task='alert_explanation', kind='completion')
+                LLMService.generate_alert_explanation_json({"alert_type": "FEVER"})
+                self.assertEqual(LLM_TOKENS.count(task='alert_explanation', kind='completion') - before, 1)
+                self.assertGreater(LLM_CALLS.value(task='alert_explanation', result='ok'), 0)
+            finally:
+                LLMRuntime.reset()
+
+        from app.app import create_app
+        body = create_app().test_client().get('/metrics').get_data(as_text=True)
+        self.assertIn('llm_tokens_count{task="alert_explanation",kind="completion"}', body)
+        self.assertIn('llm_circuit_state{breaker="llm"}', body)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,42 +1,135 @@
 import unittest
 from unittest.mock import MagicMock, patch
-from app.llm.healthcheck import llm_healthcheck
+import threading
+from app.app import create_app
+from app.core.config import Config
+from app.llm.healthcheck import llm_healthcheck, LLMHealthProber
 from app.services.llm_service import LLMService
+from app.llm.runtime import LLMRuntime
 import json
+import os
+from tests.fake_ollama import FakeOllama
 
 class TestLLMHealthcheck(unittest.TestCase):
-    @patch('app.llm.healthcheck.get_default_llm')
-    def test_llm_healthcheck_success(self, mock_get_llm):
+    @patch('app.llm.healthcheck.LLMRuntime')
+    def test_llm_healthcheck_success(self, mock_runtime):
         mock_llm = MagicMock()
         mock_llm.invoke.return_value.content = "OK"
         mock_llm.model = "llama3"
-        mock_get_llm.return_value = mock_llm
+        mock_runtime.get.return_value = LLMRuntime(llm=mock_llm)
         
         result = llm_healthcheck()
         self.assertTrue(result["ok"])
         self.assertEqual(result["model"], "llama3")
         self.assertEqual(result["sample_reply"], "OK")
 
-    @patch('app.llm.healthcheck.get_default_llm')
-    def test_llm_healthcheck_failure(self, mock_get_llm):
+    @patch('app.llm.healthcheck.LLMRuntime')
+    def test_llm_healthcheck_failure(self, mock_runtime):
         mock_llm = MagicMock()
         mock_llm.invoke.side_effect = Exception("Connection refused")
         mock_llm.model = "llama3"
-        mock_get_llm.return_value = mock_llm
+        mock_runtime.get.return_value = LLMRuntime(llm=mock_llm)
         
         result = llm_healthcheck()
         self.assertFalse(result["ok"])
         self.assertIn("Connection refused", result["error"])
 
-    @patch('app.services.llm_service.get_default_llm')
-    def test_llm_service_fallback(self, mock_get_llm):
+    @patch('app.services.llm_service.LLMRuntime')
+    def test_llm_service_fallback(self, mock_runtime):
         # Test fallback when LLM fails
         mock_llm = MagicMock()
         mock_llm.invoke.side_effect = Exception("LLM Error")
-        mock_get_llm.return_value = mock_llm
+        mock_runtime.get.return_value = LLMRuntime(llm=mock_llm)
         
         result = LLMService.generate_discharge_plan_json({})
         self.assertEqual(result["discharge_summary"], "Error generating plan. Please review manually.")
 
+class _Prober(LLMHealthProber):
+    """Isolated from the process-wide prober the app starts."""
+    _snapshot = None
+    _prober = object()
+    _lock = threading.Lock()
+
+@patch('app.api.llm_health.LLMHealthProber', _Prober)
+@patch('app.llm.healthcheck.LLMRuntime')
+@patch('app.llm.healthcheck.llm_healthcheck')
+class TestLLMHealthEndpoint(unittest.TestCase):
+    def setUp(self):
+        _Prober.reset()
+        self.client = create_app().test_client()
+
+    def _ok(self, mock_check, mock_runtime):
+        mock_check.return_value = {"ok": True, "model": "llama3", "error": None, "sample_reply": "OK"}
+        mock_runtime.get.return_value.breaker.state = "closed"
+
+    def test_health_is_served_from_the_probe_snapshot(self, mock_check, mock_runtime):
+        self._ok(mock_check, mock_runtime)
+        _Prober.probe()
+
+        for _ in range(3):
+            response = self.client.get('/llm/health')
+            self.assertEqual(response.status_code, 200)
+        self.assertEqual(mock_check.call_count, 1)
+        data = response.get_json()["data"]
+        self.assertEqual(data["circuit"], "closed")
+        self.assertIn("checked_at", data)
+
+        self.client.get('/llm/health?force=1')
+        self.assertEqual(mock_check.call_count, 2)
+
+    def test_missing_or_stale_snapshot_is_unhealthy(self, mock_check, mock_runtime):
+        self._ok(mock_check, mock_runtime)
+        self.assertEqual(self.client.get('/llm/health').status_code, 503)
+        mock_check.assert_not_called()
+
+        _Prober.probe()
+        with patch.object(Config, 'LLM_HEALTH_INTERVAL_S', -1):
+            response = self.client.get('/llm/health')
+        self.assertEqual(response.status_code, 500)
+        self.assertIn("stale", response.get_json()["error"])
+
+class TestLLMRuntime(unittest.TestCase):
+    @patch('app.llm.runtime.get_default_llm')
+    def test_client_and_chains_are_built_once(self, mock_get_llm):
+        LLMRuntime.reset()
+        try:
+            build = MagicMock(return_value="chain")
+            runtime = LLMRuntime.get()
+            self.assertIs(LLMRuntime.get(), runtime)
+            self.assertEqual(runtime.chain("alert_explanation", build), "chain")
+            self.assertEqual(runtime.chain("alert_explanation", build), "chain")
+            mock_get_llm.assert_called_once()
+            build.assert_called_once_with(mock_get_llm.return_value)
+        finally:
+            LLMRuntime.reset()
+
+    def test_shared_client_reuses_one_connection(self):
+        with FakeOllama() as server, patch.dict(os.environ, {"OLLAMA_BASE_URL": server.url}):
+            LLMRuntime.reset()
+            try:
+                for _ in range(3):
+                    result = LLMService.generate_alert_explanation_json({"alert_type": "FEVER"})
+                    self.assertEqual(result["risk_level"], "Moderate")
+            finally:
+                LLMRuntime.reset()
+        self.assertEqual(server.requests, 3)
+        self.assertEqual(server.connections, 1)
+
+    def test_smoke_test_streams_partial_fields(self):
+        from app.app import create_app
+        client = create_app().test_client()
+        with FakeOllama() as server, patch.dict(os.environ, {"OLLAMA_BASE_URL": server.url}):
+            LLMRuntime.reset()
+            try:
+                body = client.get('/llm/copilot/smoke_test?stream=1').get_data(as_text=True)
+            finally:
+                LLMRuntime.reset()
+        events = [block.split("\n") for block in body.strip().split("\n\n")]
+        names = [lines[0].split(": ", 1)[1] for lines in events]
+        self.assertGreater(names.count("partial"), 1)
+        self.assertEqual(names[-1], "done")
+        done = json.loads(events[-1][1].split(": ", 1)[1])
+        self.assertEqual(done["structured_output"]["risk_level"], "Moderate")
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,40 @@
+import unittest
+from app.core.metrics import Registry
+
+class TestMetrics(unittest.TestCase):
+    def test_counter_and_gauge_render(self):
+        registry = Registry()
+        messages = registry.counter('messages_total', 'Messages', ('consumer',))
+        lag = registry.gauge('lag', 'Lag', ('consumer', 'partition'))
+        messages.inc(3, consumer='engine')
+        messages.inc(consumer='engine')
+        lag.set(7, consumer='engine', partition=0)
+        lag.set(2, consumer='copilot', partition=0)
+        lag.clear(consumer='engine')
+
+        text = registry.render()
+        self.assertIn('# TYPE messages_total counter', text)
+        self.assertIn('messages_total{consumer="engine"} 4', text)
+        self.assertNotIn('lag{consumer="engine"', text)
+        self.assertIn('lag{consumer="copilot",partition="0"} 2', text)
+
+    def test_histogram_buckets_are_cumulative(self):
+        registry = Registry()
+        latency = registry.histogram('latency_seconds', 'Latency', buckets=(0.1, 1))
+        for value in (0.05, 0.1, 0.5, 3):
+            latency.observe(value)
+
+        text = registry.render()
+        self.assertIn('latency_seconds_bucket{le="0.1"} 2', text)
+        self.assertIn('latency_seconds_bucket{le="1"} 3', text)
+        self.assertIn('latency_seconds_bucket{le="+Inf"} 4', text)
+        self.assertIn('latency_seconds_count 4', text)
+
+    def test_same_name_returns_same_metric(self):
+        registry = Registry()
+        self.assertIs(registry.counter('c', 'C'), registry.counter('c', 'C'))
+        with self.assertRaises(ValueError):
+            registry.gauge('c', 'C')
+
+if __name__ == '__main__':
+    unittest.main()
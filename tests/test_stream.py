@@ -0,0 +1,210 @@
+import json
+import os
+import signal
+import threading
+import unittest
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock, patch
+from kafka import TopicPartition
+from sqlalchemy.exc import OperationalError
+from app.core.stream import (StreamConsumer, ConcurrentStreamConsumer, RetryPolicy, partition_lag,
+                             GracefulShutdown, BoundedResumeListener)
+
+Record = namedtuple('Record', 'topic partition offset key value')
+
+def _record(offset, value, partition=0):
+    raw = value if isinstance(value, bytes) else json.dumps(value).encode('utf-8')
+    return Record('vitals_stream', partition, offset, None, raw)
+
+class TestStreamConsumer(unittest.TestCase):
+    def _stream(self, records, process_message, process_batch=None):
+        consumer = MagicMock()
+        consumer.config = {'group_id': 'test_group'}
+        consumer.poll.return_value = {TopicPartition('vitals_stream', 0): records}
+        retry = RetryPolicy(max_attempts=3, base_delay_s=0.01, sleep=MagicMock())
+        return StreamConsumer(consumer, 'vitals_stream', process_message, process_batch, retry=retry)
+
+    @patch('app.core.stream.KafkaClient')
+    def test_transient_error_is_retried(self, mock_kafka):
+        handler = MagicMock(side_effect=[OperationalError("SELECT 1", {}, Exception("db down")), None])
+        stream = self._stream([_record(0, {'n': 1})], handler)
+
+        self.assertEqual(stream.poll_once(), 1)
+        self.assertEqual(handler.call_count, 2)
+        stream.consumer.commit.assert_called_once()
+        stream.consumer.seek.assert_not_called()
+        mock_kafka.send_durable.assert_not_called()
+
+    @patch('app.core.stream.KafkaClient')
+    def test_poison_message_is_isolated_and_dead_lettered(self, mock_kafka):
+        def handle(value):
+            if value['n'] == 2:
+                raise ValueError("bad timestamp")
+        batch = MagicMock(side_effect=ValueError("bad timestamp"))
+        handler = MagicMock(side_effect=handle)
+        records = [_record(0, {'n': 1}), _record(1, {'n': 2}), _record(2, {'n': 3}), _record(3, b'{not json')]
+        stream = self._stream(records, handler, batch)
+
+        self.assertEqual(stream.poll_once(), 4)
+        self.assertEqual(handler.call_count, 3)
+        topic, payloads = mock_kafka.send_durable.call_args[0]
+        self.assertEqual(topic, 'vitals_stream.dlq')
+        self.assertEqual([(p['offset'], p['error_type']) for p in payloads], [(3, 'JSONDecodeError'), (1, 'ValueError')])
+        self.assertEqual(payloads[1]['value'], {'n': 2})
+        self.assertEqual(payloads[0]['raw_value'], '{not json')
+        self.assertEqual(stream.processed, 2)
+        self.assertEqual(stream.dead_lettered, 2)
+        stream.consumer.seek.assert_not_called()
+        stream.consumer.commit.assert_called_once()
+
+    @patch('app.core.stream.KafkaClient')
+    def test_persistent_outage_rewinds_instead_of_dead_lettering(self, mock_kafka):
+        def handle(value):
+            if value['n'] >= 2:
+                raise OperationalError("INSERT", {}, Exception("db down"))
+        records = [_record(5, {'n': 1}), _record(6, {'n': 2}), _record(7, {'n': 3})]
+        stream = self._stream(records, MagicMock(side_effect=handle))
+
+        self.assertEqual(stream.poll_once(), 1)
+        mock_kafka.send_durable.assert_not_called()
+        stream.consumer.seek.assert_called_once_with(TopicPartition('vitals_stream', 0), 6)
+        stream.consumer.commit.assert_called_once()
+
+    def test_lag_uses_cached_highwater_and_falls_back_to_end_offsets(self):
+        fetched, unfetched = TopicPartition('vitals_stream', 0), TopicPartition('vitals_stream', 1)
+        consumer = MagicMock()
+        consumer.assignment.return_value = {fetched, unfetched}
+        consumer.highwater.side_effect = lambda tp: 120 if tp == fetched else None
+        consumer.position.side_effect = lambda tp: 100 if tp == fetched else 40
+        consumer.end_offsets.return_value = {unfetched: 45}
+
+        self.assertEqual(partition_lag(consumer), {fetched: 20, unfetched: 5})
+        consumer.end_offsets.assert_called_once_with([unfetched])
+
+    @patch('app.core.stream.KafkaClient')
+    def test_catchup_mode_uses_large_batches_until_lag_is_low(self, mock_kafka):
+        tp = TopicPartition('vitals_stream', 0)
+        consumer = MagicMock()
+        consumer.config = {'group_id': 'test_group'}
+        consumer.poll.return_value = {tp: [_record(0, {'n': 1})]}
+        consumer.assignment.return_value = {tp}
+        consumer.highwater.return_value = 10000
+        consumer.position.side_effect = [1000, 9990]
+        stream = StreamConsumer(consumer, 'vitals_stream', MagicMock(), max_records=100,
+                                catchup_max_records=5000, catchup_lag=50)
+
+        stream.poll_once()
+        self.assertTrue(stream.catching_up)
+        stream.poll_once()
+        self.assertFalse(stream.catching_up)
+        stream.poll_once()
+        self.assertEqual([c.kwargs['max_records'] for c in consumer.poll.call_args_list], [5000, 5000, 100])
+
+
+class TestConcurrentStreamConsumer(unittest.TestCase):
+    def _stream(self, batches, handler, max_in_flight=4):
+        tp = TopicPartition('alerts', 0)
+        consumer = MagicMock()
+        consumer.config = {'group_id': 'copilot'}
+        consumer.assignment.return_value = {tp}
+        consumer.poll.side_effect = [{tp: [Record('alerts', 0, o, None, json.dumps({'n': o}).encode()) for o in offsets]}
+                                     for offsets in batches] + [{}] * 10
+        retry = RetryPolicy(max_attempts=1, base_delay_s=0.01, sleep=MagicMock())
+        return ConcurrentStreamConsumer(consumer, 'alerts', handler, concurrency=2, max_in_flight=max_in_flight,
+                                        retry=retry, timeout_ms=10)
+
+    def _committed(self, stream):
+        return [{tp.partition: meta.offset for tp, meta in c.args[0].items()} for c in stream.consumer.commit.call_args_list]
+
+    @patch('app.core.stream.KafkaClient')
+    def test_commits_only_up_to_first_unfinished_record(self, mock_kafka):
+        release = threading.Event()
+        def handle(value):
+            if value['n'] == 0:
+                release.wait(5)
+        stream = self._stream([[0, 1, 2]], handle)
+
+        stream.poll_once()
+        self.assertEqual(self._committed(stream), [])
+        release.set()
+        stream.drain()
+        self.assertEqual(self._committed(stream)[-1], {0: 3})
+        self.assertEqual(stream.processed, 3)
+
+    @patch('app.core.stream.KafkaClient')
+    def test_pauses_when_in_flight_limit_is_reached(self, mock_kafka):
+        release = threading.Event()
+        stream = self._stream([[0, 1]], lambda value: release.wait(5), max_in_flight=2)
+
+        stream.poll_once()
+        stream.poll_once()
+        stream.consumer.pause.assert_called_with(TopicPartition('alerts', 0))
+        release.set()
+        stream.drain()
+        stream.poll_once()
+        stream.consumer.resume.assert_called_once_with(TopicPartition('alerts', 0))
+
+    @patch('app.core.stream.KafkaClient')
+    def test_queued_records_start_in_priority_order(self, mock_kafka):
+        busy, release, started = threading.Event(), threading.Event(), []
+        def handle(value, waited_s):
+            started.append(value['n'])
+            busy.set()
+            release.wait(5)
+        stream = self._stream([[0], [1, 2, 3]], handle)
+        stream.concurrency = 1
+        stream._executor = ThreadPoolExecutor(max_workers=1)
+        stream.priority = lambda value: -value['n']  # higher n is more urgent
+
+        stream.poll_once()
+        busy.wait(5)  # record 0 holds the only worker while the rest queue up
+        stream.poll_once()
+        release.set()
+        stream.drain()
+        self.assertEqual(started, [0, 3, 2, 1])
+
+    @patch('app.core.stream.KafkaClient')
+    def test_transient_failure_rewinds_partition(self, mock_kafka):
+        def handle(value):
+            if value['n'] == 1:
+                raise OperationalError("INSERT", {}, Exception("db down"))
+        stream = self._stream([[0, 1, 2]], handle)
+
+        stream.poll_once()
+        stream.drain()
+        stream.consumer.seek.assert_called_once_with(TopicPartition('alerts', 0), 1)
+        self.assertEqual(self._committed(stream)[-1], {0: 1})
+        mock_kafka.send_durable.assert_not_called()
+
+
+class TestShutdownAndResume(unittest.TestCase):
+    def test_sigterm_sets_shutdown(self):
+        previous = signal.getsignal(signal.SIGTERM), signal.getsignal(signal.SIGINT)
+        try:
+            external = threading.Event()
+            shutdown = GracefulShutdown(external)
+            self.assertFalse(shutdown.is_set())
+            os.kill(os.getpid(), signal.SIGTERM)
+            self.assertTrue(shutdown.is_set())
+            self.assertFalse(external.is_set())
+        finally:
+            signal.signal(signal.SIGTERM, previous[0])
+            signal.signal(signal.SIGINT, previous[1])
+
+    def test_uncommitted_partitions_start_within_max_age(self):
+        committed, fresh, empty = (TopicPartition('vitals_stream', p) for p in range(3))
+        consumer = MagicMock()
+        consumer.committed.side_effect = lambda tp: 42 if tp == committed else None
+        consumer.offsets_for_times.return_value = {fresh: MagicMock(offset=7), empty: None}
+        inner = MagicMock()
+
+        BoundedResumeListener(consumer, inner, max_age_s=3600).on_partitions_assigned({committed, fresh, empty})
+
+        self.assertEqual(set(consumer.offsets_for_times.call_args[0][0]), {fresh, empty})
+        consumer.seek.assert_called_once_with(fresh, 7)
+        consumer.seek_to_end.assert_called_once_with(empty)
+        inner.on_partitions_assigned.assert_called_once_with({committed, fresh, empty})
+
+if __name__ == '__main__':
+    unittest.main()
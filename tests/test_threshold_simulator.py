@@ -0,0 +1,61 @@
+import unittest
+import random
+import numpy as np
+from app.services.rule_engine import RuleEngine
+from app.services.rule_thresholds import DEFAULT_THRESHOLDS
+from app.services.threshold_simulator import evaluate_chunk, resolve_rule_set, VITAL_COLUMNS
+
+class TestThresholdSimulator(unittest.TestCase):
+    def _readings(self, n=500):
+        random.seed(7)
+        readings = []
+        for _ in range(n):
+            reading = {
+                'hr_bpm': random.choice([None, random.randint(40, 160)]),
+                'spo2_pct': random.randint(85, 100),
+                'resp_rate_bpm': random.randint(5, 32),
+                'bp_systolic': random.randint(80, 200),
+                'bp_diastolic': random.choice([None, random.randint(50, 120)]),
+                'temp_c': round(random.uniform(36.0, 40.0), 1),
+                'patient_id': 1,
+                'timestamp': '2023-10-27T10:00:00',
+            }
+            readings.append(reading)
+        return readings
+
+    def _columns(self, readings):
+        return {c: np.array([r[c] for r in readings], dtype=np.float64) for c in VITAL_COLUMNS}
+
+    def test_vectorized_matches_rule_engine(self):
+        readings = self._readings()
+        thresholds = {k: np.full(len(readings), v, dtype=np.float64) for k, v in DEFAULT_THRESHOLDS.items()}
+        masks = evaluate_chunk(self._columns(readings), thresholds)
+
+        evaluate = RuleEngine.compile(DEFAULT_THRESHOLDS)
+        for i, reading in enumerate(readings):
+            expected = sorted(a['type'] for a in evaluate(reading))
+            actual = sorted(t for t, mask in masks.items() if mask[i])
+            self.assertEqual(actual, expected, reading)
+
+    def test_candidate_threshold_adds_alerts(self):
+        readings = [{c: None for c in VITAL_COLUMNS} for _ in range(3)]
+        for reading, hr in zip(readings, [120, 127, 135]):
+            reading['hr_bpm'] = hr
+        columns = self._columns(readings)
+
+        counts = {}
+        for name, overrides in {'current': {}, 'candidate': {'default': {'hr_high': 125}}}.items():
+            rule_set = resolve_rule_set(overrides)['default']
+            thresholds = {k: np.full(3, v, dtype=np.float64) for k, v in rule_set.items()}
+            counts[name] = int(evaluate_chunk(columns, thresholds)['TACHYCARDIA'].sum())
+
+        self.assertEqual(counts, {'current': 1, 'candidate': 2})
+
+    def test_department_overrides_inherit_default(self):
+        merged = resolve_rule_set({'default': {'temp_high': 38.0}, 'ICU': {'hr_high': 120}})
+        self.assertEqual(merged['ICU']['temp_high'], 38.0)
+        self.assertEqual(merged['ICU']['hr_high'], 120)
+        self.assertEqual(merged['default']['hr_high'], DEFAULT_THRESHOLDS['hr_high'])
+
+if __name__ == '__main__':
+    unittest.main()